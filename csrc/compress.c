@@ -4,6 +4,7 @@
 #define PY_SSIZE_T_CLEAN
 #include <Python.h>
 #include <stdbool.h>
+#include <string.h>
 
 static PyObject* compress(PyObject* self, PyObject* args)
 {
@@ -44,6 +45,10 @@ static PyObject* compress(PyObject* self, PyObject* args)
   source = buffer.buf;
   len_source = buffer.len;
 
+  // The compression loop only touches the (locked) input buffer and local
+  // arrays, so other threads can run while we compress.
+  Py_BEGIN_ALLOW_THREADS
+
   for(i=0;i<2;i++){
     // i=0: use 0x07FF for the range, 0xF800 for the max copy length
     // i=1: use 0x0FFF for the range, 0xF000 for the max copy length
@@ -191,6 +196,8 @@ static PyObject* compress(PyObject* self, PyObject* args)
   else{
     ret_choice = 1;
   }
+
+  Py_END_ALLOW_THREADS
   
   result = Py_BuildValue("y#",
 			 &compressed_data[ret_choice][0],
@@ -200,9 +207,229 @@ static PyObject* compress(PyObject* self, PyObject* args)
 }
 
 
+// Decompress the packet beginning at rom[start].  This is a direct
+// translation of ctdecompress.decompress_py, including its handling of
+// lookbacks that reach before the start of the output.
+static PyObject* decompress(PyObject* self, PyObject* args)
+{
+  const unsigned char* rom;
+  Py_ssize_t len_rom = 0;
+  Py_ssize_t start = 0;
+  Py_ssize_t src_pos = 0;
+  Py_ssize_t end_pos = 0;
+  int main_len = 0;
+  int out_pos = 0;
+  int header = 0;
+  int copy_size = 0;
+  int copy_off = 0;
+  int src_ind = 0;
+  bool smallwidth = false;
+  bool done = false;
+  bool bad_read = false;
+  bool bad_copy = false;
+  unsigned char out_buffer[0x10000];
+  PyObject* result;
+  Py_buffer buffer;
+
+  if (!PyArg_ParseTuple(args, "y*n", &buffer, &start))
+    return NULL;
+
+  rom = buffer.buf;
+  len_rom = buffer.len;
+
+  if(start < 0 || start+2 > len_rom){
+    PyBuffer_Release(&buffer);
+    PyErr_SetString(PyExc_IndexError, "decompress: start out of range");
+    return NULL;
+  }
+
+  memset(out_buffer, 0, sizeof(out_buffer));
+
+  // First two bytes are little endian size of compressed packet
+  main_len = rom[start] | (rom[start+1] << 8);
+  src_pos = start+2;
+  end_pos = src_pos + main_len;
+
+  if(end_pos >= len_rom){
+    PyBuffer_Release(&buffer);
+    PyErr_SetString(PyExc_IndexError, "decompress: packet out of range");
+    return NULL;
+  }
+
+  smallwidth = (rom[end_pos] & 0xC0) != 0;
+
+  while(!done && !bad_read && !bad_copy){
+    // First check if we've passed the main body
+    if(src_pos == end_pos){
+      if((rom[src_pos] & 0x3F) == 0){
+	// No addendum
+	done = true;
+	break;
+      }
+      else{
+	// Addendum, new end in next two bytes
+	if(src_pos+3 > len_rom){
+	  bad_read = true;
+	  break;
+	}
+	end_pos = start + (rom[src_pos+1] | (rom[src_pos+2] << 8));
+	src_pos += 3;
+
+	// The addendum must end after it starts or the src_pos == end_pos
+	// checks never stop the read.
+	if(end_pos <= src_pos){
+	  bad_read = true;
+	  break;
+	}
+      }
+    }
+
+    if(src_pos >= len_rom || end_pos >= len_rom){
+      bad_read = true;
+      break;
+    }
+
+    header = rom[src_pos];
+    src_pos += 1;
+
+    for(int i=0; i<8; i++){
+      if(src_pos == end_pos){
+	// ran out of data mid packet (in addendum)
+	break;
+      }
+      else if((header & (1 << i)) == 0){
+	// Uncompressed, copy next byte
+	if(src_pos >= len_rom){
+	  bad_read = true;
+	  break;
+	}
+	if(out_pos >= 0x10000){
+	  bad_copy = true;
+	  break;
+	}
+	out_buffer[out_pos] = rom[src_pos];
+	out_pos += 1;
+	src_pos += 1;
+      }
+      else{
+	// Compressed, determine copy size and offset
+	if(src_pos+2 > len_rom){
+	  bad_read = true;
+	  break;
+	}
+	copy_size = rom[src_pos+1];
+	copy_off = rom[src_pos] | (rom[src_pos+1] << 8);
+
+	if(smallwidth){
+	  copy_size >>= 3;
+	  copy_off &= 0x07FF;
+	}
+	else{
+	  copy_size >>= 4;
+	  copy_off &= 0x0FFF;
+	}
+
+	copy_size += 3;
+	if(out_pos + copy_size > 0x10000){
+	  bad_copy = true;
+	  break;
+	}
+
+	for(int j=0; j<copy_size; j++){
+	  // The python version wraps negative indices to the end of the
+	  // buffer, so we do the same.
+	  src_ind = out_pos - copy_off + j;
+	  if(src_ind < 0){
+	    src_ind += 0x10000;
+	  }
+	  out_buffer[out_pos+j] = out_buffer[src_ind];
+	}
+
+	out_pos += copy_size;
+	src_pos += 2;
+      }
+    }
+  }
+
+  PyBuffer_Release(&buffer);
+
+  if(bad_read){
+    PyErr_SetString(PyExc_IndexError, "decompress: read past end of rom");
+    return NULL;
+  }
+
+  if(bad_copy){
+    PyErr_SetString(PyExc_ValueError,
+		    "decompress: output larger than 0x10000 bytes");
+    return NULL;
+  }
+
+  result = PyByteArray_FromStringAndSize((const char*) out_buffer, out_pos);
+  return result;
+}
+
+
+// Find the length of the compressed packet beginning at rom[addr].
+static PyObject* get_compressed_length(PyObject* self, PyObject* args)
+{
+  const unsigned char* rom;
+  Py_ssize_t len_rom = 0;
+  Py_ssize_t addr = 0;
+  Py_ssize_t add_byte_addr = 0;
+  long compr_len = 0;
+  Py_buffer buffer;
+
+  if (!PyArg_ParseTuple(args, "y*n", &buffer, &addr))
+    return NULL;
+
+  rom = buffer.buf;
+  len_rom = buffer.len;
+
+  if(addr < 0 || addr+2 > len_rom){
+    PyBuffer_Release(&buffer);
+    PyErr_SetString(PyExc_IndexError,
+		    "get_compressed_length: addr out of range");
+    return NULL;
+  }
+
+  // len main body + main body + addendum byte
+  compr_len = 2 + (rom[addr] | (rom[addr+1] << 8)) + 1;
+  add_byte_addr = addr + compr_len - 1;
+
+  while(true){
+    if(add_byte_addr >= len_rom){
+      PyBuffer_Release(&buffer);
+      PyErr_SetString(PyExc_IndexError,
+		      "get_compressed_length: read past end of rom");
+      return NULL;
+    }
+
+    if((rom[add_byte_addr] & 0x3F) == 0){
+      break;
+    }
+
+    if(add_byte_addr+3 > len_rom){
+      PyBuffer_Release(&buffer);
+      PyErr_SetString(PyExc_IndexError,
+		      "get_compressed_length: read past end of rom");
+      return NULL;
+    }
+
+    compr_len = rom[add_byte_addr+1] | (rom[add_byte_addr+2] << 8);
+    add_byte_addr = addr + compr_len;
+  }
+
+  PyBuffer_Release(&buffer);
+  return PyLong_FromLong(compr_len);
+}
+
 
 static PyMethodDef CompressMethods[] = {
     {"compress", compress, METH_VARARGS, "compress an event."},
+    {"decompress", decompress, METH_VARARGS,
+     "decompress(rom, start): decompress an event."},
+    {"get_compressed_length", get_compressed_length, METH_VARARGS,
+     "get_compressed_length(rom, addr): length of a compressed event."},
     {NULL, NULL, 0, NULL}
 };
 
@@ -217,5 +444,17 @@ static struct PyModuleDef ctcompress =
 
 PyMODINIT_FUNC PyInit_ctcompress(void)
 {
-  return PyModule_Create(&ctcompress);
+  PyObject* module = PyModule_Create(&ctcompress);
+
+  if (module == NULL)
+    return NULL;
+
+  // Lets ctdecompress tell this build from older ones whose compress holds
+  // the GIL.
+  if (PyModule_AddIntConstant(module, "COMPRESS_RELEASES_GIL", 1) < 0) {
+    Py_DECREF(module);
+    return NULL;
+  }
+
+  return module;
 }
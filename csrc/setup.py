@@ -0,0 +1,31 @@
+'''
+Build the ctcompress extension into sourcefiles/, next to ctdecompress.py:
+
+    python setup.py build_ext --build-lib ../sourcefiles
+
+ctdecompress falls back to its python implementation when the extension is
+missing, so this is optional.  Rebuild after changing compress.c.  A stale
+build is still imported but lacks the newer functions and flags.
+'''
+import sys
+
+from setuptools import setup, Extension
+
+
+# Py_buffer is only in the limited API from 3.11.  Older pythons get a build
+# for their own version.
+if sys.version_info >= (3, 11):
+    limited_api_args = {
+        'define_macros': [('Py_LIMITED_API', '0x030B0000')],
+        'py_limited_api': True
+    }
+else:
+    limited_api_args = dict()
+
+
+setup(
+    name='ctcompress',
+    ext_modules=[
+        Extension('ctcompress', ['compress.c'], **limited_api_args)
+    ]
+)
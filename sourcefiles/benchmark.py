@@ -0,0 +1,367 @@
+'''
+Benchmark seed generation over a fixed matrix of settings.
+
+Each case is one flag combination: every game mode, with Chronosanity, boss
+rando and duplicate characters each on and off, plus mystery.  Seeds are
+fixed ('bench0', 'bench1', ...), so the same commit always generates the same
+roms.  Each case runs in a fresh process so that its peak RSS is its own.
+
+Every case starts with cold caches: the config cache (configcache.py) and
+rom snapshot cache (romsnapshot.py) keep their on-disk stores in a temporary
+directory of the case's own, and the in-memory caches are emptied.  The
+first seed of a case fills the caches, so its time is reported as the cold
+time and the mean over the other seeds as the warm time.
+
+For every seed the report has the per-stage times (see stageprofiler.py),
+the end-to-end time, the key item filler's attempt count, and a hash of the
+output rom (so a diff also shows when output changed).  The report is JSON
+with sorted keys so that reports from two commits can be diffed directly or
+with --compare.
+
+Example:
+    python3 benchmark.py ct.sfc -o bench.json
+    python3 benchmark.py ct.sfc -o new.json --compare bench.json
+'''
+from __future__ import annotations
+import argparse
+import copy
+from dataclasses import asdict
+import hashlib
+import itertools
+import json
+import multiprocessing
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+import typing
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.  Peak RSS is reported as None.
+    resource = None
+
+import bossdata
+import bossrandoevent
+import configcache
+from ctrom import CTRom
+import randomizer
+import randosettings as rset
+import romsnapshot
+import stageprofiler
+
+GF = rset.GameFlags
+GM = rset.GameMode
+
+
+def _apply_forced_flags(settings: rset.Settings):
+    '''Make the flags consistent with the mode and each other.'''
+    forced_off = rset.get_forced_off(settings.game_mode)
+    forced_on = rset.get_forced_on(settings.game_mode)
+
+    for flag in GF:
+        if flag in settings.gameflags:
+            forced_off |= rset.get_forced_off(flag)
+            forced_on |= rset.get_forced_on(flag)
+
+    settings.gameflags = (settings.gameflags | forced_on) & ~forced_off
+
+
+def get_benchmark_cases() -> list[rset.Settings]:
+    '''The fixed benchmark matrix.  Seeds are left blank.'''
+    cases = []
+
+    toggles = (GF.CHRONOSANITY, GF.BOSS_RANDO, GF.DUPLICATE_CHARS)
+    modes = (GM.STANDARD, GM.LOST_WORLDS, GM.ICE_AGE, GM.LEGACY_OF_CYRUS,
+             GM.VANILLA_RANDO)
+
+    for mode in modes:
+        for choices in itertools.product((False, True), repeat=len(toggles)):
+            settings = rset.Settings.get_race_presets()
+            settings.game_mode = mode
+
+            for flag, is_on in zip(toggles, choices):
+                if is_on:
+                    settings.gameflags |= flag
+
+            _apply_forced_flags(settings)
+            cases.append(settings)
+
+    mystery_settings = rset.Settings.get_race_presets()
+    mystery_settings.gameflags |= GF.MYSTERY
+    cases.append(mystery_settings)
+
+    # Forced flags can make two cases the same.  Keep the first.
+    unique_cases = dict()
+    for settings in cases:
+        unique_cases.setdefault(settings.get_flag_string(), settings)
+
+    return list(unique_cases.values())
+
+
+def _get_peak_rss_kib() -> typing.Optional[int]:
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports KiB, macOS reports bytes
+    if sys.platform == 'darwin':
+        peak //= 1024
+
+    return peak
+
+
+def _reset_caches(cache_dir: str):
+    '''
+    Start every cache empty, with the on-disk stores in cache_dir.  Without
+    isolation earlier cases would otherwise warm them.
+    '''
+    configcache.set_default_cache(
+        configcache.BaseConfigCache(cache_dir=f'{cache_dir}/base_configs')
+    )
+    romsnapshot.set_default_cache(
+        romsnapshot.SnapshotCache(cache_dir=f'{cache_dir}/rom_snapshots')
+    )
+
+    bossdata.clear_scaled_row_cache()
+    bossdata.get_progressive_scale_factors.cache_clear()
+    bossrandoevent.clear_placement_cache()
+
+
+def _run_case(rom_path: str, settings: rset.Settings,
+              seeds: list[str]) -> dict:
+    '''Generate each seed with settings.  Runs in its own process.'''
+    with tempfile.TemporaryDirectory(prefix='jot_bench_') as cache_dir:
+        _reset_caches(cache_dir)
+        return _run_case_seeds(rom_path, settings, seeds)
+
+
+def _run_case_seeds(rom_path: str, settings: rset.Settings,
+                    seeds: list[str]) -> dict:
+    start = time.perf_counter()
+    base_ctrom = CTRom.from_file(rom_path, ignore_checksum=True)
+    load_time = time.perf_counter() - start
+
+    seed_reports = []
+    for seed in seeds:
+        case_settings = copy.deepcopy(settings)
+        case_settings.seed = seed
+
+        rando = randomizer.Randomizer.from_ctrom(base_ctrom, case_settings)
+        rando.profiler = stageprofiler.StageProfiler()
+        report = {'seed': seed}
+
+        try:
+            start = time.perf_counter()
+            rando.set_random_config()
+            rando.generate_rom()
+            report['total_time'] = time.perf_counter() - start
+
+            with rando.out_rom.rom_data.getbuffer() as rom_buf:
+                report['rom_sha256'] = hashlib.sha256(rom_buf).hexdigest()
+
+            if rando.fill_stats is not None:
+                report['fill'] = asdict(rando.fill_stats)
+        except Exception:
+            report['error'] = traceback.format_exc()
+
+        report['stages'] = {
+            stats.name: stats.total_time
+            for stats in rando.profiler.stats.values()
+        }
+        seed_reports.append(report)
+
+    return {
+        'flag_string': settings.get_flag_string(),
+        'load_time': load_time,
+        'peak_rss_kib': _get_peak_rss_kib(),
+        'seeds': seed_reports
+    }
+
+
+def _summarize_case(case_report: dict) -> dict:
+    '''Add means over the seeds that succeeded.'''
+    good_seeds = [x for x in case_report['seeds'] if 'error' not in x]
+    case_report['num_failed'] = len(case_report['seeds']) - len(good_seeds)
+
+    if not good_seeds:
+        return case_report
+
+    case_report['mean_total_time'] = statistics.mean(
+        x['total_time'] for x in good_seeds
+    )
+
+    # The first seed fills the caches.  Only compare it with other cold
+    # times.
+    first_seed = case_report['seeds'][0]
+    if 'error' not in first_seed:
+        case_report['cold_total_time'] = first_seed['total_time']
+
+    warm_seeds = [x for x in case_report['seeds'][1:] if 'error' not in x]
+    if warm_seeds:
+        case_report['mean_warm_total_time'] = statistics.mean(
+            x['total_time'] for x in warm_seeds
+        )
+
+    stage_names = []
+    for seed_report in good_seeds:
+        for name in seed_report['stages']:
+            if name not in stage_names:
+                stage_names.append(name)
+
+    # Stages that don't run for a seed (e.g. mystery) count as 0.
+    case_report['mean_stages'] = {
+        name: statistics.mean(x['stages'].get(name, 0.0) for x in good_seeds)
+        for name in stage_names
+    }
+
+    fill_attempts = [x['fill']['attempts'] for x in good_seeds if 'fill' in x]
+    if fill_attempts:
+        case_report['mean_fill_attempts'] = statistics.mean(fill_attempts)
+
+    return case_report
+
+
+def _get_git_commit() -> typing.Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(rom_path: str, seeds_per_case: int = 2,
+                  name_filter: typing.Optional[str] = None,
+                  isolate: bool = True, verbose: bool = True) -> dict:
+    '''
+    Run the benchmark matrix (cases whose flag string contains name_filter
+    if given).  With isolate, each case runs in a fresh spawned process.
+    '''
+    # Check the rom once up front rather than in every case.
+    if not CTRom.validate_ct_rom_file(rom_path):
+        print('Warning: not a vanilla rom.  Results will not be comparable.')
+
+    seeds = [f'bench{i}' for i in range(seeds_per_case)]
+    cases = get_benchmark_cases()
+    if name_filter is not None:
+        cases = [x for x in cases if name_filter in x.get_flag_string()]
+
+    case_reports = dict()
+    start = time.perf_counter()
+
+    context = multiprocessing.get_context('spawn')
+    for settings in cases:
+        flag_string = settings.get_flag_string()
+
+        if isolate:
+            with context.Pool(1) as pool:
+                case_report = pool.apply(_run_case,
+                                         (rom_path, settings, seeds))
+        else:
+            case_report = _run_case(rom_path, settings, seeds)
+
+        case_reports[flag_string] = _summarize_case(case_report)
+
+        if verbose:
+            time_strs = []
+            for key in ('cold_total_time', 'mean_warm_total_time'):
+                value = case_report.get(key)
+                time_strs.append('-' if value is None else f'{value:.2f}s')
+
+            print(f'{flag_string:30} cold {time_strs[0]:>8} '
+                  f'warm {time_strs[1]:>8} '
+                  f'{case_report["num_failed"]} failed')
+
+    return {
+        'meta': {
+            'commit': _get_git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seeds_per_case': seeds_per_case,
+            'isolated': isolate,
+            'wall_time': time.perf_counter() - start
+        },
+        'cases': case_reports
+    }
+
+
+def compare_reports(old: dict, new: dict,
+                    threshold: float = 0.10) -> list[str]:
+    '''
+    Describe cases whose cold or warm time changed by more than threshold
+    (as a fraction) or whose output roms changed.
+    '''
+    lines = []
+
+    for name, new_case in new['cases'].items():
+        old_case = old['cases'].get(name)
+        if old_case is None:
+            lines.append(f'{name}: new case')
+            continue
+
+        for label, key in (('cold', 'cold_total_time'),
+                           ('warm', 'mean_warm_total_time')):
+            old_time = old_case.get(key)
+            new_time = new_case.get(key)
+            if old_time and new_time:
+                change = new_time/old_time - 1
+                if abs(change) > threshold:
+                    lines.append(
+                        f'{name} ({label}): {old_time:.3f}s -> '
+                        f'{new_time:.3f}s ({change:+.0%})'
+                    )
+
+        old_hashes = [x.get('rom_sha256') for x in old_case['seeds']]
+        new_hashes = [x.get('rom_sha256') for x in new_case['seeds']]
+        if old_hashes != new_hashes:
+            lines.append(f'{name}: output roms changed')
+
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark seed generation across game modes and flags.'
+    )
+    parser.add_argument('rom', help='vanilla Chrono Trigger rom')
+    parser.add_argument('-o', '--output', default='benchmark.json',
+                        help='json report to write')
+    parser.add_argument('-n', '--seeds', type=int, default=2,
+                        help='seeds per case')
+    parser.add_argument('--filter',
+                        help='only run cases whose flag string contains this')
+    parser.add_argument('--no-isolate', action='store_true',
+                        help='run every case in this process (faster, but '
+                        'peak RSS is cumulative)')
+    parser.add_argument('--compare',
+                        help='earlier report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative time change to report (default 0.10)')
+
+    args = parser.parse_args()
+
+    report = run_benchmark(args.rom, args.seeds, args.filter,
+                           not args.no_isolate)
+
+    with open(args.output, 'w') as outfile:
+        json.dump(report, outfile, indent=2, sort_keys=True)
+
+    print(f'Wrote {args.output}')
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as infile:
+            old_report = json.load(infile)
+
+        changes = compare_reports(old_report, report, args.threshold)
+        print('\n'.join(changes) if changes else 'No changes.')
+
+
+if __name__ == '__main__':
+    main()
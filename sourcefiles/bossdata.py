@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import collections
 from dataclasses import dataclass, field
+import functools
 import math
+import typing
 from typing import Tuple, Type, TypeVar
 
 import enemyai
+import enemystattable
 import enemytechdb
 from enemystats import EnemyStats
 
@@ -77,6 +81,12 @@ class Boss:
     scheme: BossScheme
     power: int = 0
 
+    # How scale_boss_parts scales this boss's parts in bulk: 'progressive'
+    # or 'linear' with SCALE_OPTIONS as the scale_* options, or None to call
+    # scale_stats for each part.
+    SCALE_KIND = None
+    SCALE_OPTIONS = dict()
+
     @classmethod
     def scale_stats(cls,
                     enemy_id: EnemyID,
@@ -86,18 +96,18 @@ class Boss:
                     from_power: int, to_power: int) -> EnemyStats:
         raise NotImplementedError
 
+    def prepare_scaling(self, new_power: int):
+        '''Called before the boss's parts are scaled to new_power.'''
+        pass
+
     def scale_to_power(
             self, new_power,
             stat_dict: dict[EnemyID, EnemyStats],
             atk_db: enemytechdb.EnemyAttackDB,
             ai_db: enemyai.EnemyAIDB,
     ) -> dict[EnemyID: EnemyStats]:
-        return {
-            part: self.scale_stats(part, stat_dict[part],
-                                   atk_db, ai_db,
-                                   self.power, new_power)
-            for part in list(set(self.scheme.ids))
-        }
+        return scale_boss_parts([(self, self.power, new_power)],
+                                stat_dict, atk_db, ai_db)[0]
 
     # Make a subclass to implement scaling styles
     # Need stats, atk/tech, ai to fully scale.
@@ -107,12 +117,8 @@ class Boss:
             atk_db: enemytechdb.EnemyAttackDB,
             ai_db: enemyai.EnemyAIDB
     ) -> dict[EnemyID: EnemyStats]:
-        return {
-            part: self.scale_stats(part, stat_dict[part],
-                                   atk_db, ai_db,
-                                   self.power, other.power)
-            for part in list(set(self.scheme.ids))
-        }
+        return scale_boss_parts([(self, self.power, other.power)],
+                                stat_dict, atk_db, ai_db)[0]
 
     @classmethod
     def generic_one_spot(cls: Type[T], boss_id, slot, power) -> T:
@@ -554,6 +560,56 @@ def get_eff_mag_hp(level: int):
     return hp/(1-mag_reduction)
 
 
+# Player attack scales superlinearly.  Atk scales roughly linearly with
+# level, but tech power scales too, we need to do something extra.
+# TODO:  Be a little more accurate and model tech power growth.
+def get_hp_scale_factor(
+        from_power: float, to_power: float, max_power: float
+) -> float:
+
+    # This is super contrived.  It just scales from 1 to about 15 with
+    # steeper scaling at the higher end.
+    def hp_marker(level: float, max_level: float):
+        return 1+15*(level/max_level)**1.5
+
+    # print(f'from, marker: {from_power}, {hp_marker(from_power)}')
+    # print(f'  to, marker: {to_power}, {hp_marker(to_power)}')
+    if from_power*to_power == 0:
+        return 0
+    return (
+        hp_marker(to_power, max_power) /
+        hp_marker(from_power, max_power)
+    )
+
+
+# Only a few hundred (from, to, max) powers are ever used, and each one
+# computes player stat growth several times, so keep them all.
+@functools.lru_cache(maxsize=None)
+def get_progressive_scale_factors(
+        from_power: int, to_power: int, max_power: int = 30
+) -> Tuple[float, float, float, int]:
+    '''
+    The offense, magic and hp scale factors and the speed to add when
+    progressively scaling from from_power to to_power.
+    '''
+    off_scale_factor = \
+        get_eff_phys_hp(to_power, max_power) / \
+        get_eff_phys_hp(from_power, max_power)
+    mag_scale_factor = get_eff_mag_hp(to_power)/get_eff_mag_hp(from_power)
+    hp_scale_factor = get_hp_scale_factor(from_power, to_power, max_power)
+
+    # Going to add 1 speed for every  power doubling.
+    # At present, the biggest swing is 5 to 40 which is 3 doublings for
+    # +3 speed.
+    if from_power*to_power == 0:
+        add_speed = 0
+    else:
+        add_speed = math.log(to_power/from_power, 2)
+        add_speed = round(add_speed)
+
+    return off_scale_factor, mag_scale_factor, hp_scale_factor, add_speed
+
+
 # Scale boss depending on stat progression of players
 def progressive_scale_stats(
         enemy_id: EnemyID,
@@ -577,10 +633,8 @@ def progressive_scale_stats(
 
     new_stats = stats.get_copy()
 
-    off_scale_factor = \
-        get_eff_phys_hp(to_power, max_power) / \
-        get_eff_phys_hp(from_power, max_power)
-    mag_scale_factor = get_eff_mag_hp(to_power)/get_eff_mag_hp(from_power)
+    off_scale_factor, mag_scale_factor, hp_scale_factor, add_speed = \
+        get_progressive_scale_factors(from_power, to_power, max_power)
 
     if scale_offense:
         new_offense = stats.offense * off_scale_factor
@@ -600,45 +654,13 @@ def progressive_scale_stats(
         new_stats.level = \
             int(max(1, min(stats.level*mag_scale_factor, 0xFF)))
 
-    # Player attack scales superlinearly.  Atk scales roughly linearly with
-    # level, but tech power scales too, we need to do something extra.
-    # TODO:  Be a little more accurate and model tech power growth.
-    def get_hp_scale_factor(
-            from_power: float, to_power: float, max_power: float
-    ) -> float:
-
-        # This is super contrived.  It just scales from 1 to about 15 with
-        # steeper scaling at the higher end.
-        def hp_marker(level: float, max_level: float):
-            return 1+15*(level/max_level)**1.5
-
-        # print(f'from, marker: {from_power}, {hp_marker(from_power)}')
-        # print(f'  to, marker: {to_power}, {hp_marker(to_power)}')
-        if from_power*to_power == 0:
-            return 0
-        return (
-            hp_marker(to_power, max_power) /
-            hp_marker(from_power, max_power)
-        )
-
-    hp_scale_factor = get_hp_scale_factor(from_power, to_power, max_power)
     if scale_hp:
         new_stats.hp = int(min(stats.hp*hp_scale_factor, 0x7FFF))
 
         if new_stats.hp < 1:
             new_stats.hp = 1
 
-    # Going to add 1 speed for every  power doubling.
-    # At present, the biggest swing is 5 to 40 which is 3 doublings for
-    # +3 speed.
     if scale_speed:
-        if from_power*to_power == 0:
-            add_speed = 0
-        else:
-            add_speed = math.log(to_power/from_power, 2)
-            add_speed = round(add_speed)
-            # print(f'{enemy_id}: adding {add_speed} speed')
-
         new_stats.speed = min(new_stats.speed + add_speed, 16)
 
     # xp to next level is approximately quadratic.  Scale all rewards
@@ -751,20 +773,26 @@ def set_stats_offense(enemy_id: EnemyID,
     if new_offense/0xFF > 1.05:
         remaining_scale = new_offense/0xFF
 
-        # Scale atk 01
         if scale_atk:
-            atk_1_id = stats.secondary_attack_id
-            atk_1 = atk_db.get_atk(atk_1_id)
-            new_power = int(min(atk_1.effect.power * remaining_scale, 0xFF))
-            atk_1.effect.power = new_power
-            new_atk_id = atk_db.append_attack(atk_1)
-            stats.secondary_attack_id = new_atk_id
+            scale_secondary_attack(stats, remaining_scale, atk_db)
 
         stats.offense = 0xFF
     else:
         stats.offense = int(new_offense)
 
 
+# Scale atk 01 to make up for offense past 0xFF.
+def scale_secondary_attack(stats: EnemyStats,
+                           remaining_scale: float,
+                           atk_db: enemytechdb.EnemyAttackDB):
+    atk_1_id = stats.secondary_attack_id
+    atk_1 = atk_db.get_atk(atk_1_id)
+    new_power = int(min(atk_1.effect.power * remaining_scale, 0xFF))
+    atk_1.effect.power = new_power
+    new_atk_id = atk_db.append_attack(atk_1)
+    stats.secondary_attack_id = new_atk_id
+
+
 def linear_scale_stats(enemy_id: EnemyID,
                        stats: EnemyStats,
                        atk_db: enemytechdb.EnemyAttackDB,
@@ -821,11 +849,280 @@ def linear_scale_stats(enemy_id: EnemyID,
     return new_stats
 
 
+# The defaults of progressive_scale_stats and linear_scale_stats
+_PROGRESSIVE_OPTIONS = {
+    'scale_hp': True, 'scale_level': True, 'scale_speed': True,
+    'scale_magic': True, 'scale_offense': True, 'scale_xp': False,
+    'scale_gp': False, 'scale_tp': False, 'scale_techs': True,
+    'scale_atk': True
+}
+
+_LINEAR_OPTIONS = {
+    'scale_hp': True, 'scale_level': True, 'scale_speed': False,
+    'scale_magic': True, 'scale_mdef': False, 'scale_offense': True,
+    'scale_defense': False, 'scale_xp': True, 'scale_gp': True,
+    'scale_tp': True
+}
+
+
+# Scaled rows by how the part is scaled and the part's stat values.  The stat
+# math doesn't depend on the seed, so each row is only computed once per
+# process.  Values are the changed columns and the unclamped new offense.
+# Least recently used rows are evicted once the cache is full.
+_scaled_row_cache: collections.OrderedDict[
+    tuple, Tuple[dict[str, int], float]
+] = collections.OrderedDict()
+_SCALED_ROW_CACHE_SIZE = 8192
+
+
+def clear_scaled_row_cache():
+    _scaled_row_cache.clear()
+
+
+def _get_row_options(boss: Boss) -> dict[str, bool]:
+    if boss.SCALE_KIND == 'progressive':
+        return {**_PROGRESSIVE_OPTIONS, **boss.SCALE_OPTIONS}
+
+    return {**_LINEAR_OPTIONS, **boss.SCALE_OPTIONS}
+
+
+def _get_row_key(boss: Boss, from_power: int, to_power: int,
+                 stats: EnemyStats) -> tuple:
+    return (
+        boss.SCALE_KIND, getattr(boss, 'MAX_LEVEL', None),
+        tuple(sorted(boss.SCALE_OPTIONS.items())), from_power, to_power,
+        enemystattable.get_stat_values(stats)
+    )
+
+
+def _compute_scaled_rows(
+        row_jobs: list[Tuple[Boss, int, int, EnemyID]],
+        stat_dict: dict[EnemyID, EnemyStats]
+) -> list[Tuple[dict[str, int], float]]:
+    '''
+    Scale each (boss, from_power, to_power, part) in one pass over an
+    EnemyStatTable.  Linear rows must have a nonzero from_power.
+    '''
+    np = enemystattable.np
+
+    table = enemystattable.EnemyStatTable(
+        [part for _, _, _, part in row_jobs],
+        [stat_dict[part] for _, _, _, part in row_jobs]
+    )
+    row_options = [_get_row_options(row_job[0]) for row_job in row_jobs]
+
+    row_factors = [
+        get_progressive_scale_factors(from_power, to_power, boss.MAX_LEVEL)
+        if boss.SCALE_KIND == 'progressive' else (1, 1, 1, 0)
+        for boss, from_power, to_power, _ in row_jobs
+    ]
+
+    def get_flags(kind: str, defaults: dict) -> dict[str, np.ndarray]:
+        return {
+            name: np.array([
+                row_job[0].SCALE_KIND == kind and options[name]
+                for row_job, options in zip(row_jobs, row_options)
+            ], dtype=bool)
+            for name in defaults
+        }
+
+    factors = np.array(row_factors, dtype=float).reshape(-1, 4)
+    new_offense = enemystattable.progressive_scale(
+        table, factors[:, 0], factors[:, 1], factors[:, 2],
+        factors[:, 3].astype(int),
+        get_flags('progressive', _PROGRESSIVE_OPTIONS)
+    )
+
+    linear_rows = np.array([row_job[0].SCALE_KIND == 'linear'
+                            for row_job in row_jobs], dtype=bool)
+    if linear_rows.any():
+        scale_factor = np.array([
+            to_power/from_power - 1 if is_linear else 0.0
+            for (_, from_power, to_power, _), is_linear
+            in zip(row_jobs, linear_rows)
+        ])
+        enemystattable.linear_scale(
+            table, scale_factor, get_flags('linear', _LINEAR_OPTIONS),
+            linear_rows
+        )
+
+    return [(table.get_changes(row), float(new_offense[row]))
+            for row in range(len(table))]
+
+
+def _get_scaled_rows(
+        row_jobs: list[Tuple[Boss, int, int, EnemyID]],
+        stat_dict: dict[EnemyID, EnemyStats]
+) -> list[Tuple[dict[str, int], float]]:
+    '''
+    The scaled rows of row_jobs from the cache, computing the missing ones
+    in one pass.
+    '''
+    keys = [
+        _get_row_key(boss, from_power, to_power, stat_dict[part])
+        for boss, from_power, to_power, part in row_jobs
+    ]
+
+    found = dict()
+    missing = dict()
+    for key, row_job in zip(keys, row_jobs):
+        if key in _scaled_row_cache:
+            _scaled_row_cache.move_to_end(key)
+            found[key] = _scaled_row_cache[key]
+        elif key not in missing:
+            missing[key] = row_job
+
+    if missing:
+        rows = _compute_scaled_rows(list(missing.values()), stat_dict)
+        found.update(zip(missing.keys(), rows))
+        _scaled_row_cache.update(zip(missing.keys(), rows))
+
+        while len(_scaled_row_cache) > _SCALED_ROW_CACHE_SIZE:
+            _scaled_row_cache.popitem(last=False)
+
+    return [found[key] for key in keys]
+
+
+def precompute_scaled_stats(
+        boss_data_dict: dict[BossID, Boss],
+        stat_dict: dict[EnemyID, EnemyStats],
+        powers: typing.Optional[typing.Iterable[int]] = None
+):
+    '''
+    Fill the scaled row cache for every boss in boss_data_dict at every power
+    in powers (default: every boss's power, i.e. every spot's power).
+    Nothing is done without numpy.
+    '''
+    if not enemystattable.numpy_available:
+        return
+
+    if powers is None:
+        powers = sorted(set(boss.power for boss in boss_data_dict.values()))
+    else:
+        powers = list(powers)
+
+    # Not every boss can be scaled to every power (e.g. past its
+    # MAX_LEVEL), but no seed asks for those.
+    def can_scale(boss: Boss, power: int) -> bool:
+        if boss.SCALE_KIND == 'linear':
+            return boss.power != 0
+
+        try:
+            get_progressive_scale_factors(boss.power, power, boss.MAX_LEVEL)
+        except (ZeroDivisionError, ValueError):
+            return False
+
+        return True
+
+    row_jobs = [
+        (boss, boss.power, power, part)
+        for boss in boss_data_dict.values()
+        if boss.SCALE_KIND is not None
+        for power in powers
+        if can_scale(boss, power)
+        for part in set(boss.scheme.ids)
+    ]
+
+    if row_jobs:
+        _get_scaled_rows(row_jobs, stat_dict)
+
+
+def scale_boss_parts(
+        jobs: list[Tuple[Boss, int, int]],
+        stat_dict: dict[EnemyID, EnemyStats],
+        atk_db: enemytechdb.EnemyAttackDB,
+        ai_db: enemyai.EnemyAIDB
+) -> list[dict[EnemyID, EnemyStats]]:
+    '''
+    Scale the parts of each (boss, from_power, to_power) in jobs.  Returns
+    the scaled stats by part for each job.  The results are the same as
+    calling each boss's scale_stats on each of its parts in turn.
+
+    With numpy, the stat math for every part runs in one pass over an
+    EnemyStatTable, and parts that were scaled the same way before are
+    looked up instead.  Scaling attacks and techs changes atk_db and ai_db,
+    so that part is still done one part at a time in job order.
+    '''
+    for boss, from_power, to_power in jobs:
+        boss.prepare_scaling(to_power)
+
+    job_parts = [list(set(boss.scheme.ids)) for boss, _, _ in jobs]
+
+    if not enemystattable.numpy_available:
+        return [
+            {
+                part: boss.scale_stats(part, stat_dict[part], atk_db, ai_db,
+                                       from_power, to_power)
+                for part in parts
+            }
+            for (boss, from_power, to_power), parts in zip(jobs, job_parts)
+        ]
+
+    # linear_scale_stats leaves bosses with from_power 0 alone.
+    def is_bulk_scaled(boss: Boss, from_power: int) -> bool:
+        return boss.SCALE_KIND is not None and \
+            not (boss.SCALE_KIND == 'linear' and from_power == 0)
+
+    # One row per part of each boss that can be scaled in bulk
+    row_jobs = [
+        (boss, from_power, to_power, part)
+        for (boss, from_power, to_power), parts in zip(jobs, job_parts)
+        if is_bulk_scaled(boss, from_power)
+        for part in parts
+    ]
+    scaled_rows = iter(_get_scaled_rows(row_jobs, stat_dict))
+
+    results = []
+    for (boss, from_power, to_power), parts in zip(jobs, job_parts):
+        scaled_stats = dict()
+
+        for part in parts:
+            stats = stat_dict[part]
+
+            if boss.SCALE_KIND is None:
+                scaled_stats[part] = boss.scale_stats(
+                    part, stats, atk_db, ai_db, from_power, to_power
+                )
+                continue
+
+            if not is_bulk_scaled(boss, from_power):
+                print('Warning: from_power == 0.  Not scaling')
+                scaled_stats[part] = stats
+                continue
+
+            changes, new_offense = next(scaled_rows)
+            new_stats = enemystattable.apply_changes(stats, changes)
+
+            if boss.SCALE_KIND == 'progressive':
+                options = _get_row_options(boss)
+                off_scale_factor, mag_scale_factor, _, _ = \
+                    get_progressive_scale_factors(from_power, to_power,
+                                                  boss.MAX_LEVEL)
+                remaining_scale = new_offense/0xFF
+
+                if options['scale_offense'] and options['scale_atk'] and \
+                   remaining_scale > 1.05:
+                    scale_secondary_attack(new_stats, remaining_scale,
+                                           atk_db)
+
+                if options['scale_techs']:
+                    scale_enemy_techs(part, stats,
+                                      off_scale_factor, mag_scale_factor,
+                                      atk_db, ai_db)
+
+            scaled_stats[part] = new_stats
+
+        results.append(scaled_stats)
+
+    return results
+
+
 # New scaling that's supposed to be based on how quickly player stats are
 # progressing.
 class ProgressiveScaleBoss(Boss):
 
     MAX_LEVEL = 30
+    SCALE_KIND = 'progressive'
 
     @classmethod
     def scale_stats(cls,
@@ -836,7 +1133,8 @@ class ProgressiveScaleBoss(Boss):
                     from_power: int, to_power: int) -> EnemyStats:
         return progressive_scale_stats(enemy_id, stats,
                                        atk_db, ai_db,
-                                       from_power, to_power, cls.MAX_LEVEL)
+                                       from_power, to_power, cls.MAX_LEVEL,
+                                       **cls.SCALE_OPTIONS)
 
 
 class VRScaleBoss(ProgressiveScaleBoss):
@@ -919,6 +1217,8 @@ class CopyStatsScaleBoss(Boss):
 # This isn't used anymore, but we'll keep it around
 class LinearScaleBoss(Boss):
 
+    SCALE_KIND = 'linear'
+
     @classmethod
     def scale_stats(cls,
                     enemy_id: EnemyID,
@@ -933,6 +1233,12 @@ class LinearScaleBoss(Boss):
 class SonOfSunScaleBoss(Boss):
 
     MAX_LEVEL = 30
+    SCALE_KIND = 'progressive'
+
+    # If you scale SoS's flame atk, then it will do more/less damage to
+    # the eyeball.  Counterintuitively, you'd want to reduce the flame's
+    # atk to make SoS harder.
+    SCALE_OPTIONS = {'scale_offense': False, 'scale_hp': False}
 
     @classmethod
     def scale_stats(cls,
@@ -941,16 +1247,11 @@ class SonOfSunScaleBoss(Boss):
                     atk_db: enemytechdb.EnemyAttackDB,
                     ai_db: enemyai.EnemyAIDB,
                     from_power: int, to_power: int) -> EnemyStats:
-
-        # If you scale SoS's flame atk, then it will do more/less damage to
-        # the eyeball.  Counterintuitively, you'd want to reduce the flame's
-        # atk to make SoS harder.
         return progressive_scale_stats(enemy_id, stats,
                                        atk_db, ai_db,
                                        from_power, to_power,
                                        cls.MAX_LEVEL,
-                                       scale_offense=False,
-                                       scale_hp=False)
+                                       **cls.SCALE_OPTIONS)
 
 
 class VRScaleSonOfSon(SonOfSunScaleBoss):
@@ -974,26 +1275,5 @@ class VRScaleSonOfSon(SonOfSunScaleBoss):
         del self.scheme.slots[last_ind:]
         del self.scheme.disps[last_ind:]
 
-    def scale_to_power(
-            self, new_power,
-            stat_dict: dict[EnemyID, EnemyStats],
-            atk_db: enemytechdb.EnemyAttackDB,
-            ai_db: enemyai.EnemyAIDB,
-    ) -> dict[EnemyID: EnemyStats]:
+    def prepare_scaling(self, new_power: int):
         self.update_scheme(new_power)
-
-        return SonOfSunScaleBoss.scale_to_power(
-            self, new_power, stat_dict, atk_db, ai_db
-        )
-
-    def scale_relative_to(
-            self, other: Boss,
-            stat_dict: dict[EnemyID, EnemyStats],
-            atk_db: enemytechdb.EnemyAttackDB,
-            ai_db: enemyai.EnemyAIDB
-    ) -> dict[EnemyID: EnemyStats]:
-        self.update_scheme(other.power)
-
-        return SonOfSunScaleBoss.scale_relative_to(
-            self, other, stat_dict, atk_db, ai_db
-        )
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
-import copy
+import collections
 from collections.abc import Callable
 import random
 
 from byteops import to_little_endian
 
 # from ctdecompress import compress, decompress, get_compressed_length
+import bossdata
 from bossdata import BossScheme, get_default_boss_assignment
 import bossscaler
 import bossspot
@@ -15,7 +16,8 @@ from ctenums import LocID, BossID, EnemyID, CharID, Element, StatusEffect,\
 from ctevent import Event, free_event, get_loc_event_ptr
 from ctrom import CTRom
 import enemyrewards
-from eventcommand import EventCommand as EC, get_command, FuncSync
+from eventcommand import EventCommand as EC, get_command, FuncSync, \
+    decode_command
 from eventfunction import EventFunction as EF
 # from eventscript import get_location_script, get_loc_event_ptr
 from freespace import FreeSpace as FS
@@ -1157,17 +1159,19 @@ def set_object_boss(script: Event, obj_id: int, boss_id: int, boss_slot: int,
     pos = start
     while pos < end:
 
-        cmd = get_command(script.data, pos)
+        cmd_id, cmd_len, args = decode_command(script.data, pos)
 
-        if cmd.command in EC.fwd_jump_commands and ignore_jumps:
-            pos += (cmd.args[-1] - 1)
-        elif cmd.command == 0x83:
-            is_static = cmd.args[1] & 0x80
-            cmd.args[0], cmd.args[1] = boss_id, (boss_slot | is_static)
-            script.data[pos:pos+len(cmd)] = cmd.to_bytearray()
+        if cmd_id in EC.fwd_jump_commands and ignore_jumps:
+            pos += (args[-1] - 1)
+        elif cmd_id == 0x83:
+            # Load enemy: 83 [enemy id] [slot | static flag]
+            is_static = args[1] & 0x80
+            args.release()
+            script.data[pos+1] = boss_id
+            script.data[pos+2] = boss_slot | is_static
             break
 
-        pos += len(cmd)
+        pos += cmd_len
 
 
 def set_object_coordinates(script: Event, obj_id: int, x: int, y: int,
@@ -1180,11 +1184,12 @@ def set_object_coordinates(script: Event, obj_id: int, x: int, y: int,
     pos = start
     while pos < end:
 
-        cmd = get_command(script.data, pos)
+        cmd_id, cmd_len, args = decode_command(script.data, pos)
 
-        if cmd.command in EC.fwd_jump_commands and ignore_jumps:
-            pos += (cmd.args[-1] - 1)
-        elif cmd.command in [0x8B, 0x8D]:
+        if cmd_id in EC.fwd_jump_commands and ignore_jumps:
+            pos += (args[-1] - 1)
+        elif cmd_id in [0x8B, 0x8D]:
+            args.release()
             new_coord_cmd = EC.set_object_coordinates(x, y, shift)
             # print(f"x={x:04X}, y={y:04X}")
             # print(new_coord_cmd)
@@ -1193,17 +1198,17 @@ def set_object_coordinates(script: Event, obj_id: int, x: int, y: int,
             # The pixel-based and tile-based commands have different lengths.
             # If the new coordinates don't match the old, you have to do a
             # delete/insert.
-            if new_coord_cmd.command == cmd.command:
+            if new_coord_cmd.command == cmd_id:
                 script.data[pos:pos+len(new_coord_cmd)] = \
                     new_coord_cmd.to_bytearray()
             else:
                 script.insert_commands(new_coord_cmd.to_bytearray(),
-                                       pos+len(cmd))
+                                       pos+cmd_len)
                 script.delete_commands(pos, 1)
 
             break
 
-        pos += len(cmd)
+        pos += cmd_len
 
 
 # Make a barebones object to make a boss part and hide it.
@@ -1265,14 +1270,14 @@ def duplicate_zenan_bridge(ctrom: CTRom, dup_loc_id: LocID):
     fsrom = ctrom.rom_data
     script_man = ctrom.script_manager
 
-    # Copy the exists of the original Zenan Bridge to the copy
-    exits = LocExits.from_rom(fsrom)
+    # Copy the exists of the original Zenan Bridge to the copy.  The exit
+    # table is written back at the end of rom generation.
+    exits = ctrom.get_loc_exits()
     duplicate_map(fsrom, exits, LocID.ZENAN_BRIDGE, dup_loc_id)
-    exits.write_to_fsrom(fsrom)
 
     # Copy the script of the original Zenan Bridge to the copy
     script = script_man.get_script(LocID.ZENAN_BRIDGE)
-    new_script = copy.deepcopy(script)
+    new_script = script.clone()
 
     # In the original script, the party runs off the screen, the screen
     # scrolls left, and then the Zombor fight begins.  To avoid sprite limits
@@ -1318,14 +1323,11 @@ def duplicate_zenan_bridge(ctrom: CTRom, dup_loc_id: LocID):
 
     # Now, trim down the event for the duplicate map by removing the skeletons
     # other than the ones that make Zombor and the guards.
-    unneeded_objs = sorted(
-        (0x0D, 0x0E, 0x0F, 0x10, 0x11, 0x12, 0x15, 0x16, 0x17, 0x0F,
-         0x0E, 0x0D),
-        reverse=True
-    )
-
-    for obj in unneeded_objs:
-        new_script.remove_object(obj)
+    # These used to be removed one at a time as 0x17, 0x16, 0x15, 0x12,
+    # 0x11, 0x10, 0x0F, 0x0F, 0x0E, 0x0E, 0x0D, 0x0D, which takes out
+    # objects 0x0D-0x18 of the original script.
+    unneeded_objs = range(0x0D, 0x19)
+    new_script.remove_objects(unneeded_objs)
 
     # Trim down obj0, func0 so that all it does is get the party in position
     # for the fight... and preserve the string index of course.  Nobody
@@ -1357,11 +1359,9 @@ def duplicate_maps_on_ctrom(ctrom: CTRom):
     script_man = ctrom.script_manager
 
     # First do Heckran's Cave Passageways
-    exits = LocExits.from_rom(fsrom)
+    exits = ctrom.get_loc_exits()
     duplicate_heckran_map(fsrom, exits, LocID.HECKRAN_CAVE_NEW)
 
-    exits.write_to_fsrom(fsrom)
-
     script = script_man.get_script(LocID.HECKRAN_CAVE_PASSAGEWAYS)
 
     # Notes for Hecrkan editing:
@@ -1371,11 +1371,10 @@ def duplicate_maps_on_ctrom(ctrom: CTRom):
     #   - Can clean up object 0 because it controls multiple encounters, but
     #     There's no real value to doing so.
 
-    new_script = copy.deepcopy(script)
+    new_script = script.clone()
     del_objs = [0x18, 0x17, 0x16, 0x15, 0x14, 0x13, 0x12, 0x11, 0x10, 0xF,
                 0xE, 0xC, 2, 1]
-    for x in del_objs:
-        new_script.remove_object(x)
+    new_script.remove_objects(del_objs)
 
     script_man.set_script(new_script, LocID.HECKRAN_CAVE_NEW)
 
@@ -1418,7 +1417,7 @@ def duplicate_maps_on_ctrom(ctrom: CTRom):
 
     # Copy and edit script to remove objects
     script = script_man.get_script(LocID.KINGS_TRIAL)
-    new_script = copy.deepcopy(script)
+    new_script = script.clone()
 
     # Can delete:
     #   - Object 0xB: The false witness against the king
@@ -1428,8 +1427,7 @@ def duplicate_maps_on_ctrom(ctrom: CTRom):
     # be changed, but it's worth it?
 
     del_objs = [0x19, 0x0C, 0x0B]
-    for x in del_objs:
-        new_script.remove_object(x)
+    new_script.remove_objects(del_objs)
 
     # New Yakra XII object is 0xB for boss rando purposes
     script_man.set_script(new_script, LocID.KINGS_TRIAL_NEW)
@@ -1458,8 +1456,7 @@ def duplicate_maps(fsrom: FS):
 
     del_objs = [0x18, 0x17, 0x16, 0x15, 0x14, 0x13, 0x12, 0x11, 0x10, 0xF,
                 0xE, 0xC, 2, 1]
-    for x in del_objs:
-        script.remove_object(x)
+    script.remove_objects(del_objs)
 
     free_event(fsrom, 0xC0)  # New Heckran location id
     Event.write_to_rom_fs(fsrom, 0xC0, script)
@@ -1515,8 +1512,7 @@ def duplicate_maps(fsrom: FS):
     # be changed, but it's worth it?
 
     del_objs = [0x19, 0x0C, 0x0B]
-    for x in del_objs:
-        script.remove_object(x)
+    script.remove_objects(del_objs)
 
     # New Yakra XII object is 0xB
 
@@ -1876,13 +1872,25 @@ def scale_bosses_given_assignment(settings: rset.Settings,
             stats = bossscaler.get_ranked_boss_stats(boss_id, rank, config)
             config.enemy_dict.update(stats)
 
-    for location in settings.ro_settings.loc_list:
+    # Scale every spot's boss in one pass.  Nothing is written back to
+    # config.enemy_dict until the end, so this is the same as scaling each
+    # boss relative to the original in the loop below.
+    locations = settings.ro_settings.loc_list
+    all_scaled_stats = bossdata.scale_boss_parts(
+        [
+            (orig_data[current_assignment[location]],
+             orig_data[current_assignment[location]].power,
+             orig_data[default_assignment[location]].power)
+            for location in locations
+        ],
+        config.enemy_dict,
+        config.enemy_atkdb,
+        config.enemy_aidb
+    )
+
+    for location, scaled_stats in zip(locations, all_scaled_stats):
         orig_boss = orig_data[default_assignment[location]]
         new_boss = orig_data[current_assignment[location]]
-        scaled_stats = new_boss.scale_relative_to(orig_boss,
-                                                  config.enemy_dict,
-                                                  config.enemy_atkdb,
-                                                  config.enemy_aidb)
 
         # Update rewards to match original boss
         # TODO: This got too big.  Break into own function?
@@ -2296,40 +2304,95 @@ def randomize_midbosses(settings: rset.Settings, config: cfg.RandoConfig):
     config.enemy_atkdb.set_tech(obstacle, 0x58)
 
 
+# Each boss spot and the function which puts a boss there.  A function only
+# edits its spot's script, though some also adjust the BossScheme to fit the
+# spot (e.g. reordering parts).
+BOSS_SPOT_FNS: dict[LocID, Callable[[CTRom, BossScheme], None]] = {
+    LocID.MANORIA_COMMAND: set_manoria_boss,
+    LocID.CAVE_OF_MASAMUNE: set_denadoro_boss,
+    LocID.REPTITE_LAIR_AZALA_ROOM: set_reptite_lair_boss,
+    LocID.MAGUS_CASTLE_FLEA: set_magus_castle_flea_spot_boss,
+    LocID.MAGUS_CASTLE_SLASH: set_magus_castle_slash_spot_boss,
+    LocID.GIANTS_CLAW_TYRANO: set_giants_claw_boss,
+    LocID.TYRANO_LAIR_NIZBEL: set_tyrano_lair_midboss,
+    LocID.ZEAL_PALACE_THRONE_NIGHT: set_zeal_palace_boss,
+    LocID.ZENAN_BRIDGE_BOSS: set_zenan_bridge_boss,
+    LocID.DEATH_PEAK_GUARDIAN_SPAWN: set_death_peak_boss,
+    LocID.BLACK_OMEN_GIGA_MUTANT: set_giga_mutant_spot_boss,
+    LocID.BLACK_OMEN_TERRA_MUTANT: set_terra_mutant_spot_boss,
+    LocID.BLACK_OMEN_ELDER_SPAWN: set_elder_spawn_spot_boss,
+    LocID.HECKRAN_CAVE_NEW: set_heckrans_cave_boss,
+    LocID.KINGS_TRIAL_NEW: set_kings_trial_boss,
+    LocID.OZZIES_FORT_FLEA_PLUS: set_ozzies_fort_flea_plus_spot_boss,
+    LocID.OZZIES_FORT_SUPER_SLASH: set_ozzies_fort_super_slash_spot_boss,
+    LocID.SUN_PALACE: set_sun_palace_boss,
+    LocID.SUNKEN_DESERT_DEVOURER: set_desert_boss,
+    LocID.OCEAN_PALACE_TWIN_GOLEM: set_twin_golem_spot,
+    LocID.GENO_DOME_MAINFRAME: set_geno_dome_boss,
+    LocID.MT_WOE_SUMMIT: set_mt_woe_boss,
+    LocID.ARRIS_DOME_GUARDIAN_CHAMBER: set_arris_dome_boss
+}
+
+
+# Placed bosses keyed by spot, the content hash of the spot's script before
+# the boss was placed, and the boss scheme.  The placement only depends on
+# these, so seeds made from the same base rom reuse the edited script
+# instead of searching and editing it again.  Least recently used
+# placements are evicted once the cache is full.
+_placement_cache: collections.OrderedDict[tuple, tuple[Event, tuple]] = \
+    collections.OrderedDict()
+_PLACEMENT_CACHE_SIZE = 1024
+
+
+def clear_placement_cache():
+    _placement_cache.clear()
+
+
+def _get_scheme_key(boss: BossScheme) -> tuple:
+    return (
+        tuple(boss.ids),
+        tuple(tuple(disp) for disp in boss.disps),
+        tuple(boss.slots)
+    )
+
+
+def place_boss(ctrom: CTRom, loc_id: LocID, boss: BossScheme):
+    '''
+    Put boss in the spot at loc_id.  If the same boss was already put in
+    the same script, a copy of the edited script is used instead.
+    '''
+    script_manager = ctrom.script_manager
+    script = script_manager.get_script(loc_id)
+    key = (loc_id, script.get_content_hash(), _get_scheme_key(boss))
+
+    if key in _placement_cache:
+        _placement_cache.move_to_end(key)
+        placed_script, (ids, disps, slots) = _placement_cache[key]
+        script_manager.set_script(placed_script.clone(), loc_id)
+
+        # Match the changes the spot's function made to the scheme.
+        boss.ids[:] = ids
+        boss.disps[:] = disps
+        boss.slots[:] = slots
+        return
+
+    BOSS_SPOT_FNS[loc_id](ctrom, boss)
+
+    _placement_cache[key] = (
+        script_manager.get_script(loc_id).clone(),
+        (list(boss.ids), list(boss.disps), list(boss.slots))
+    )
+
+    while len(_placement_cache) > _PLACEMENT_CACHE_SIZE:
+        _placement_cache.popitem(last=False)
+
+
 def write_bosses_to_ctrom(ctrom: CTRom, config: cfg.RandoConfig):
 
     # Config should have a list of what bosses are to be placed where, so
     # now it's just a matter of writing them to the ctrom.
 
-    # Associate each boss location with the function which sets that
-    # location's boss.
-    assign_fn_dict = {
-        LocID.MANORIA_COMMAND: set_manoria_boss,
-        LocID.CAVE_OF_MASAMUNE: set_denadoro_boss,
-        LocID.REPTITE_LAIR_AZALA_ROOM: set_reptite_lair_boss,
-        LocID.MAGUS_CASTLE_FLEA: set_magus_castle_flea_spot_boss,
-        LocID.MAGUS_CASTLE_SLASH: set_magus_castle_slash_spot_boss,
-        LocID.GIANTS_CLAW_TYRANO: set_giants_claw_boss,
-        LocID.TYRANO_LAIR_NIZBEL: set_tyrano_lair_midboss,
-        LocID.ZEAL_PALACE_THRONE_NIGHT: set_zeal_palace_boss,
-        LocID.ZENAN_BRIDGE_BOSS: set_zenan_bridge_boss,
-        LocID.DEATH_PEAK_GUARDIAN_SPAWN: set_death_peak_boss,
-        LocID.BLACK_OMEN_GIGA_MUTANT: set_giga_mutant_spot_boss,
-        LocID.BLACK_OMEN_TERRA_MUTANT: set_terra_mutant_spot_boss,
-        LocID.BLACK_OMEN_ELDER_SPAWN: set_elder_spawn_spot_boss,
-        LocID.HECKRAN_CAVE_NEW: set_heckrans_cave_boss,
-        LocID.KINGS_TRIAL_NEW: set_kings_trial_boss,
-        LocID.OZZIES_FORT_FLEA_PLUS: set_ozzies_fort_flea_plus_spot_boss,
-        LocID.OZZIES_FORT_SUPER_SLASH: set_ozzies_fort_super_slash_spot_boss,
-        LocID.SUN_PALACE: set_sun_palace_boss,
-        LocID.SUNKEN_DESERT_DEVOURER: set_desert_boss,
-        LocID.OCEAN_PALACE_TWIN_GOLEM: set_twin_golem_spot,
-        LocID.GENO_DOME_MAINFRAME: set_geno_dome_boss,
-        LocID.MT_WOE_SUMMIT: set_mt_woe_boss,
-        LocID.ARRIS_DOME_GUARDIAN_CHAMBER: set_arris_dome_boss
-    }
-
-    # Now do the writing. Only to locations in the above dict.  Only if the
+    # Now do the writing. Only to locations in BOSS_SPOT_FNS.  Only if the
     # assignment differs from default.
 
     default_assignment = get_default_boss_assignment()
@@ -2341,18 +2404,17 @@ def write_bosses_to_ctrom(ctrom: CTRom, config: cfg.RandoConfig):
             # print(f"Not assigning to {loc}.  No change from default.")
             pass
         else:
-            if loc not in assign_fn_dict.keys():
+            if loc not in BOSS_SPOT_FNS.keys():
                 raise SystemExit(
                     f"Error: Tried assigning to {loc}.  Location not "
                     "supported for boss randomization."
                 )
             else:
-                assign_fn = assign_fn_dict[loc]
                 boss_id = current_assignment[loc]
                 boss_scheme = config.boss_data_dict[boss_id].scheme
                 # print(f"Writing {boss_id} to {loc}")
                 # print(f"{boss_scheme}")
-                assign_fn(ctrom, boss_scheme)
+                place_boss(ctrom, loc, boss_scheme)
 
     # New fun sprite bug:  Enemy 0x4F was a frog before it was turned into
     # the twin golem.  Turning it into other bosses can make for pink screens
@@ -1,5 +1,6 @@
 import copy
 import random
+import typing
 
 from techdb import TechDB
 from byteops import get_record, set_record, to_little_endian, \
@@ -21,23 +22,32 @@ def write_config(settings: rset.Settings, config: cfg.RandoConfig):
     write_items_to_config(settings, config)
 
 
-# This needs to be called BEFORE assigning key items
-def write_pcs_to_config(settings: rset.Settings, config: cfg.RandoConfig):
-    # First, choose the locations for each character
-    recruit_spots = config.char_assign_dict.keys()
-
+def get_char_assignment(
+        settings: rset.Settings,
+        recruit_spots: typing.Iterable[RecruitID]
+) -> dict[RecruitID, CharID]:
+    '''
+    Choose the character at each recruit spot.  Only uses the settings, so
+    the key item logic can be run without the rest of the config.
+    '''
     chars = [CharID(i) for i in range(7)]
     random.shuffle(chars)
 
+    if rset.GameMode.LEGACY_OF_CYRUS == settings.game_mode:
+        return legacyofcyrus.get_character_assignment()
+
     key_val = zip(recruit_spots, chars)
-    loc_assign_dict = {recruit_id: char for recruit_id, char in key_val}
+    return {recruit_id: char for recruit_id, char in key_val}
+
+
+# This needs to be called BEFORE assigning key items
+def write_pcs_to_config(settings: rset.Settings, config: cfg.RandoConfig):
+    # First, choose the locations for each character
+    loc_assign_dict = get_char_assignment(settings,
+                                          config.char_assign_dict.keys())
 
     char_man = config.char_manager
     lost_worlds = (rset.GameMode.LOST_WORLDS == settings.game_mode)
-    loc = (rset.GameMode.LEGACY_OF_CYRUS == settings.game_mode)
-
-    if loc:
-        loc_assign_dict = legacyofcyrus.get_character_assignment()
 
     # Scale starting stats depending on the location assignment
     for recruit_spot in config.char_assign_dict.keys():
@@ -0,0 +1,329 @@
+'''
+Cache for the parts of the base RandoConfig that are read from the rom.
+
+Building a base config means parsing enemies, shops, items, characters, techs
+and enemy AI/attacks out of a patched rom.  None of this depends on the seed,
+so the parsed objects are built once per (rom, patch set) and each seed gets
+its own clone.
+
+Entries are keyed by the romsnapshot key of the rom they were read from, so
+a change to the rom or to any patch gives a new key.
+
+The cache lives in memory unless a directory is given.  enable_disk_cache
+turns on the on-disk store for the default cache (by default in the user's
+cache directory).  Each on-disk entry records CACHE_FORMAT_VERSION and a hash
+of the source of the parsing modules and of every module which defines a
+class in the entry.  An entry is only used while all of these still match,
+so a code change can not resurrect an old pickle.
+
+Clones are made by unpickling a stored blob.  This is much cheaper than
+parsing the rom again and is faster than copy.deepcopy for these objects.
+'''
+from __future__ import annotations
+from collections import OrderedDict
+import functools
+import hashlib
+import io
+import os
+import pickle
+import sys
+import types
+import typing
+
+import bossdata
+import enemyai
+import enemystats
+import enemytechdb
+import itemdata
+import randoconfig as cfg
+import techdb
+
+
+# Bump when the layout of the on-disk entries changes.
+CACHE_FORMAT_VERSION = 2
+
+# The modules which parse the cached objects out of the rom
+_PARSER_MODULES = (cfg, bossdata, enemyai, enemystats, enemytechdb, itemdata,
+                   techdb)
+
+_SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_user_cache_dir() -> str:
+    '''The per-user directory for the on-disk store.'''
+    cache_home = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(cache_home, 'jetsoftime', 'base_configs')
+
+
+@functools.lru_cache(maxsize=None)
+def _get_module_hash(module_name: str) -> typing.Optional[str]:
+    '''
+    Hash the source of a module.  Returns None if the module or its source
+    is unavailable (e.g. a frozen executable).
+    '''
+    module = sys.modules.get(module_name)
+    if module is None:
+        return None
+
+    try:
+        with open(module.__file__, 'rb') as infile:
+            return hashlib.sha256(infile.read()).hexdigest()
+    except (OSError, TypeError, AttributeError):
+        return None
+
+
+def _is_source_module(module_name: str) -> bool:
+    '''Is the module one of the randomizer's own (not stdlib or numpy)?'''
+    path = getattr(sys.modules.get(module_name), '__file__', None)
+    if path is None:
+        return False
+
+    return os.path.dirname(os.path.abspath(path)) == _SOURCE_DIR
+
+
+def _get_code_fingerprint() -> typing.Optional[str]:
+    '''
+    Hash the source of the parsing modules.  Returns None if any source is
+    unavailable.
+    '''
+    hasher = hashlib.sha256()
+    hasher.update(f'{CACHE_FORMAT_VERSION}'.encode('ascii'))
+
+    for module in _PARSER_MODULES:
+        module_hash = _get_module_hash(module.__name__)
+        if module_hash is None:
+            return None
+        hasher.update(module_hash.encode('ascii'))
+
+    return hasher.hexdigest()
+
+
+class _ModuleRecorder(pickle.Pickler):
+    '''Pickler which records the module of every class it pickles.'''
+
+    def __init__(self, file, protocol):
+        pickle.Pickler.__init__(self, file, protocol)
+        self.module_names = set()
+
+    def reducer_override(self, obj):
+        if isinstance(obj, (type, types.FunctionType)):
+            self.module_names.add(obj.__module__)
+        else:
+            self.module_names.add(type(obj).__module__)
+
+        return NotImplemented
+
+
+def _dump(obj) -> tuple[bytes, set[str]]:
+    '''
+    Pickle obj.  Also returns the names of the modules which define the
+    classes used by the pickle.
+    '''
+    outfile = io.BytesIO()
+    pickler = _ModuleRecorder(outfile, pickle.HIGHEST_PROTOCOL)
+    pickler.dump(obj)
+
+    return outfile.getvalue(), pickler.module_names
+
+
+def _get_entry_header(
+        module_names: typing.Iterable[str]
+) -> typing.Optional[dict]:
+    '''
+    The header which goes in front of an on-disk entry.  Returns None if
+    the source of any module is unavailable.
+    '''
+    module_names = {name for name in module_names if _is_source_module(name)}
+    module_names.update(module.__name__ for module in _PARSER_MODULES)
+
+    module_hashes = dict()
+    for module_name in sorted(module_names):
+        module_hash = _get_module_hash(module_name)
+        if module_hash is None:
+            return None
+
+        module_hashes[module_name] = module_hash
+
+    return {'version': CACHE_FORMAT_VERSION, 'modules': module_hashes}
+
+
+def _is_header_current(header) -> bool:
+    if not isinstance(header, dict) or \
+       header.get('version') != CACHE_FORMAT_VERSION:
+        return False
+
+    modules = header.get('modules')
+    if not isinstance(modules, dict):
+        return False
+
+    for module_name, module_hash in modules.items():
+        # Importing a module which no longer exists would fail anyway.
+        if module_name not in sys.modules:
+            try:
+                __import__(module_name)
+            except ImportError:
+                return False
+
+        if _get_module_hash(module_name) != module_hash:
+            return False
+
+    return True
+
+
+class BaseConfigCache:
+    '''
+    LRU cache of pickled config objects with an optional on-disk store.
+    '''
+
+    def __init__(self, max_entries: int = 16,
+                 cache_dir: typing.Optional[str] = None,
+                 max_disk_entries: int = 32):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.blobs: OrderedDict[str, bytes] = OrderedDict()
+
+        self.cache_dir = cache_dir
+        self.code_fingerprint = _get_code_fingerprint()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __get_path(self, key: str) -> typing.Optional[str]:
+        if self.cache_dir is None or self.code_fingerprint is None:
+            return None
+
+        hasher = hashlib.sha256()
+        hasher.update(self.code_fingerprint.encode('ascii'))
+        hasher.update(key.encode('ascii'))
+
+        return os.path.join(self.cache_dir, f'{hasher.hexdigest()}.config')
+
+    def __get_blob(self, key: str) -> typing.Optional[bytes]:
+        if key in self.blobs:
+            self.blobs.move_to_end(key)
+            return self.blobs[key]
+
+        path = self.__get_path(key)
+        if path is None:
+            return None
+
+        try:
+            with open(path, 'rb') as infile:
+                header = pickle.load(infile)
+                if not _is_header_current(header):
+                    return None
+
+                blob = infile.read()
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+                ImportError, ValueError):
+            return None
+
+        self.__store_memory(key, blob)
+        return blob
+
+    def __store_memory(self, key: str, blob: bytes):
+        self.blobs[key] = blob
+        self.blobs.move_to_end(key)
+
+        while len(self.blobs) > self.max_entries:
+            self.blobs.popitem(last=False)
+
+    def __store(self, key: str, blob: bytes, module_names: set[str]):
+        self.__store_memory(key, blob)
+
+        path = self.__get_path(key)
+        if path is None:
+            return
+
+        header = _get_entry_header(module_names)
+        if header is None:
+            return
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as outfile:
+                pickle.dump(header, outfile, pickle.HIGHEST_PROTOCOL)
+                outfile.write(blob)
+            os.replace(tmp_path, path)
+
+            self.__prune_disk()
+        except OSError:
+            pass
+
+    def __prune_disk(self):
+        '''Keep only the most recent max_disk_entries entries on disk.'''
+        paths = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.endswith('.config')
+        ]
+
+        if len(paths) <= self.max_disk_entries:
+            return
+
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[self.max_disk_entries:]:
+            os.remove(path)
+
+    def get_or_build(self, key: str,
+                     builder: typing.Callable[[], typing.Any]) -> typing.Any:
+        '''
+        Return a fresh clone of the object stored under key.  If there is no
+        such object, builder() is called to make one.
+        '''
+        blob = self.__get_blob(key)
+
+        if blob is None:
+            self.misses += 1
+            blob, module_names = _dump(builder())
+            self.__store(key, blob, module_names)
+        else:
+            self.hits += 1
+
+        try:
+            return pickle.loads(blob)
+        except (pickle.UnpicklingError, AttributeError, EOFError,
+                ImportError):
+            # A bad on-disk entry.  Rebuild it.
+            self.misses += 1
+            blob, module_names = _dump(builder())
+            self.__store(key, blob, module_names)
+            return pickle.loads(blob)
+
+    def clear(self):
+        self.blobs.clear()
+
+
+# Memory only until enable_disk_cache is called.
+_default_cache = BaseConfigCache()
+
+
+def get_default_cache() -> BaseConfigCache:
+    return _default_cache
+
+
+def enable_disk_cache(cache_dir: typing.Optional[str] = None):
+    '''
+    Keep the default cache's entries in cache_dir (default: the user's cache
+    directory) so that later runs can reuse them.
+    '''
+    if cache_dir is None:
+        cache_dir = get_user_cache_dir()
+
+    _default_cache.cache_dir = cache_dir
+
+
+def set_default_cache(cache: BaseConfigCache):
+    global _default_cache
+    _default_cache = cache
+
+
+def main():
+    pass
+
+
+if __name__ == '__main__':
+    main()
@@ -3,17 +3,41 @@ from byteops import get_value_from_bytes, to_little_endian
 
 # ctcompress is the fast C library.  If it's not present, use the python
 # implementation.
+# Builds of ctcompress whose compress releases the GIL set
+# COMPRESS_RELEASES_GIL.  Compressing in threads is only worth it then.
 try:
+    import ctcompress
     from ctcompress import compress
+    compress_is_native = True
+    compress_releases_gil = bool(
+        getattr(ctcompress, 'COMPRESS_RELEASES_GIL', False)
+    )
     # print('Using C compression implementation.')
 except ImportError:
     # print('C compression module not found.  Falling back to python.')
+    compress_is_native = False
+    compress_releases_gil = False
+
     def compress(source):
         return compress_py(source)
 
+# Older builds of ctcompress only have compress, so check for the
+# decompression functions separately.  See csrc/setup.py to rebuild.
+try:
+    from ctcompress import decompress, get_compressed_length
+    decompress_is_native = True
+except ImportError:
+    decompress_is_native = False
+
+    def decompress(rom, start):
+        return decompress_py(rom, start)
+
+    def get_compressed_length(rom, addr):
+        return get_compressed_length_py(rom, addr)
 
-def decompress(rom, start):
-    out_buffer = bytearray([0 for i in range(0, 0x10000)])
+
+def decompress_py(rom, start):
+    out_buffer = bytearray(0x10000)
 
     # First two bytes are little endian size of compressed packet
     main_len = get_value_from_bytes(rom[start:start+2])
@@ -94,7 +118,7 @@ def decompress(rom, start):
 
 
 # Find the length of a compressed packet
-def get_compressed_length(rom, addr):
+def get_compressed_length_py(rom, addr):
 
     # First two bytes determine length of main body
     main_length = get_value_from_bytes(rom[addr:addr+2])
@@ -461,3 +485,50 @@ def compress_py(source):
         return compressed_data[0]
     else:
         return compressed_data[1]
+
+
+def check_roundtrip(rom) -> list[int]:
+    '''
+    Check that the C and python (de)compression agree on every location
+    script in rom and that compressing a script and decompressing it gives
+    back the original.  Returns the list of location ids which fail.
+    '''
+    # Imported here because ctevent imports this module.
+    from ctevent import get_loc_event_ptr
+
+    bad_locs = []
+    for loc_id in range(0x200):
+        ptr = get_loc_event_ptr(rom, loc_id)
+
+        script = decompress_py(rom, ptr)
+        compr_len = get_compressed_length_py(rom, ptr)
+
+        if decompress(rom, ptr) != script or \
+           get_compressed_length(rom, ptr) != compr_len or \
+           decompress(compress(script), 0) != script or \
+           decompress_py(compress_py(script), 0) != script:
+            bad_locs.append(loc_id)
+
+    return bad_locs
+
+
+def main():
+    import sys
+
+    if len(sys.argv) != 2:
+        print(f'Usage: {sys.argv[0]} ct.sfc')
+        return
+
+    with open(sys.argv[1], 'rb') as infile:
+        rom = infile.read()
+
+    bad_locs = check_roundtrip(rom)
+    if bad_locs:
+        print('Round trip failed for locations: ' +
+              ', '.join(f'{x:03X}' for x in bad_locs))
+    else:
+        print('All location scripts round trip.')
+
+
+if __name__ == '__main__':
+    main()
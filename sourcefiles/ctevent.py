@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import bisect
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from typing import Iterable, Optional
+
 from ctdecompress import compress, decompress, get_compressed_length, \
-    get_compressed_packet
+    get_compressed_packet, compress_releases_gil
 from ctenums import LocID
 from byteops import get_value_from_bytes, to_little_endian, to_file_ptr, \
     to_rom_ptr
 import ctstrings
-from eventcommand import EventCommand as EC, get_command
+from eventcommand import EventCommand as EC, get_command, \
+    get_command_length, decode_command, event_commands
 from eventfunction import EventFunction as EF
 from freespace import FreeSpace as FS, FSRom, FSWriteType
 
@@ -119,6 +125,132 @@ def free_event(fsrom: FS, loc_id: int):
             pass
 
 
+# The command id that get_command reports for each opcode byte.  These
+# differ for some unused opcodes.
+_command_ids = bytes(cmd.command for cmd in event_commands)
+
+
+class _CommandIndex:
+    '''
+    Start offsets and command ids of every command in an Event's data.
+
+    The index is only valid for the exact data it was built from.  A copy of
+    that data is kept so that the Event can tell when something (including
+    code outside of Event) has changed the script and the index needs to be
+    rebuilt.  Event's own edits patch the index instead of rebuilding it.
+    '''
+
+    def __init__(self, data: bytearray, start: int):
+        self.start = start
+        self.offsets: list[int] = []
+        self.opcodes = bytearray()
+
+        pos = start
+        while pos < len(data):
+            cmd_len = get_command_length(data, pos)
+            self.offsets.append(pos)
+            self.opcodes.append(_command_ids[data[pos]])
+            pos += cmd_len
+
+        self.data = bytes(data)
+
+    def copy(self) -> _CommandIndex:
+        # data is immutable, so only the lists need copying.
+        ret_index = _CommandIndex.__new__(_CommandIndex)
+        ret_index.start = self.start
+        ret_index.offsets = list(self.offsets)
+        ret_index.opcodes = bytearray(self.opcodes)
+        ret_index.data = self.data
+
+        return ret_index
+
+    def is_valid(self, data: bytearray, start: int) -> bool:
+        return self.start == start and self.data == data
+
+    def sync_data(self, data: bytearray):
+        '''
+        Call after changing bytes in data which do not change any command
+        length or opcode (e.g. jump distances or string indices).
+        '''
+        self.data = bytes(data)
+
+    def get_index(self, pos: int) -> Optional[int]:
+        '''Return i with offsets[i] == pos, or None if pos isn't a start.'''
+        ind = bisect.bisect_left(self.offsets, pos)
+        if ind < len(self.offsets) and self.offsets[ind] == pos:
+            return ind
+
+        return None
+
+    def find(self, cmd_ids: Iterable[int], start_ind: int,
+             end_pos: int) -> Optional[int]:
+        '''
+        Return the index of the first command at or after start_ind with an
+        opcode in cmd_ids, starting before end_pos.
+        '''
+        end_ind = bisect.bisect_left(self.offsets, end_pos)
+        best = None
+
+        for cmd_id in set(cmd_ids):
+            # opcodes holds one byte per command, so the position that find
+            # returns is a command index.
+            ind = self.opcodes.find(cmd_id, start_ind, end_ind)
+            if ind != -1 and (best is None or ind < best):
+                best = ind
+                end_ind = ind
+
+        return best
+
+    def find_all(self, cmd_ids: Iterable[int], start_ind: int,
+                 end_pos: int) -> list[int]:
+        '''Return the offsets of all matching commands, in order.'''
+        end_ind = bisect.bisect_left(self.offsets, end_pos)
+        inds = []
+
+        for cmd_id in set(cmd_ids):
+            ind = self.opcodes.find(cmd_id, start_ind, end_ind)
+            while ind != -1:
+                inds.append(ind)
+                ind = self.opcodes.find(cmd_id, ind+1, end_ind)
+
+        return [self.offsets[ind] for ind in sorted(inds)]
+
+    def insert(self, data: bytearray, ins_ind: int, ins_pos: int,
+               num_bytes: int, new_start: int):
+        '''
+        Patch the index after num_bytes of commands were inserted into data
+        at ins_pos (the start of command ins_ind, or the end of the data).
+        '''
+        new_offsets = []
+        new_opcodes = bytearray()
+
+        pos = ins_pos
+        while pos < ins_pos + num_bytes:
+            new_offsets.append(pos)
+            new_opcodes.append(_command_ids[data[pos]])
+            pos += get_command_length(data, pos)
+
+        offsets = self.offsets
+        self.offsets = offsets[:ins_ind] + new_offsets + \
+            [x + num_bytes for x in offsets[ins_ind:]]
+        self.opcodes[ins_ind:ins_ind] = new_opcodes
+        self.start = new_start
+        self.data = bytes(data)
+
+    def delete(self, data: bytearray, del_ind: int, num_commands: int,
+               num_bytes: int, new_start: int):
+        '''
+        Patch the index after num_commands commands (num_bytes total)
+        starting with command del_ind were deleted from data.
+        '''
+        offsets = self.offsets
+        self.offsets = offsets[:del_ind] + \
+            [x - num_bytes for x in offsets[del_ind+num_commands:]]
+        del self.opcodes[del_ind:del_ind+num_commands]
+        self.start = new_start
+        self.data = bytes(data)
+
+
 # The strategy is to handle the event very similarly to how the game does.
 # The event is just one big list of commands with pointers giving the starts
 # of relevant entities (objects, functions).
@@ -133,10 +265,52 @@ class Event:
         self.data = bytearray()
 
         self.strings = []
+        self.modified_strings = False
+
+        # Built on demand.  See __get_command_index.
+        self._command_index = None
 
     def get_bytearray(self) -> bytearray:
         return bytearray([self.num_objects]) + self.data
 
+    def get_content_hash(self) -> bytes:
+        '''
+        Hash everything that ends up in the rom when this event is written.
+        Used by ScriptManager to skip writing unchanged scripts.
+        '''
+        hasher = hashlib.sha1()
+        hasher.update(bytes([self.num_objects]))
+        hasher.update(self.data)
+
+        for string in self.strings:
+            hasher.update(to_little_endian(len(string), 2))
+            hasher.update(string)
+
+        return hasher.digest()
+
+    def clone(self) -> Event:
+        '''
+        Make an independent copy of the event.  This is much cheaper than
+        copy.deepcopy.
+
+        The strings are shared with the original.  Strings are only ever
+        replaced in (or appended to) the list, never edited in place, so
+        each event still sees only its own changes.
+        '''
+        ret_event = Event.__new__(Event)
+        ret_event.__dict__.update(self.__dict__)
+
+        ret_event.data = bytearray(self.data)
+        ret_event.strings = list(self.strings)
+
+        if hasattr(self, 'orig_str_indices'):
+            ret_event.orig_str_indices = list(self.orig_str_indices)
+
+        if self._command_index is not None:
+            ret_event._command_index = self._command_index.copy()
+
+        return ret_event
+
     # Put the given event back into the rom attached to a specific location.
     # Returns the start address of where the data is written
     def write_to_rom_fs(fsrom: FS, loc_id: int,
@@ -170,13 +344,8 @@ class Event:
         fn_start = script.get_function_start(0, 0)
         fn_end = script.get_object_end(0)  # TODO: write a get_function_end
 
-        pos = fn_start
-        while pos < fn_end:
-            cmd = get_command(script.data, pos)
-            if cmd.command == 0xB8:
-                script.data[pos+1:pos+4] = string_index_b[:]
-
-            pos += len(cmd)
+        for pos in script.find_all_commands([0xB8], fn_start, fn_end):
+            script.data[pos+1:pos+4] = string_index_b[:]
 
         compr_event = compress(script.get_bytearray())
 
@@ -353,15 +522,11 @@ class Event:
         pos = self.get_object_start(obj_id)
         end = self.get_object_end(obj_id)
 
-        string_indices = set()
-
-        while pos < end:
-            cmd = get_command(self.data, pos)
-
-            if cmd in EC.str_commands:
-                string_indices.add(cmd.args[0])
-
-            pos += len(cmd)
+        # The string index is always the first argument of a string command.
+        string_indices = set(
+            self.data[str_pos+1]
+            for str_pos in self.find_all_commands(EC.str_commands, pos, end)
+        )
 
         string_indices = sorted(list(string_indices))
         strings = [self.strings[i][:] for i in string_indices]
@@ -374,23 +539,14 @@ class Event:
         start = self.get_function_start(0, 0)
         end = self.get_object_end(0)
 
-        pos = start
-        found = False
-        while pos < end:
-            cmd = get_command(self.data, pos)
-
-            if cmd.command == 0xB8:
-                string_index = cmd.args[0]
-                found = True
-                # Can maybe just return here.  There should only be one
-
-            pos += len(cmd)
+        # Can maybe just use the first.  There should only be one.
+        positions = self.find_all_commands([0xB8], start, end)
 
-        if not found:
+        if not positions:
             print("Warning: No string index.")
             return None
 
-        return string_index
+        return get_command(self.data, positions[-1]).args[0]
 
     # Using the FS object's getbuffer() gives a memoryview which doesn't
     # support bytearray's .index method.  This is a stupid short method to
@@ -414,20 +570,13 @@ class Event:
 
         # First find the location where string pointers are stored by finding
         # the "string index" command in the script.
-        pos = self.get_object_start(0)
-
         str_pos = None
-        while pos < len(self.data):
-            cmd = get_command(self.data, pos)
-
-            if cmd.command == 0xB8:
-                str_pos = cmd.args[0]
-                # print(cmd)
-
-                # The string index should only be set once
-                # break
 
-            pos += len(cmd)
+        # The string index should only be set once, but use the last one
+        # found like the game would.
+        str_ind_positions = self.find_all_commands([0xB8])
+        if str_ind_positions:
+            str_pos = get_command(self.data, str_ind_positions[-1]).args[0]
 
         if str_pos is None:
             self.orig_str_index = None
@@ -442,16 +591,10 @@ class Event:
         # store these to go back and update the indices if we have to
         str_addrs = []
 
-        pos = self.get_object_start(0)
-        while pos < len(self.data):
-            cmd = get_command(self.data, pos)
-
-            if cmd.command in EC.str_commands:
-                # string index argument is 0th arg
-                str_indices.add(cmd.args[0])
-                str_addrs.append(pos+1)
-
-            pos += len(cmd)
+        for pos in self.find_all_commands(EC.str_commands):
+            # string index argument is 0th arg
+            str_indices.add(self.data[pos+1])
+            str_addrs.append(pos+1)
 
         # turn str_indices into a sorted list
         str_indices = sorted(list(str_indices))
@@ -490,6 +633,9 @@ class Event:
                     self.modified_strings = True
                     self.data[addr] = new_ind
 
+            # Changing string indices doesn't move any commands.
+            self.__get_command_index().sync_data(self.data)
+
         # end if there are any strings
         '''
         # Test to see if the indices were updated correctly
@@ -522,17 +668,14 @@ class Event:
 
         # addresses in the script data where an index is located
         # store these to go back and update the indices if we have to
-        pos = self.get_object_start(0)
-        while pos < len(self.data):
-            cmd = get_command(self.data, pos)
-
-            if cmd.command in EC.str_commands:
-                # string index argument is 0th arg.  In other words
-                # index is in self.data[pos+1]
-                self.data[pos+1] = \
-                    self.orig_str_indices.index(self.data[pos+1])
+        index = self.__get_command_index()
+        for pos in self.find_all_commands(EC.str_commands):
+            # string index argument is 0th arg.  In other words
+            # index is in self.data[pos+1]
+            self.data[pos+1] = \
+                self.orig_str_indices.index(self.data[pos+1])
 
-            pos += len(cmd)
+        index.sync_data(self.data)
 
     def get_object_start(self, obj_id: int) -> int:
         return get_value_from_bytes(self.data[32*obj_id: 32*obj_id+2])
@@ -607,13 +750,154 @@ class Event:
 
         self.num_objects -= 1
 
+    def remove_objects(self, obj_ids: Iterable[int],
+                       remove_calls: bool = True):
+        '''
+        Remove several objects at once.  The ids are the objects' ids before
+        any of them are removed.
+
+        This gives the same script as calling remove_object on each id from
+        highest to lowest, but the script is scanned once and the data is
+        rewritten once.  That includes pointers into a removed object's
+        functions and jumps across a removed object.  Neither is fixed up by
+        remove_object, and both drift as the later objects are removed, so
+        the cuts are replayed in remove_object's order to match.
+        '''
+        obj_ids = sorted(set(obj_ids))
+
+        if not obj_ids:
+            return
+
+        if obj_ids[0] < 0 or obj_ids[-1] >= self.num_objects:
+            raise ValueError(
+                f'Object ids must be below num_objects ({self.num_objects})'
+            )
+
+        # (start, end) of each object's data
+        obj_ranges = [
+            (self.get_object_start(obj_id), self.get_object_end(obj_id))
+            for obj_id in obj_ids
+        ]
+
+        def in_removed_object(pos: int) -> bool:
+            ind = bisect.bisect_right(obj_ranges, (pos, len(self.data)))
+            return ind > 0 and pos < obj_ranges[ind-1][1]
+
+        # Find everything before changing anything so that the command
+        # index is only built once.
+        call_positions = []
+        jump_positions = []
+        if remove_calls:
+            jmp_cmds = EC.fwd_jump_commands + EC.back_jump_commands
+            call_positions = self.find_all_commands(Event._object_commands)
+            jump_positions = self.find_all_commands(jmp_cmds)
+
+        # Calls to a removed object are deleted.  Calls to later objects
+        # move down by the number of removed objects before them.
+        removed_args = [2*obj_id for obj_id in obj_ids]
+        deleted_calls = {obj_id: [] for obj_id in obj_ids}
+        for pos in call_positions:
+            cmd = get_command(self.data, pos)
+            arg = cmd.args[0]
+
+            if arg in removed_args:
+                deleted_calls[arg//2].append((pos, pos+len(cmd)))
+            else:
+                self.data[pos+1] -= 2*bisect.bisect_left(removed_args, arg)
+
+        # The cuts in the order remove_object makes them: the calls to an
+        # object and then its data, highest object first.  Calls inside a
+        # higher object went with that object.
+        ordered_cuts = []
+        for ind in reversed(range(len(obj_ids))):
+            ordered_cuts.extend(
+                (cut_st, cut_end, False)
+                for (cut_st, cut_end) in deleted_calls[obj_ids[ind]]
+                if not any(obj_st <= cut_st < obj_end
+                           for (obj_st, obj_end) in obj_ranges[ind+1:])
+            )
+            ordered_cuts.append((*obj_ranges[ind], True))
+
+        # Function starts and jumps outside of the removed objects, tracked
+        # by their position in the script as it is cut down.
+        ptr_locs = {
+            get_value_from_bytes(self.data[ptr:ptr+2])
+            for obj_id in range(self.num_objects) if obj_id not in obj_ids
+            for ptr in range(32*obj_id, 32*(obj_id+1), 2)
+        }
+        new_locs = {ptr_loc: ptr_loc for ptr_loc in ptr_locs}
+
+        jumps = []
+        for pos in jump_positions:
+            if not in_removed_object(pos):
+                cmd = get_command(self.data, pos)
+                jump_mult = 2*(cmd.command in EC.fwd_jump_commands)-1
+                jumps.append([pos, pos, len(cmd), jump_mult, cmd.args[-1]])
+
+        # Disjoint (start, end) ranges which have been cut so far
+        removed = []
+        for (cut_st, cut_end, is_obj) in ordered_cuts:
+            inner_cuts = [(st, end) for (st, end) in removed
+                          if cut_st <= st < cut_end]
+            cut_len = cut_end - cut_st - sum(end - st
+                                             for (st, end) in inner_cuts)
+            cut_pos = cut_st - sum(end - st for (st, end) in removed
+                                   if st < cut_st)
+
+            # Same as delete_commands and remove_object.  Only deleting
+            # a call changes jumps.
+            for jump in jumps:
+                pos, _, cmd_len, jump_mult, jump_dist = jump
+                if not is_obj:
+                    jump_target = pos + cmd_len + jump_dist*jump_mult - 1
+                    if max(jump_target, pos) >= cut_pos + cut_len and \
+                       min(jump_target, pos) < cut_pos:
+                        jump[4] -= cut_len
+
+                if pos > cut_pos:
+                    jump[0] -= cut_len
+
+            for ptr_loc, new_loc in new_locs.items():
+                if new_loc > cut_pos:
+                    new_locs[ptr_loc] = new_loc - cut_len
+
+            for inner_cut in inner_cuts:
+                removed.remove(inner_cut)
+            removed.append((cut_st, cut_end))
+
+        for (_, pos, cmd_len, _, jump_dist) in jumps:
+            self.data[pos+cmd_len-1] = jump_dist
+
+        # The new pointers are shifted back by the removed pointers too.
+        ptr_shift = 32*len(obj_ids)
+        new_ptrs = bytearray()
+        for obj_id in range(self.num_objects):
+            if obj_id in obj_ids:
+                continue
+
+            for ptr in range(32*obj_id, 32*(obj_id+1), 2):
+                ptr_loc = get_value_from_bytes(self.data[ptr:ptr+2])
+                new_loc = new_locs[ptr_loc] - ptr_shift
+                new_ptrs.extend(to_little_endian(new_loc, 2))
+
+        new_data = new_ptrs
+        pos = 32*self.num_objects
+        for (cut_st, cut_end) in sorted(removed):
+            new_data.extend(self.data[pos:cut_st])
+            pos = cut_end
+        new_data.extend(self.data[pos:])
+
+        self.data[:] = new_data
+        self.num_objects -= len(obj_ids)
+        self._command_index = None
+
+    # Commands which take an object (times 2) as their first argument:
+    # calls, draw status and processing.
+    _object_commands = [2, 3, 4, 0x7C, 0x7D, 0x0A, 0x0B, 0x0C]
+
     def __remove_shift_object_calls(self, obj_id):
         # Remove all calls to object 0xC's functions
-        calls = [2, 3, 4]
-        draw_status = [0x7C, 0x7D]
-        processing = [0x0A, 0x0B, 0x0C]
-
-        obj_cmds = calls + draw_status + processing
+        obj_cmds = Event._object_commands
 
         pos = self.get_function_start(0, 0)
         end = len(self.data)
@@ -908,6 +1192,53 @@ class Event:
             str_ind_bytes = to_little_endian(rom_ptr, 3)
             self.data[pos+1:pos+4] = str_ind_bytes
 
+    def __get_command_index(self) -> _CommandIndex:
+        '''Get the command index, rebuilding it if the data changed.'''
+        start = self.get_object_start(0)
+        index = self._command_index
+
+        if index is None or not index.is_valid(self.data, start):
+            index = _CommandIndex(self.data, start)
+            self._command_index = index
+
+        return index
+
+    def __find_command_linear(self, cmd_ids: list[int],
+                              start_pos: int,
+                              end_pos: int) -> list[int]:
+        # Used when start_pos is not a command start in the index.
+        positions = []
+
+        pos = start_pos
+        while pos < end_pos:
+            if _command_ids[self.data[pos]] in cmd_ids:
+                positions.append(pos)
+
+            pos += get_command_length(self.data, pos)
+
+        return positions
+
+    def find_all_commands(self, cmd_ids: list[int],
+                          start_pos: int = None,
+                          end_pos: int = None) -> list[int]:
+        '''
+        Return the positions of all commands with an id in cmd_ids which
+        start in [start_pos, end_pos).
+        '''
+        if start_pos is None or start_pos < 0:
+            start_pos = self.get_object_start(0)
+
+        if end_pos is None or end_pos > len(self.data):
+            end_pos = len(self.data)
+
+        index = self.__get_command_index()
+        ind = index.get_index(start_pos)
+
+        if ind is None:
+            return self.__find_command_linear(cmd_ids, start_pos, end_pos)
+
+        return index.find_all(cmd_ids, ind, end_pos)
+
     def find_command(self, cmd_ids: list[int],
                      start_pos: int = None,
                      end_pos: int = None) -> (int, EC):
@@ -920,41 +1251,40 @@ class Event:
 
         # print(f"{start_pos:04X}, {end_pos:04X}")
 
-        pos = start_pos
-        while pos < end_pos:
-            cmd = get_command(self.data, pos)
+        index = self.__get_command_index()
+        ind = index.get_index(start_pos)
 
-            if cmd.command in cmd_ids:
-                return (pos, cmd)
+        if ind is None:
+            positions = \
+                self.__find_command_linear(cmd_ids, start_pos, end_pos)
+            pos = positions[0] if positions else None
+        else:
+            found = index.find(cmd_ids, ind, end_pos)
+            pos = None if found is None else index.offsets[found]
 
-            pos += len(cmd)
+        if pos is None:
+            return (None, None)
 
-        return (None, None)
+        return (pos, get_command(self.data, pos))
 
     def find_exact_command(self, find_cmd: EC, start_pos: int = None,
                            end_pos: int = None) -> int:
 
-        if start_pos is None or start_pos < 0:
-            start_pos = self.get_object_start(0)
-
-        if end_pos is None or end_pos > len(self.data):
-            end_pos = len(self.data)
-
         jump_cmds = EC.fwd_jump_commands + EC.back_jump_commands
 
-        pos = start_pos
-        while pos < end_pos:
+        # Only commands with the same id can match.
+        positions = self.find_all_commands([find_cmd.command],
+                                           start_pos, end_pos)
+
+        for pos in positions:
             cmd = get_command(self.data, pos)
 
             if cmd == find_cmd:
                 return pos
             elif (cmd.command in jump_cmds and
-                  cmd.command == find_cmd.command and
                   cmd.args[0:-1] == find_cmd.args[0:-1]):
                 return pos
 
-            pos += len(cmd)
-
         return None
 
     # Helper method to shift all jumps by a given amount.  Typically this
@@ -973,34 +1303,30 @@ class Event:
                       after_pos: int,
                       shift: int):
 
-        pos = self.get_object_start(0)
-
         jmp_cmds = EC.fwd_jump_commands + EC.back_jump_commands
 
-        while True:
-            # Find the next jump command
-            (pos, cmd) = self.find_command(jmp_cmds, pos)
+        # Changing jump distances doesn't move any commands, so the
+        # positions can all be found up front.
+        for pos in self.find_all_commands(jmp_cmds):
+            # Every jump's distance is its last (one byte) argument.
+            cmd_id, cmd_len, args = decode_command(self.data, pos)
+            jump_dist = args[-1]
+            args.release()
 
-            if pos is None:
-                break
-            else:
-                jump_mult = 2*(cmd.command in EC.fwd_jump_commands)-1
-                jump_target = pos + len(cmd) + cmd.args[-1]*jump_mult - 1
-
-                st = min(jump_target, pos)
-                end = max(jump_target, pos)
+            jump_mult = 2*(cmd_id in EC.fwd_jump_commands)-1
+            jump_target = pos + cmd_len + jump_dist*jump_mult - 1
 
-                # the >= and < are due to treating [before_pos, after_pos)
-                # as a half open interval (as python tends to do)
-                if end >= after_pos and st < before_pos:
-                    arg_offset = len(cmd) - cmd.arg_lens[-1]
-                    self.data[pos+arg_offset] += shift
-                else:
-                    pass
-                    # print('not shifting')
-                    # input()
+            st = min(jump_target, pos)
+            end = max(jump_target, pos)
 
-                pos += len(cmd)
+            # the >= and < are due to treating [before_pos, after_pos)
+            # as a half open interval (as python tends to do)
+            if end >= after_pos and st < before_pos:
+                self.data[pos+cmd_len-1] += shift
+            else:
+                pass
+                # print('not shifting')
+                # input()
 
     # Helper method for dealing with insertions and deletions.
     # All function starts strictly exceeding start_thresh will be shifted
@@ -1040,6 +1366,9 @@ class Event:
     # This is for short removals
     def delete_commands(self, del_pos: int, num_commands: int = 1):
 
+        index = self.__get_command_index()
+        del_ind = index.get_index(del_pos)
+
         pos = del_pos
         cmd_len = 0
 
@@ -1048,9 +1377,9 @@ class Event:
                 print("Error: Deleting out of script's range.")
                 exit()
 
-            cmd = get_command(self.data, pos)
-            cmd_len += len(cmd)
-            pos += len(cmd)
+            length = get_command_length(self.data, pos)
+            cmd_len += length
+            pos += length
 
         pos = del_pos
 
@@ -1063,6 +1392,13 @@ class Event:
 
         del(self.data[del_pos:del_pos+cmd_len])
 
+        # Patch the index instead of rescanning the whole script.
+        if del_ind is None:
+            self._command_index = None
+        else:
+            index.delete(self.data, del_ind, num_commands, cmd_len,
+                         self.get_object_start(0))
+
     def delete_commands_range(self, del_start_pos, del_end_pos):
         pos = del_start_pos
         length_to_delete = del_end_pos - del_start_pos
@@ -1105,6 +1441,12 @@ class Event:
         # print(f"{ins_position: 04X}")
         # input()
 
+        index = self.__get_command_index()
+        if ins_position == len(self.data):
+            ins_ind = len(index.offsets)
+        else:
+            ins_ind = index.get_index(ins_position)
+
         # Finally simplifying this using the __shift methods
         self.__shift_jumps(ins_position, ins_position, len(new_commands))
         self.__shift_starts(ins_position, len(new_commands))
@@ -1160,6 +1502,13 @@ class Event:
         '''
         self.data[ins_position:ins_position] = new_commands
 
+        # Patch the index instead of rescanning the whole script.
+        if ins_ind is None or ins_position < index.start:
+            self._command_index = None
+        else:
+            index.insert(self.data, ins_ind, ins_position, len(new_commands),
+                         self.get_object_start(0))
+
         '''
         # Every function start pointer whose value exceeds the insertion
         # point should be shifted
@@ -1195,15 +1544,32 @@ class ScriptManager:
         self.script_dict = {x: None for x in list(LocID)}
         self.orig_len_dict = {x: None for x in list(LocID)}
 
+        # Content hash of each script as it is on the rom.  A script whose
+        # hash still matches when written is left where it is.  None means
+        # the rom's version is unknown, so the script is always written.
+        self.orig_hash_dict = {x: None for x in list(LocID)}
+
+        # Counters for how many scripts were read from the rom, written
+        # back, and skipped because they were unchanged.
+        self.num_scripts_read = 0
+        self.num_scripts_written = 0
+        self.num_scripts_skipped = 0
+
         # TODO: Just read the ptr from the rom since we have it.
         self.loc_data_ptr = loc_data_ptr
         self.event_data_ptr = event_data_ptr
 
         for x in location_list:
-            self.script_dict[x] = \
-                Event.from_rom_location(self.fsrom.getbuffer(), x)
-            self.orig_len_dict[x] = \
-                get_compressed_event_length(self.fsrom.getbuffer(), x)
+            self.__load_script(x)
+
+    def __load_script(self, loc_id: LocID):
+        script = Event.from_rom_location(self.fsrom.getbuffer(), loc_id)
+
+        self.script_dict[loc_id] = script
+        self.orig_len_dict[loc_id] = \
+            get_compressed_event_length(self.fsrom.getbuffer(), loc_id)
+        self.orig_hash_dict[loc_id] = script.get_content_hash()
+        self.num_scripts_read += 1
 
     # A note:  If a script obtained by get_script is edited it will edit
     # the copy in the manager.  This is how I think it should be since
@@ -1211,10 +1577,7 @@ class ScriptManager:
     # clunky.
     def get_script(self, loc_id: LocID) -> Event:
         if not self.script_dict[loc_id]:
-            self.script_dict[loc_id] = \
-                Event.from_rom_location(self.fsrom.getbuffer(), loc_id)
-            self.orig_len_dict[loc_id] = \
-                get_compressed_event_length(self.fsrom.getbuffer(), loc_id)
+            self.__load_script(loc_id)
 
         return self.script_dict[loc_id]
 
@@ -1227,6 +1590,28 @@ class ScriptManager:
 
         self.script_dict[loc_id] = script
 
+    def is_script_modified(self, loc_id: LocID) -> bool:
+        '''
+        Determine whether a loaded script differs from the version on the
+        rom.  Scripts that were never loaded are not modified.
+        '''
+        script = self.script_dict[loc_id]
+
+        if script is None:
+            return False
+
+        if script.modified_strings or self.orig_hash_dict[loc_id] is None:
+            return True
+
+        return script.get_content_hash() != self.orig_hash_dict[loc_id]
+
+    def get_script_stats(self) -> dict[str, int]:
+        return {
+            'read': self.num_scripts_read,
+            'written': self.num_scripts_written,
+            'skipped': self.num_scripts_skipped
+        }
+
     def free_script(self, loc_id: LocID):
         script = self.get_script(loc_id)
         script_ptr = get_loc_event_ptr(self.fsrom.getbuffer(), loc_id)
@@ -1242,44 +1627,38 @@ class ScriptManager:
         spaceman.mark_block((script_ptr, script_ptr+script_compr_len),
                             FSWriteType.MARK_FREE)
 
-    # writes the script to the specified locations
-    def write_script_to_rom(self, loc_id: LocID, free_old: bool = True):
-        # print('calling wstr', loc_id)
-
+    def __write_strings(self, script: Event):
+        '''Find space for an Event's strings and update its string index.'''
         spaceman = self.fsrom.space_manager
 
-        if free_old:
-            self.free_script(loc_id)
-
-        script = self.get_script(loc_id)
-
-        if script.modified_strings:
-            # We need to find space for the new strings
-            strings_len = sum(len(x) for x in script.strings)
-            ptrs_len = 2*len(script.strings)
-            total_len = strings_len + ptrs_len
+        # We need to find space for the new strings
+        strings_len = sum(len(x) for x in script.strings)
+        ptrs_len = 2*len(script.strings)
+        total_len = strings_len + ptrs_len
 
-            # Note: fsrom doesn't let the block cross bank boundaries
-            string_index = spaceman.get_free_addr(total_len)
+        # Note: fsrom doesn't let the block cross bank boundaries
+        string_index = spaceman.get_free_addr(total_len)
 
-            # str_pos tracks where the pointer needs to point
-            str_pos = string_index % 0x10000 + ptrs_len
-            self.fsrom.seek(string_index)
+        # str_pos tracks where the pointer needs to point
+        str_pos = string_index % 0x10000 + ptrs_len
+        self.fsrom.seek(string_index)
 
-            # Write the pointers
-            for i in range(len(script.strings)):
-                self.fsrom.write(to_little_endian(str_pos, 2),
-                                 FSWriteType.MARK_USED)
-                str_pos += len(script.strings[i])
+        # Write the pointers
+        for i in range(len(script.strings)):
+            self.fsrom.write(to_little_endian(str_pos, 2),
+                             FSWriteType.MARK_USED)
+            str_pos += len(script.strings[i])
 
-            # Write the strings immediately afterwards
-            for x in script.strings:
-                self.fsrom.write(x, FSWriteType.MARK_USED)
+        # Write the strings immediately afterwards
+        for x in script.strings:
+            self.fsrom.write(x, FSWriteType.MARK_USED)
 
-            script.set_string_index(to_rom_ptr(string_index))
+        script.set_string_index(to_rom_ptr(string_index))
+        script.modified_strings = False
 
-        # The rest is mostly straightforward
-        compr_event = compress(script.get_bytearray())
+    def __write_compressed_script(self, loc_id: LocID, compr_event: bytes):
+        '''Write a compressed event to free space and point loc_id to it.'''
+        spaceman = self.fsrom.space_manager
         script_ptr = spaceman.get_free_addr(len(compr_event))
 
         self.fsrom.seek(script_ptr)
@@ -1298,11 +1677,90 @@ class ScriptManager:
         self.fsrom.seek(loc_ptr)
         self.fsrom.write(to_little_endian(to_rom_ptr(script_ptr), 3))
 
-        # When the script is written, update the orig len and modified_strings.
+        # When the script is written, update the orig len and hash.
         # Just in case we end up modifying and writing again.
-        self.modified_strings = False
         self.orig_len_dict[loc_id] = len(compr_event)
+        self.orig_hash_dict[loc_id] = \
+            self.script_dict[loc_id].get_content_hash()
+        self.num_scripts_written += 1
+
+    # writes the script to the specified locations
+    def write_script_to_rom(self, loc_id: LocID, free_old: bool = True):
+        # print('calling wstr', loc_id)
+
+        script = self.get_script(loc_id)
+
+        if not self.is_script_modified(loc_id):
+            self.num_scripts_skipped += 1
+            return
+
+        if free_old:
+            self.free_script(loc_id)
+
+        if script.modified_strings:
+            self.__write_strings(script)
+
+        # The rest is mostly straightforward
+        compr_event = compress(script.get_bytearray())
+        self.__write_compressed_script(loc_id, compr_event)
     # End of write_script_to_rom
+
+    def write_all_scripts_to_rom(self, max_workers: int = None):
+        '''
+        Write every modified script back to the rom.  Scripts which are
+        unchanged since they were read keep their original place on the rom.
+
+        This is done in phases so that the scripts pack better and so that
+        the compression can run in parallel:
+          1) Free all of the old scripts.
+          2) Write any modified strings (this changes the script data).
+          3) Compress all scripts.  This is done in a thread pool when the
+             C compressor releases the GIL (see ctdecompress).
+          4) Allocate space for the compressed scripts, largest first.
+        '''
+        loc_ids = []
+        for loc_id, script in self.script_dict.items():
+            if script is None:
+                continue
+
+            if self.is_script_modified(loc_id):
+                loc_ids.append(loc_id)
+            else:
+                self.num_scripts_skipped += 1
+
+        for loc_id in loc_ids:
+            self.free_script(loc_id)
+
+        string_scripts = [
+            self.script_dict[loc_id] for loc_id in loc_ids
+            if self.script_dict[loc_id].modified_strings
+        ]
+        string_scripts.sort(
+            key=lambda script: sum(len(x)+2 for x in script.strings),
+            reverse=True
+        )
+
+        for script in string_scripts:
+            self.__write_strings(script)
+
+        script_data = [
+            bytes(self.script_dict[loc_id].get_bytearray())
+            for loc_id in loc_ids
+        ]
+
+        if compress_releases_gil and len(script_data) > 1:
+            with ThreadPoolExecutor(max_workers) as executor:
+                compr_events = list(executor.map(compress, script_data))
+        else:
+            compr_events = [compress(data) for data in script_data]
+
+        # Largest first, ties broken by location for reproducibility.
+        order = sorted(range(len(loc_ids)),
+                       key=lambda i: (-len(compr_events[i]), loc_ids[i]))
+
+        for i in order:
+            self.__write_compressed_script(loc_ids[i], compr_events[i])
+    # End of write_all_scripts_to_rom
 # End class ScriptManager
 
 
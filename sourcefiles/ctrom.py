@@ -1,8 +1,10 @@
-
+from __future__ import annotations
 import hashlib
+import mmap
 
 import ctevent
 import freespace
+import mapmangler
 
 
 class InvalidRomException(Exception):
@@ -27,19 +29,52 @@ class CTRom():
 
         self.rom_data = freespace.FSRom(rom, False)
         self.script_manager = ctevent.ScriptManager(self.rom_data, [])
+        self._loc_exits = None
 
     @classmethod
-    def from_file(cls, filename: str, ignore_checksum=False):
+    def from_file(cls, filename: str, ignore_checksum=False,
+                  use_mmap=False):
+        # With use_mmap the checksum is computed straight from the mapped
+        # file and the only copy made is the FSRom's own buffer.
         with open(filename, 'rb') as infile:
-            rom_bytes = infile.read()
-
-        return cls(rom_bytes, ignore_checksum)
+            if not use_mmap:
+                return cls(infile.read(), ignore_checksum)
+
+            with mmap.mmap(infile.fileno(), 0,
+                           access=mmap.ACCESS_READ) as rom_map:
+                return cls(rom_map, ignore_checksum)
+
+    def fork(self) -> CTRom:
+        '''
+        Copy of this CTRom to modify separately (e.g. once per seed).  Only
+        the rom data and free space are copied, so load scripts after
+        forking.  The data is shared until the first write or getbuffer()
+        (see FSRom.fork).
+        '''
+        ret = CTRom.__new__(CTRom)
+        ret.rom_data = self.rom_data.fork()
+        ret.script_manager = ctevent.ScriptManager(ret.rom_data, [])
+        ret._loc_exits = None
+        return ret
 
     def write_all_scripts_to_rom(self):
-        script_dict = self.script_manager.script_dict
-        for loc_id in script_dict.keys():
-            if script_dict[loc_id] is not None:
-                self.script_manager.write_script_to_rom(loc_id)
+        self.script_manager.write_all_scripts_to_rom()
+
+    def get_loc_exits(self) -> mapmangler.LocExits:
+        '''
+        The rom's exit table.  It's read on first use and every caller edits
+        the same LocExits until write_loc_exits puts it back in the rom.
+        '''
+        if self._loc_exits is None:
+            self._loc_exits = mapmangler.LocExits.from_rom(self.rom_data)
+
+        return self._loc_exits
+
+    def write_loc_exits(self):
+        '''Write the exit table back if get_loc_exits has read it.'''
+        if self._loc_exits is not None:
+            self._loc_exits.write_to_fsrom(self.rom_data)
+            self._loc_exits = None
 
     def validate_ct_rom_file(filename: str) -> bool:
         with open(filename, 'rb') as infile:
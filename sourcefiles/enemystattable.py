@@ -0,0 +1,232 @@
+'''
+Enemy stats as a table with one row per enemy, for scaling many enemies in
+one pass.
+
+The table is a numpy structured array.  The scaling kernels here work on
+whole columns at once and only record which rows and columns they change.
+EnemyStats objects are made from the table when they're asked for.  The
+kernels apply the same per-stat math as bossdata's progressive and linear
+scaling, so a scaled row gives exactly the same stats.
+
+numpy is optional.  Check numpy_available before making a table.
+bossdata.scale_boss_parts falls back to scaling one enemy at a time
+without it.
+'''
+from __future__ import annotations
+import typing
+
+from ctenums import Element, EnemyID
+from enemystats import EnemyStats
+
+try:
+    import numpy as np
+    numpy_available = True
+except ImportError:
+    np = None
+    numpy_available = False
+
+
+# Columns of the table in order.  Resistances are the 0x10-0x13 bytes.
+STAT_COLUMNS = (
+    'hp', 'level', 'speed', 'magic', 'hit', 'evade', 'mdef', 'offense',
+    'defense', 'xp', 'gp', 'tp', 'lightning_res', 'shadow_res', 'ice_res',
+    'fire_res'
+)
+
+_RESISTANCE_COLUMNS = {
+    'lightning_res': Element.LIGHTNING,
+    'shadow_res': Element.SHADOW,
+    'ice_res': Element.ICE,
+    'fire_res': Element.FIRE
+}
+
+
+def _get_stat(stats: EnemyStats, column: str) -> int:
+    if column in _RESISTANCE_COLUMNS:
+        return stats.get_resistance(_RESISTANCE_COLUMNS[column])
+
+    return getattr(stats, column)
+
+
+def _set_stat(stats: EnemyStats, column: str, value: int):
+    if column in _RESISTANCE_COLUMNS:
+        stats.set_resistance(_RESISTANCE_COLUMNS[column], value)
+    else:
+        setattr(stats, column, value)
+
+
+class EnemyStatTable:
+    '''
+    The stats of a list of enemies, one row per entry.  An enemy may appear
+    in more than one row (e.g. a part scaled for two different spots).
+    '''
+
+    def __init__(self,
+                 enemy_ids: typing.Sequence[EnemyID],
+                 stats_list: typing.Sequence[EnemyStats]):
+        if not numpy_available:
+            raise ImportError('EnemyStatTable requires numpy.')
+
+        if len(enemy_ids) != len(stats_list):
+            raise ValueError('Need one EnemyStats per EnemyID.')
+
+        self.enemy_ids = list(enemy_ids)
+        self.base_stats = list(stats_list)
+
+        dtype = [(column, 'i4') for column in STAT_COLUMNS]
+        self.data = np.array(
+            [get_stat_values(stats) for stats in self.base_stats],
+            dtype=dtype
+        )
+
+        # Which columns of which rows have been set
+        self.changed = np.zeros((len(self.base_stats), len(STAT_COLUMNS)),
+                                dtype=bool)
+
+    @classmethod
+    def from_stat_dict(
+            cls,
+            stat_dict: dict[EnemyID, EnemyStats],
+            enemy_ids: typing.Optional[typing.Sequence[EnemyID]] = None
+    ) -> EnemyStatTable:
+        '''A table of the given enemies (default: all) in stat_dict.'''
+        if enemy_ids is None:
+            enemy_ids = list(stat_dict.keys())
+
+        return cls(enemy_ids, [stat_dict[enemy_id] for enemy_id in enemy_ids])
+
+    def __len__(self):
+        return len(self.base_stats)
+
+    def set_column(self, column: str, values,
+                   rows: typing.Optional[np.ndarray] = None):
+        '''
+        Set a column to values (an array with a value for every row, or a
+        scalar).  If rows (a boolean mask) is given, only those rows change.
+        '''
+        if rows is None:
+            rows = np.ones(len(self), dtype=bool)
+
+        values = np.broadcast_to(values, (len(self),))
+        self.data[column][rows] = values[rows]
+        self.changed[rows, STAT_COLUMNS.index(column)] = True
+
+    def get_changes(self, row: int) -> dict[str, int]:
+        '''The changed columns of a row and their new values.'''
+        return {
+            STAT_COLUMNS[ind]: int(self.data[STAT_COLUMNS[ind]][row])
+            for ind in np.flatnonzero(self.changed[row])
+        }
+
+    def get_stats(self, row: int) -> EnemyStats:
+        '''A copy of the row's EnemyStats with the changed columns set.'''
+        return apply_changes(self.base_stats[row], self.get_changes(row))
+
+
+def get_stat_values(stats: EnemyStats) -> tuple[int, ...]:
+    '''The values of stats in STAT_COLUMNS order.'''
+    return tuple(_get_stat(stats, column) for column in STAT_COLUMNS)
+
+
+def apply_changes(stats: EnemyStats, changes: dict[str, int]) -> EnemyStats:
+    '''A copy of stats with the columns in changes set.'''
+    new_stats = stats.get_copy()
+
+    for column, value in changes.items():
+        _set_stat(new_stats, column, value)
+
+    return new_stats
+
+
+def progressive_scale(table: EnemyStatTable,
+                      off_factor: np.ndarray,
+                      mag_factor: np.ndarray,
+                      hp_factor: np.ndarray,
+                      add_speed: np.ndarray,
+                      flags: dict[str, np.ndarray]) -> np.ndarray:
+    '''
+    Apply per-row progressive scale factors (see
+    bossdata.get_progressive_scale_factors) to the table.  flags maps the
+    scale_* options of bossdata.progressive_scale_stats to a boolean per
+    row.
+
+    Returns the unclamped new offense of each row.  Rows whose offense
+    overflows also need their secondary attack scaled, which the caller
+    does.
+    '''
+    data = table.data
+
+    new_offense = data['offense']*off_factor
+    table.set_column(
+        'offense',
+        np.minimum(
+            np.where(new_offense/0xFF > 1.05, 0xFF, np.trunc(new_offense)),
+            0xFF
+        ),
+        flags['scale_offense']
+    )
+
+    for column in ('magic', 'level'):
+        table.set_column(
+            column,
+            np.trunc(np.clip(data[column]*mag_factor, 1, 0xFF)),
+            flags['scale_' + column]
+        )
+
+    table.set_column(
+        'hp',
+        np.maximum(np.trunc(np.minimum(data['hp']*hp_factor, 0x7FFF)), 1),
+        flags['scale_hp']
+    )
+
+    table.set_column('speed', np.minimum(data['speed'] + add_speed, 16),
+                     flags['scale_speed'])
+
+    # Rewards scale with hp
+    for column, max_value in (('xp', 0x7FFF), ('tp', 0xFF), ('gp', 0x7FFF)):
+        table.set_column(
+            column,
+            np.trunc(np.minimum(data[column]*hp_factor, max_value)),
+            flags['scale_' + column]
+        )
+
+    return new_offense
+
+
+def linear_scale(table: EnemyStatTable,
+                 scale_factor: np.ndarray,
+                 flags: dict[str, np.ndarray],
+                 rows: typing.Optional[np.ndarray] = None):
+    '''
+    Scale each row's stats by (1 + scale_factor) like
+    bossdata.linear_scale_stats.  Unscaled stats are still clamped to their
+    maximums.  Only the rows in the boolean mask rows change if it's given.
+    '''
+    data = table.data
+
+    max_stats = (
+        ('hp', 0x7FFF), ('level', 0xFF), ('speed', 0x10), ('magic', 0xFF),
+        ('mdef', 0xFF), ('offense', 0xFF), ('defense', 0xFF),
+        ('xp', 0x7FFF), ('gp', 0x7FFF), ('tp', 0xFF)
+    )
+
+    for column, max_value in max_stats:
+        base = data[column]
+        new_values = np.trunc(np.minimum(
+            base + flags['scale_' + column]*base*scale_factor,
+            max_value
+        ))
+
+        # Mother Brain screens go to 0 with some scalings
+        if column == 'hp':
+            new_values = np.maximum(new_values, 1)
+
+        table.set_column(column, new_values, rows)
+
+
+def main():
+    pass
+
+
+if __name__ == '__main__':
+    main()
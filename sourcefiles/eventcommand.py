@@ -3,6 +3,7 @@ import math
 
 from byteops import to_little_endian, get_value_from_bytes
 from enum import Enum, IntEnum, auto
+from typing import Optional
 
 
 # Small enum to store the synchronization scheme when a function is called
@@ -2268,54 +2269,113 @@ event_commands[0xFF] = \
                  'Mode 7 Scene.')
 
 
-def get_command(buf: bytearray, offset: int) -> EventCommand:
+# Commands whose argument lengths depend on the bytes after the opcode.
+_variable_length_commands = (0x2E, 0x4E, 0x88, 0xF1, 0xFF)
 
-    command_id = buf[offset]
-    command = event_commands[command_id].copy()
+# Total length (opcode included) of each command, or None if the length
+# depends on the command's arguments.
+_command_lengths = [
+    None if ind in _variable_length_commands else len(cmd)
+    for ind, cmd in enumerate(event_commands)
+]
 
-    # print(command)
-    # input()
+
+# Returns the arg_lens for a variable length command or None if the command
+# has an unknown mode.
+def _get_variable_arg_lens(buf: bytearray,
+                           offset: int) -> Optional[list[int]]:
+    command_id = buf[offset]
 
     if command_id == 0x2E:
         mode = buf[offset+1] >> 4
         if mode in [4, 5]:
-            command.arg_lens = [1, 1, 1, 1, 1]
+            return [1, 1, 1, 1, 1]
         elif mode == 8:
-            command.arg_lens = [1, 1, 2]
+            return [1, 1, 2]
         else:
-            print(f"{command_id:02X}: Error, Unknown Mode")
-            input()
+            return None
     elif command_id == 0x4E:
         # Data to copy follows command.  Shove data in last arg.
         data_len = get_value_from_bytes(buf[offset+4:offset+6]) - 2
-        command.arg_lens = [2, 1, 2, data_len]
+        return [2, 1, 2, data_len]
     elif command_id == 0x88:
         mode = buf[offset+1] >> 4
         if mode == 0:
-            command.arg_lens = [1]
+            return [1]
         elif mode in [2, 3]:
-            command.arg_lens = [1, 1, 1]
+            return [1, 1, 1]
         elif mode in [4, 5]:
-            command.arg_lens = [1, 1, 1, 1]
+            return [1, 1, 1, 1]
         elif mode == 8:
             # bytes to copy follow command
             copy_len = buf[offset+2] - 2
-            command.arg_lens = [1, 1, 1, copy_len]
+            return [1, 1, 1, copy_len]
         else:
-            print(f"{command_id:02X}: Error, Unknown Mode")
-            input()
+            return None
     elif command_id == 0xF1:
         color = buf[offset+1]
         if color == 0:
-            command.arg_lens = [1]
+            return [1]
         else:
-            command.arg_lens = [1, 1]
+            return [1, 1]
     elif command_id == 0xFF:  # Mode7 scenes can be weird
         scene = buf[offset+1]
         if scene == 0x90:
-            command.arg_lens = [1, 1, 1, 1]
-        if scene == 0x97:
-            command.arg_lens = [1, 1, 1]
+            return [1, 1, 1, 1]
+        elif scene == 0x97:
+            return [1, 1, 1]
+
+    return event_commands[command_id].arg_lens
+
+
+def get_command_length(buf: bytearray, offset: int) -> int:
+    '''
+    Return the length of the command at buf[offset] without decoding it.
+    Commands with an unknown mode get the template's length, which is what
+    get_command ends up with too.
+    '''
+    cmd_len = _command_lengths[buf[offset]]
+
+    if cmd_len is None:
+        arg_lens = _get_variable_arg_lens(buf, offset)
+        if arg_lens is None:
+            arg_lens = event_commands[buf[offset]].arg_lens
+        cmd_len = 1 + sum(arg_lens)
+
+    return cmd_len
+
+
+def decode_command(buf: bytearray,
+                   offset: int) -> tuple[int, int, memoryview]:
+    '''
+    Fast path for scanning scripts.  Returns the command id, the length and a
+    view of the argument bytes of the command at buf[offset] without
+    building an EventCommand.
+
+    The view shares memory with buf, so it must be released (or dropped)
+    before buf is resized.
+    '''
+    cmd_len = get_command_length(buf, offset)
+    arg_view = memoryview(buf)[offset+1:offset+cmd_len]
+
+    return event_commands[buf[offset]].command, cmd_len, arg_view
+
+
+def get_command(buf: bytearray, offset: int) -> EventCommand:
+
+    command_id = buf[offset]
+    command = event_commands[command_id].copy()
+
+    # print(command)
+    # input()
+
+    if _command_lengths[command_id] is None:
+        arg_lens = _get_variable_arg_lens(buf, offset)
+        if arg_lens is None:
+            print(f"{command_id:02X}: Error, Unknown Mode")
+            input()
+        else:
+            command.arg_lens = arg_lens[:]
 
     # Now we can use arg_lens to extract the args
     pos = offset + 1
@@ -0,0 +1,369 @@
+'''
+Run only the key item fill for many seeds and report on it.
+
+Only the parts of a seed that the key item logic looks at are made: the
+mystery roll (if any), the character assignment and the fill itself.  The
+logic only needs the character assignment from the config, so no rom is
+read and nothing is written.  Each part draws from the same random stream
+(see stagerng.py) as in a full seed, so with the default filler the
+placements are exactly those of the full seeds.
+
+The report has the attempts and time per fill, how often each filler was
+used and how often the first filler gave up, and how often each item landed
+in each location.
+
+Example:
+    python3 fillanalyzer.py --flags st.ngzpmte -n 20000
+    python3 fillanalyzer.py --flags st.ngzpmte -n 20000 \\
+        --filler alttpr_weighted -o alttpr.json
+'''
+from __future__ import annotations
+import argparse
+import collections
+import copy
+from dataclasses import dataclass, field
+import json
+import multiprocessing
+import os
+import statistics
+import time
+import traceback
+import typing
+
+import charrando
+import logicfactory
+import logicwriters
+import mystery
+import randoconfig as cfg
+import randosettings as rset
+import stagerng
+
+
+# Fillers which can be chosen instead of the settings' own
+FILLERS = {
+    'rejection': logicwriters.RandomRejectionFiller,
+    'alttpr_weighted': logicwriters.ALTTPRWeightedFiller,
+    'chronosanity': logicwriters.ChronosanityFiller,
+}
+
+
+@dataclass
+class FillRecord:
+    seed: str
+    filler: typing.Optional[str] = None
+    attempts: int = 0
+    failed_filler: typing.Optional[str] = None
+    failed_attempts: int = 0
+
+    # Seconds spent in the filler
+    fill_time: float = 0.0
+
+    # location name -> item name
+    placements: dict[str, str] = field(default_factory=dict)
+
+    # Formatted traceback if the fill failed
+    error: typing.Optional[str] = None
+
+
+def _get_summary(values: list[float]) -> dict[str, float]:
+    if not values:
+        return dict()
+
+    ordered = sorted(values)
+    return {
+        'mean': statistics.mean(ordered),
+        'median': statistics.median(ordered),
+        'p95': ordered[min(len(ordered)-1, int(0.95*len(ordered)))],
+        'max': ordered[-1]
+    }
+
+
+class FillAnalysis:
+
+    def __init__(self):
+        self.num_seeds = 0
+        self.errors: dict[str, str] = dict()
+        self.num_fallbacks = 0
+        self.filler_counts = collections.Counter()
+        self.attempts: list[int] = []
+        self.fill_times: list[float] = []
+
+        # location name -> Counter of item names
+        self.location_freqs: dict[str, collections.Counter] = \
+            collections.defaultdict(collections.Counter)
+
+    def add(self, record: FillRecord):
+        self.num_seeds += 1
+
+        if record.error is not None:
+            self.errors[record.seed] = record.error
+            return
+
+        self.filler_counts[record.filler] += 1
+        if record.failed_filler is not None:
+            self.num_fallbacks += 1
+
+        # A fallback's attempts include the filler which gave up.
+        self.attempts.append(record.attempts + record.failed_attempts)
+        self.fill_times.append(record.fill_time)
+
+        for loc_name, item_name in record.placements.items():
+            self.location_freqs[loc_name][item_name] += 1
+
+    @property
+    def num_filled(self) -> int:
+        return self.num_seeds - len(self.errors)
+
+    @property
+    def fallback_rate(self) -> float:
+        if self.num_filled == 0:
+            return 0.0
+
+        return self.num_fallbacks/self.num_filled
+
+    def get_item_freqs(self) -> dict[str, collections.Counter]:
+        '''item name -> Counter of location names'''
+        item_freqs = collections.defaultdict(collections.Counter)
+        for loc_name, counts in self.location_freqs.items():
+            for item_name, count in counts.items():
+                item_freqs[item_name][loc_name] += count
+
+        return item_freqs
+
+    def to_dict(self) -> dict:
+        return {
+            'num_seeds': self.num_seeds,
+            'num_failed': len(self.errors),
+            'num_fallbacks': self.num_fallbacks,
+            'fallback_rate': self.fallback_rate,
+            'fillers': dict(self.filler_counts),
+            'attempts': _get_summary(self.attempts),
+            'fill_time': _get_summary(self.fill_times),
+            'location_freqs': {
+                loc_name: dict(counts)
+                for loc_name, counts in self.location_freqs.items()
+            },
+            'errors': self.errors
+        }
+
+    def format_report(self, num_locations: int = 20) -> str:
+        lines = [
+            f'Seeds: {self.num_seeds}  Failed: {len(self.errors)}  '
+            f'Fallbacks: {self.num_fallbacks} ({self.fallback_rate:.2%})'
+        ]
+
+        for name, count in self.filler_counts.most_common():
+            lines.append(f'  {name}: {count}')
+
+        for name, values in (('Attempts', self.attempts),
+                             ('Fill time (ms)',
+                              [x*1000 for x in self.fill_times])):
+            summary = _get_summary(values)
+            if summary:
+                lines.append(
+                    f'{name}: mean {summary["mean"]:.2f}  '
+                    f'median {summary["median"]:.2f}  '
+                    f'p95 {summary["p95"]:.2f}  max {summary["max"]:.2f}'
+                )
+
+        if self.num_filled == 0:
+            return '\n'.join(lines)
+
+        lines.append('')
+        lines.append(f'{"Location":50} {"Key item %":>10}  Most common')
+        ranked = sorted(self.location_freqs.items(),
+                        key=lambda x: sum(x[1].values()), reverse=True)
+        for loc_name, counts in ranked[:num_locations]:
+            share = sum(counts.values())/self.num_filled
+            item_name, item_count = counts.most_common(1)[0]
+            lines.append(
+                f'{loc_name[:50]:50} {share:10.2%}  {item_name} '
+                f'({item_count/self.num_filled:.2%})'
+            )
+
+        return '\n'.join(lines)
+
+
+@dataclass
+class _FillJob:
+    settings: rset.Settings
+    filler_name: typing.Optional[str]
+    char_assign_dict: dict
+
+
+# Set in the parent before the pool is made so forked workers inherit it.
+_job: typing.Optional[_FillJob] = None
+
+
+def _init_worker(job: _FillJob):
+    global _job
+    _job = job
+
+
+def fill_seed(job: _FillJob, seed: str) -> FillRecord:
+    '''Make the parts of seed that the key item fill needs, and fill it.'''
+    record = FillRecord(seed)
+
+    try:
+        settings = copy.deepcopy(job.settings)
+        settings.seed = seed
+
+        if rset.GameFlags.MYSTERY in settings.gameflags:
+            with stagerng.use_stage_rng(seed, 'mystery'):
+                settings = mystery.generate_mystery_settings(settings)
+
+        # The logic only looks at the character assignment.
+        config = cfg.RandoConfig.__new__(cfg.RandoConfig)
+        config.char_assign_dict = copy.deepcopy(job.char_assign_dict)
+
+        with stagerng.use_stage_rng(seed, 'charrando'):
+            assignment = charrando.get_char_assignment(
+                settings, config.char_assign_dict.keys()
+            )
+
+        for recruit_spot, char_id in assignment.items():
+            config.char_assign_dict[recruit_spot].held_char = char_id
+
+        if job.filler_name is None:
+            filler = None
+        else:
+            filler = FILLERS[job.filler_name]()
+
+        with stagerng.use_stage_rng(seed, 'logicwriter'):
+            game_config = logicfactory.getGameConfig(settings, config)
+
+            start = time.perf_counter()
+            locations, fill_stats = logicwriters.fillKeyItems(
+                settings, game_config, filler
+            )
+            record.fill_time = time.perf_counter() - start
+
+        record.filler = fill_stats.filler
+        record.attempts = fill_stats.attempts
+        record.failed_filler = fill_stats.failed_filler
+        record.failed_attempts = fill_stats.failed_attempts
+        record.placements = {
+            loc.getName(): str(loc.getKeyItem()) for loc in locations
+        }
+    except Exception:
+        record.error = traceback.format_exc()
+
+    return record
+
+
+def _fill_seed(seed: str) -> FillRecord:
+    return fill_seed(_job, seed)
+
+
+def _get_mp_context():
+    # Fork avoids re-importing the logic in every worker.
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+
+    return multiprocessing.get_context()
+
+
+def analyze_fills(
+        settings: typing.Union[rset.Settings, str],
+        seeds: typing.Iterable[str],
+        filler_name: typing.Optional[str] = None,
+        num_workers: typing.Optional[int] = None
+) -> FillAnalysis:
+    '''
+    Fill each seed in a pool of num_workers processes (default: one per
+    core).  settings is a Settings object or a flag string.  filler_name is
+    a key of FILLERS, or None for the filler the settings would use.
+    '''
+    global _job
+
+    if isinstance(settings, str):
+        settings = rset.Settings.from_flag_string(settings)
+
+    if filler_name is not None and filler_name not in FILLERS:
+        raise ValueError(f'Unknown filler: {filler_name}')
+
+    seeds = list(seeds)
+
+    # The part of the base config which the logic uses doesn't depend on
+    # the rom, so it's built once without one.
+    job = _FillJob(settings, filler_name, cfg.RandoConfig().char_assign_dict)
+    _job = job
+
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+
+    num_workers = max(1, min(num_workers, len(seeds)))
+    analysis = FillAnalysis()
+
+    try:
+        if num_workers == 1:
+            for seed in seeds:
+                analysis.add(fill_seed(job, seed))
+        else:
+            # Fills are quick, so hand them out in chunks.
+            chunksize = max(1, min(64, len(seeds)//(4*num_workers)))
+            context = _get_mp_context()
+            with context.Pool(num_workers, _init_worker, (job,)) as pool:
+                for record in pool.imap_unordered(_fill_seed, seeds,
+                                                  chunksize):
+                    analysis.add(record)
+    finally:
+        _job = None
+
+    return analysis
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run the key item fill for many seeds and report '
+        'attempts, times, fallbacks and placement frequencies.'
+    )
+    parser.add_argument('--flags', required=True,
+                        help='flag string, e.g. st.ngzpmte or mystery')
+    parser.add_argument('-n', '--count', type=int, default=10000,
+                        help='number of seeds (default 10000)')
+    parser.add_argument('--seed-prefix', default='fill',
+                        help='seeds are <prefix>0, <prefix>1, ...')
+    parser.add_argument('--filler', choices=sorted(FILLERS),
+                        help='filler to use instead of the settings\' own')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--locations', type=int, default=20,
+                        help='locations to list in the report')
+    parser.add_argument('-o', '--output', help='json report to write')
+
+    args = parser.parse_args()
+
+    try:
+        settings = rset.Settings.from_flag_string(args.flags)
+    except rset.InvalidFlagStringException as ex:
+        parser.error(str(ex))
+
+    seeds = [f'{args.seed_prefix}{i}' for i in range(args.count)]
+
+    start = time.perf_counter()
+    analysis = analyze_fills(settings, seeds, args.filler, args.workers)
+    wall_time = time.perf_counter() - start
+
+    print(analysis.format_report(args.locations))
+    print(f'\nDone in {wall_time:.2f}s.')
+
+    if args.output is not None:
+        report = {
+            'meta': {
+                'flags': args.flags,
+                'filler': args.filler,
+                'seed_prefix': args.seed_prefix,
+                'wall_time': wall_time
+            },
+            'analysis': analysis.to_dict()
+        }
+
+        with open(args.output, 'w') as outfile:
+            json.dump(report, outfile, indent=2, sort_keys=True)
+
+        print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
 from __future__ import annotations
+import bisect
+from dataclasses import dataclass
 from enum import Enum
+import hashlib
 from io import BytesIO
-from typing import Tuple
+import os
+from typing import Iterable, Optional, Tuple
 
 import byteops
 
@@ -12,12 +16,167 @@ class FSWriteType(Enum):
     NO_MARK = 2
 
 
+class FreeSpaceError(Exception):
+    pass
+
+
+class InsufficientFreeSpaceError(FreeSpaceError):
+    pass
+
+
+class FSAllocStrategy(Enum):
+    FIRST_FIT = 0  # Lowest address that fits
+    BEST_FIT = 1  # Smallest free block that fits
+
+
+@dataclass
+class FreeSpaceStats:
+    total_free: int
+    num_free_blocks: int
+    largest_free_block: int
+
+    # 0 when all free space is in a single block.  Approaches 1 as the
+    # free space is split into many small blocks.
+    fragmentation: float
+
+
+BANK_SIZE = 0x10000
+
+
+# A free block is stored in the index as one or more pieces, split at bank
+# boundaries so that allocation never needs to cross a bank.  The usable
+# size of a piece matches the old first fit's bank check
+# (addr % 0x10000 + size < 0x10000), so a piece which runs to the end of
+# a bank loses its last byte.
+def _get_usable_size(start: int, end: int) -> int:
+    if end % BANK_SIZE == 0:
+        return end - start - 1
+    return end - start
+
+
 class FreeSpace():
+    '''
+    Tracks which parts of a buffer are free.
+
+    The canonical representation is the sorted list markers.  Blocks
+    [markers[i], markers[i+1]) alternate between free and used, and
+    first_free says what the first block is.
+
+    Free blocks are also indexed by bank (for first fit and same-bank
+    allocation) and by size (for best fit).  Each mark only re-indexes the
+    free blocks next to the marked block.
+    '''
     def __init__(self, num_bytes, is_free):
 
         self.num_bytes = num_bytes
-        self.markers = [0, self.num_bytes]
         self.first_free = is_free
+        self.markers = [0, self.num_bytes]
+
+    @property
+    def markers(self) -> list[int]:
+        return self._markers
+
+    @markers.setter
+    def markers(self, new_markers: list[int]):
+        # Assigning markers directly means the indices need rebuilding
+        self._markers = new_markers
+        self.__rebuild_index()
+
+    def copy(self) -> FreeSpace:
+        '''Return an independent copy of this FreeSpace's markers.'''
+        ret = FreeSpace.__new__(FreeSpace)
+        ret.num_bytes = self.num_bytes
+        ret.first_free = self.first_free
+        ret._markers = self._markers[:]
+        ret._bank_pieces = {
+            bank: pieces[:] for bank, pieces in self._bank_pieces.items()
+        }
+        ret._bank_max = dict(self._bank_max)
+        ret._pieces_by_size = self._pieces_by_size[:]
+        return ret
+
+    def __rebuild_index(self):
+        # bank -> sorted list of (start, end) free pieces in the bank
+        self._bank_pieces: dict[int, list[Tuple[int, int]]] = dict()
+
+        # bank -> largest usable piece size in the bank
+        self._bank_max: dict[int, int] = dict()
+
+        # Sorted list of (usable size, start, end) for all free pieces
+        self._pieces_by_size: list[Tuple[int, int, int]] = []
+
+        for block in self.get_free_blocks():
+            self.__index_free_block(block)
+
+    @staticmethod
+    def __get_pieces(block: Tuple[int, int]):
+        start, end = block
+        while start < end:
+            piece_end = min(end, (start // BANK_SIZE + 1)*BANK_SIZE)
+            yield start, piece_end
+            start = piece_end
+
+    def __index_free_block(self, block: Tuple[int, int]):
+        for start, end in self.__get_pieces(block):
+            bank = start // BANK_SIZE
+            usable = _get_usable_size(start, end)
+
+            bisect.insort(self._bank_pieces.setdefault(bank, []),
+                          (start, end))
+            bisect.insort(self._pieces_by_size, (usable, start, end))
+
+            if usable > self._bank_max.get(bank, -1):
+                self._bank_max[bank] = usable
+
+    def __unindex_free_block(self, block: Tuple[int, int]):
+        for start, end in self.__get_pieces(block):
+            bank = start // BANK_SIZE
+            usable = _get_usable_size(start, end)
+
+            pieces = self._bank_pieces[bank]
+            del pieces[bisect.bisect_left(pieces, (start, end))]
+
+            ind = bisect.bisect_left(self._pieces_by_size,
+                                     (usable, start, end))
+            del self._pieces_by_size[ind]
+
+            if not pieces:
+                del self._bank_pieces[bank]
+                del self._bank_max[bank]
+            elif usable == self._bank_max[bank]:
+                self._bank_max[bank] = max(
+                    _get_usable_size(*piece) for piece in pieces
+                )
+
+    def __get_free_blocks_touching(self, lo: int,
+                                   hi: int) -> list[Tuple[int, int]]:
+        '''
+        Get the free blocks which intersect (or are adjacent to) [lo, hi].
+        These are all of the blocks that can change when marking [lo, hi).
+        '''
+        markers = self._markers
+        ind = self.__search(lo)
+
+        if ind > 0 and markers[ind] == lo:
+            ind -= 1
+
+        ret = []
+        for x in range(ind, len(markers)-1):
+            if markers[x] > hi:
+                break
+
+            if self.__is_free(x) and markers[x] < markers[x+1]:
+                ret.append((markers[x], markers[x+1]))
+
+        return ret
+
+    def __update_index(self, before: list[Tuple[int, int]],
+                       lo: int, hi: int):
+        for block in before:
+            self.__unindex_free_block(block)
+
+        for block in self.__get_free_blocks_touching(lo, hi):
+            self.__index_free_block(block)
 
     # Mark a block of the buffer as free/not free depending on is_free.
     # block is a half-open interval [block[0], block[1]) as is Python's way.
@@ -35,6 +194,7 @@ class FreeSpace():
         if block[1] <= block[0]:
             print('Error: Block [%d, %d) has nonpositive size. Returning.'
                   % (block[0], block[1]))
+            return
 
         # If the block to mark goes past the end of the file, extend?
         # This should probably throw an error.
@@ -48,8 +208,10 @@ class FreeSpace():
                   % (block[0], block[1]))
             block = (0, block[1])
 
-        left_blk = self.__search(0, len(self.markers)-2, block[0])
-        right_blk = self.__search(0, len(self.markers)-2, block[1])
+        before = self.__get_free_blocks_touching(block[0], block[1])
+
+        left_blk = self.__search(block[0])
+        right_blk = self.__search(block[1])
 
         lc = (left_blk % 2 == 0)
         rc = (right_blk % 2 == 0)
@@ -97,9 +259,17 @@ class FreeSpace():
         # delete all markers between the start and the end (not inclusive)
         if end > start+1:
             del(self.markers[start+1:end])
+
+        self.__update_index(before, block[0], block[1])
     # End of mark_block
 
     def extend_end_marker(self, new_end, is_free):
+        if isinstance(is_free, FSWriteType):
+            is_free = (is_free == FSWriteType.MARK_FREE)
+
+        old_end = self.markers[-1]
+        before = self.__get_free_blocks_touching(old_end, old_end)
+
         last_free = self.__is_free(len(self.markers)-2)
 
         # print(f"{new_end:06X}, {is_free}")
@@ -108,101 +278,132 @@ class FreeSpace():
         else:
             self.markers.append(new_end)
 
+        self.__update_index(before, old_end, new_end)
+
     def __is_free(self, ind):
         return ((ind % 2 == 0) == self.first_free)
 
-    # First fit.  Location must be after hint
-    def get_free_addr(self, size, hint=0):
-        # block associated with its left marker, so search to len-2
-        ind = self.__search(0, len(self.markers)-2, hint)
+    # Location must be after hint.  Raises InsufficientFreeSpaceError if
+    # there is no room.
+    def get_free_addr(self, size, hint=0,
+                      strategy: FSAllocStrategy = FSAllocStrategy.FIRST_FIT):
 
-        # print(f"Searching for {size} free bytes.")
-        if self.__is_free(ind) and (self.markers[ind+1]-hint > 0):
-            return hint
+        if strategy == FSAllocStrategy.BEST_FIT:
+            ret = self.__get_best_fit(size, hint)
         else:
-            if not self.__is_free(ind):
-                ind += 1
-
-            start = ind
-            ret = None
-            for x in range(start, len(self.markers)-1, 2):
-                # print(f"({self.markers[x]}, {self.markers[x+1]})")
-                # print(f"Size: {self.markers[x+1]-self.markers[x]}")
-
-                # Almost always you want to avoid a write overlapping two
-                # different banks, so there's an additional check beyond
-                # just having enough room.
-                if self.markers[x+1]-self.markers[x] >= size and \
-                   self.markers[x] % 0x10000 + size < 0x10000:
-
-                    # print('Found.')
-                    ret = self.markers[x]
-                    break
+            ret = self.__get_first_fit(size, hint)
+
+        if ret is None:
+            raise InsufficientFreeSpaceError(
+                f'No free block of size {size:06X} after {hint:06X}.  '
+                f'{self.get_stats()}'
+            )
+
+        return ret
+
+    def __get_first_fit(self, size: int, hint: int) -> Optional[int]:
+        first_bank = hint // BANK_SIZE
+        last_bank = (self.markers[-1]-1) // BANK_SIZE
+
+        for bank in range(first_bank, last_bank+1):
+            # Most banks can be skipped without looking at their pieces
+            if self._bank_max.get(bank, -1) < size:
+                continue
+
+            pieces = self._bank_pieces[bank]
+            ind = 0
+            if bank == first_bank:
+                # Start at the piece containing hint (if any)
+                ind = max(0, bisect.bisect_right(pieces, (hint,)) - 1)
 
-            if ret is None:
-                print("Error: Not enough free space.")
-                print(f"size: {size:06X}, hint: {hint:06X}")
-                self.print_blocks()
-                exit()
+            for start, end in pieces[ind:]:
+                start = max(start, hint)
+                if start < end and _get_usable_size(start, end) >= size:
+                    return start
 
-            return ret
+        return None
+
+    def __get_best_fit(self, size: int, hint: int) -> Optional[int]:
+        ind = bisect.bisect_left(self._pieces_by_size, (size,))
+
+        for _, start, end in self._pieces_by_size[ind:]:
+            start = max(start, hint)
+            if start < end and _get_usable_size(start, end) >= size:
+                return start
+
+        return None
 
     # Sometimes data needs the same bank, so
     def get_same_bank_free_addrs(self, sizes: list[int],
                                  hint: int = 0) -> list[int]:
+        '''
+        Find addresses for blocks of the given sizes which are all in the
+        same bank.  Nothing is marked.  Returns the addresses in the same
+        order as sizes.
+        '''
 
         if not sizes:
             return []
 
-        tries = [0 for x in sizes]
-        perm = [i for i in range(len(sizes))]
-
-        # going to assign in sorted order.
-        # Should discard heavily used blocks more quickly.
-        # Save the permutation to recover the original order
-        sort_sizes, perm = zip(*sorted(zip(sizes, perm), reverse=True))
+        # Place the largest blocks first, each in the smallest piece that
+        # fits.  Keep the original indices to recover the original order.
+        order = sorted(range(len(sizes)), key=lambda i: sizes[i],
+                       reverse=True)
 
-        start = hint
+        first_bank = hint // BANK_SIZE
+        last_bank = (self.markers[-1]-1) // BANK_SIZE
 
-        while True:
-            tries[0] = self.get_free_addr(sort_sizes[0], start)
-            self.mark_block((tries[0], tries[0]+sort_sizes[0]),
-                            FSWriteType.MARK_USED)
+        for bank in range(first_bank, last_bank+1):
+            if self._bank_max.get(bank, -1) < sizes[order[0]]:
+                continue
 
-            first_bank = (tries[0] >> 16) << 16
+            pieces = [
+                [max(start, hint), end]
+                for (start, end) in self._bank_pieces[bank]
+                if end > hint
+            ]
 
+            addrs = [0 for x in sizes]
             success = True
 
-            for i in range(1, len(sort_sizes)):
-                tries[i] = self.get_free_addr(sort_sizes[i], first_bank)
-                this_bank = (tries[i] >> 16) << 16
+            for i in order:
+                fits = [
+                    piece for piece in pieces
+                    if _get_usable_size(*piece) >= sizes[i]
+                ]
 
-                if this_bank != first_bank:
+                if not fits:
                     success = False
-                    start = this_bank
+                    break
 
-                    # undo previous markings
-                    for j in range(0, i):
-                        self.mark_block((tries[j], tries[j]+sort_sizes[j]),
-                                        True)
-                else:
-                    # Mark and proceed to next
-                    self.mark_block((tries[i], tries[i]+sort_sizes[i]),
-                                    FSWriteType.MARK_USED)
+                piece = min(fits, key=lambda x: _get_usable_size(*x))
+                addrs[i] = piece[0]
+                piece[0] += sizes[i]
 
             if success:
-                break
+                return addrs
+
+        raise InsufficientFreeSpaceError(
+            f'No bank has room for blocks of sizes {sizes} after '
+            f'{hint:06X}.'
+        )
+
+    def get_free_blocks(self) -> list[Tuple[int, int]]:
+        '''Return the free blocks as a list of half-open intervals.'''
+        return self.__get_free_blocks_touching(0, self.markers[-1])
 
-        # Undo markings.  This is sort of ugly.  It would be nice to separate
-        # the buffer from the freespace checker so that we can copy the
-        # freespace checker and mess with that while finding addresses.
-        for i in range(len(tries)):
-            self.mark_block((tries[i], tries[i]+sort_sizes[i]),
-                            FSWriteType.MARK_FREE)
+    def get_stats(self) -> FreeSpaceStats:
+        sizes = [end-start for (start, end) in self.get_free_blocks()]
 
-        perm, tries = zip(*sorted(zip(perm, tries)))
+        total = sum(sizes)
+        largest = max(sizes, default=0)
 
-        return list(tries)
+        if total == 0:
+            fragmentation = 0.0
+        else:
+            fragmentation = 1 - largest/total
+
+        return FreeSpaceStats(total, len(sizes), largest, fragmentation)
 
     '''
     # writes data into the buffer.  The write can introduce free space, such
@@ -317,21 +518,137 @@ class FreeSpace():
                      (self.markers[x+1]-self.markers[x])))
 
     # Find the index of an address in the block map
-    def __search(self, start_ind, end_ind, addr):
-        search_ind = (start_ind+end_ind)//2
+    def __search(self, addr):
+        ind = bisect.bisect_right(self.markers, addr) - 1
+        return min(max(ind, 0), len(self.markers)-2)
+
+
+@dataclass(frozen=True)
+class PatchRecord:
+    '''One write from a patch: payload goes at addr and is marked mark_type.'''
+    addr: int
+    payload: memoryview
+    mark_type: FSWriteType
+
+    @property
+    def end(self) -> int:
+        return self.addr + len(self.payload)
+
+
+class ParsedPatch:
+    '''
+    An .ips or .txt patch parsed into PatchRecords.  Payloads are views into
+    a single buffer owned by the ParsedPatch, so a parsed patch is cheap to
+    keep around and apply to many roms (see get_parsed_patch).
+    '''
+
+    def __init__(self, records: list[PatchRecord], digest: str):
+        self.records = records
+
+        # sha256 of the patch file's contents
+        self.digest = digest
+
+    @classmethod
+    def from_ips_bytes(cls, data: bytes) -> ParsedPatch:
+        data = bytes(data)
+        view = memoryview(data)
+        patch_size = len(data)
+        records = []
 
-        left = self.markers[search_ind]
-        right = self.markers[search_ind+1]
+        pos = 5  # ignore the "PATCH" at the start
+        while pos < patch_size - 5:
+            addr = int.from_bytes(view[pos:pos+3], 'big')
+            size = int.from_bytes(view[pos+3:pos+5], 'big')
+            pos += 5
+
+            mark_type = FSWriteType.MARK_USED
+
+            if size == 0:
+                # RLE block
+                rle_size = int.from_bytes(view[pos:pos+2], 'big')
+                rle_byte = data[pos+2]
+                pos += 3
 
-        if left <= addr < right:
-            return search_ind
-        elif addr >= right:
-            if start_ind == len(self.markers)-1:
-                return len(self.markers)-2
+                # Runs of a single symbol are usually free space?
+                # IPS will write 0 blocks to extend the length of a file.
+                # We should mark these as free
+                if rle_byte == 0 and rle_size >= 0x10:
+                    mark_type = FSWriteType.MARK_FREE
+
+                payload = memoryview(bytes([rle_byte])*rle_size)
             else:
-                return self.__search(search_ind+1, end_ind, addr)
+                # Normal block
+                payload = view[pos:pos+size]
+                pos += size
+
+            records.append(PatchRecord(addr, payload, mark_type))
+
+        return cls(records, hashlib.sha256(data).hexdigest())
+
+    @classmethod
+    def from_txt_lines(cls, lines: Iterable[str]) -> ParsedPatch:
+        # Anskiy's .txt format is one addr:length:hex bytes write per line.
+        # All writes are considered used space.
+        hasher = hashlib.sha256()
+        buf = bytearray()
+        spans = []
+
+        for line in lines:
+            hasher.update(line.encode('utf-8'))
+            if not line.strip():
+                continue
+
+            line = line.split(':')
+            address = int(line[0], 0x10)
+            data = bytearray.fromhex(line[2])
+
+            spans.append((address, len(buf), len(data)))
+            buf.extend(data)
+
+        view = memoryview(bytes(buf))
+        records = [
+            PatchRecord(address, view[start:start+size],
+                        FSWriteType.MARK_USED)
+            for (address, start, size) in spans
+        ]
+
+        return cls(records, hasher.hexdigest())
+
+    @classmethod
+    def from_file(cls, filename: str) -> ParsedPatch:
+        '''Parse an .ips or .txt patch according to its extension.'''
+        ext = os.path.splitext(filename)[1].lower()
+
+        if ext == '.ips':
+            with open(filename, 'rb') as infile:
+                return cls.from_ips_bytes(infile.read())
+        elif ext == '.txt':
+            with open(filename, 'r') as infile:
+                return cls.from_txt_lines(infile)
         else:
-            return self.__search(start_ind, search_ind-1, addr)
+            raise ValueError(f'Unknown patch type: {filename}')
+
+
+# filename -> ((mtime, size), ParsedPatch)
+_parsed_patches: dict[str, Tuple[Tuple[int, int], ParsedPatch]] = dict()
+
+
+def get_parsed_patch(filename: str) -> ParsedPatch:
+    '''
+    Get the ParsedPatch for a patch file, parsing it only if it's new or has
+    changed on disk since it was last parsed.
+    '''
+    stat = os.stat(filename)
+    file_id = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _parsed_patches.get(filename)
+    if cached is not None and cached[0] == file_id:
+        return cached[1]
+
+    patch = ParsedPatch.from_file(filename)
+    _parsed_patches[filename] = (file_id, patch)
+
+    return patch
 
 
 class FSRom(BytesIO):
@@ -341,69 +658,83 @@ class FSRom(BytesIO):
         self.space_manager = FreeSpace(len(rom), is_free)
 
     # Apply one of Anskiy's .txt patches and mark free space
-    # Code copied from patcher.py with few modifications.
     # I am assuming that all writes are using up free space.
     def patch_txt_file(self, filename):
-        with open(filename, 'r') as patch_obj:
-            self.patch_txt(patch_obj)
+        self.apply_patch(get_parsed_patch(filename))
 
     def patch_txt(self, patch_obj):
-        for line in patch_obj:
-            line = line.split(":")
-            address = int(line[0], 0x10)
-            data = bytearray.fromhex(line[2])
-
-            # print(f"{address:06X}: ")
-            # print(' '.join(f"{x:02X}" for x in data))
-            self.seek(address)
-            self.write(data, FSWriteType.MARK_USED)
+        self.apply_patch(ParsedPatch.from_txt_lines(patch_obj))
 
     # Apply an ips patch.  Most writes are considered used space, but long
     # rle blocks of 0s are considered free space.
     def patch_ips_file(self, filename):
-        with open(filename, 'rb') as patch_obj:
-            self.patch_ips(patch_obj)
+        self.apply_patch(get_parsed_patch(filename))
 
     def patch_ips(self, patch_obj):
-        p = patch_obj
-
-        p.seek(0, 2)
-        patch_size = p.tell()
-
-        p.seek(5)  # ignore the "PATCH" at the start
-
-        while p.tell() < patch_size - 5:
-
-            # Get the location of the payload
-            addr_bytes = p.read(3)
-            addr = byteops.get_value_from_bytes_be(addr_bytes)
-
-            # Get the size of the payload
-            size_bytes = p.read(2)
-            size = byteops.get_value_from_bytes_be(size_bytes)
-
-            mark_set = FSWriteType.MARK_USED
-
-            if size == 0:
-                # RLE block
-                rle_size_bytes = p.read(2)
-                rle_size = byteops.get_value_from_bytes_be(rle_size_bytes)
-
-                rle_byte = p.read(1)
-
-                # Runs of a single symbol are usually free space?
-                # IPS will write 0 blocks to extend the length of a file.
-                # We should mark these as free
-                if rle_byte[0] == 0 and rle_size >= 0x10:
-                    mark_set = FSWriteType.MARK_FREE
+        patch_obj.seek(0)
+        self.apply_patch(ParsedPatch.from_ips_bytes(patch_obj.read()))
+
+    def apply_patch(self, patch: ParsedPatch):
+        '''
+        Write all of a ParsedPatch's records and mark them.  The result is the
+        same as writing the records one at a time with write(), but runs of
+        touching records with the same mark type are marked together.
+        '''
+        spaceman = self.space_manager
+        pos = self.tell()
 
-                payload = bytearray([rle_byte[0]]*rle_size)
+        self.seek(0, 2)
+        old_end = self.tell()
+        new_end = max((rec.end for rec in patch.records), default=old_end)
+
+        # Writes past the end of the buffer extend it.  The gap between the
+        # old end and the start of the extending write gets the extending
+        # write's mark, so grow each such record's marked range to cover it.
+        mark_ranges = []
+        cur_end = old_end
+        for rec in patch.records:
+            start, end = rec.addr, rec.end
+            if end > cur_end:
+                start = min(start, cur_end)
+                cur_end = end
+
+            if start < end:
+                mark_ranges.append((start, end, rec.mark_type))
+
+        if new_end > old_end:
+            BytesIO.write(self, bytes(new_end - old_end))
+            spaceman.extend_end_marker(new_end, FSWriteType.MARK_USED)
+
+        with self.getbuffer() as buf:
+            for rec in patch.records:
+                buf[rec.addr:rec.end] = rec.payload
+
+        run_start, run_end, run_type = None, None, None
+        for start, end, mark_type in mark_ranges:
+            if mark_type == run_type and start <= run_end and \
+               end >= run_start:
+                run_start = min(run_start, start)
+                run_end = max(run_end, end)
             else:
-                # Normal block
-                payload = p.read(size)
-
-            self.seek(addr)
-            self.write(payload, mark_set)
+                if run_type is not None:
+                    spaceman.mark_block((run_start, run_end), run_type)
+                run_start, run_end, run_type = start, end, mark_type
+
+        if run_type is not None:
+            spaceman.mark_block((run_start, run_end), run_type)
+
+        self.seek(pos)
+
+    def fork(self) -> FSRom:
+        '''
+        Copy of this FSRom (data and free space) to modify without changing
+        this one.  The data is shared until the first write to either one or
+        the first getbuffer() on either one, which copies the whole rom.
+        '''
+        ret = FSRom.__new__(FSRom)
+        BytesIO.__init__(ret, self.getvalue())
+        ret.space_manager = self.space_manager.copy()
+        return ret
 
     def mark(self, num_bytes: int, mark_type: FSWriteType):
         start = self.tell()
@@ -423,8 +754,9 @@ class FSRom(BytesIO):
 
         if end > buf_end:
             if write_mark == FSWriteType.NO_MARK:
-                print('Error: Write extended buffer with NO_MARK set')
-                exit()
+                raise FreeSpaceError(
+                    'Write extended buffer with NO_MARK set'
+                )
             else:
                 spaceman.extend_end_marker(end, write_mark)
 
@@ -434,23 +766,25 @@ class FSRom(BytesIO):
         return BytesIO.write(self, payload)
 
     # writes data to the buffer and marks the space as no longer free.
-    # Errors out if there is insufficient space
+    # Raises InsufficientFreeSpaceError if there is insufficient space
     # returns the address where the data gets written
-    def write_data_to_freespace(self, data, hint=0):
+    def write_data_to_freespace(
+            self, data, hint=0,
+            strategy: FSAllocStrategy = FSAllocStrategy.FIRST_FIT):
         spaceman = self.space_manager
-        write_addr = spaceman.get_free_addr(len(data), hint)
 
-        if write_addr is None and hint != 0:
+        try:
+            write_addr = spaceman.get_free_addr(len(data), hint, strategy)
+        except InsufficientFreeSpaceError:
+            if hint == 0:
+                raise
+
             print('Warning: Insufficient free space.  Ignoring hint.')
-            write_addr = spaceman.get_free_addr(self, len(data), 0)
+            write_addr = spaceman.get_free_addr(len(data), 0, strategy)
 
-        if write_addr is None:
-            print('Error: Insufficient free space. Quitting.')
-            quit()
-        else:
-            self.seek(write_addr)
-            self.write(data, FSWriteType.MARK_USED)
-            return write_addr
+        self.seek(write_addr)
+        self.write(data, FSWriteType.MARK_USED)
+        return write_addr
 
 
 def main():
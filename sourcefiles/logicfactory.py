@@ -2,7 +2,7 @@ import typing
 from math import ceil
 
 from logictypes import BaselineLocation, Location, LocationGroup,\
-    LinkedLocation, Game
+    LinkedLocation, Game, BitsetGame
 import treasuredata as td
 
 from ctenums import TreasureID as TID, CharID as Characters, ItemID, \
@@ -32,6 +32,11 @@ import randoconfig as cfg
 # game type.
 #
 class GameConfig:
+
+    # The Game implementation made by newGame().  logictypes.Game and
+    # logictypes.BitsetGame give the same results.
+    gameType: typing.Type[Game] = BitsetGame
+
     def __init__(self,
                  settings: rset.Settings,
                  config: cfg.RandoConfig):
@@ -40,6 +45,10 @@ class GameConfig:
         self.settings = settings
         self.config = config
         self.game = None
+
+        # Shared by every BitsetGame made by this config
+        self.logicMemo = dict()
+
         self.initLocations()
         self.initKeyItems()
         self.initGame()
@@ -112,6 +121,18 @@ class GameConfig:
     def getGame(self) -> Game:
         return self.game
 
+    #
+    # Make a new Game object with no key items or characters.  The fillers
+    # use this to make scratch games for checking reachability.
+    #
+    # return: A Game object of type gameType for this mode
+    #
+    def newGame(self) -> Game:
+        if issubclass(self.gameType, BitsetGame):
+            return self.gameType(self.settings, self.config, self.logicMemo)
+
+        return self.gameType(self.settings, self.config)
+
     #
     # Remove all LocationGroups with the given names.
     #
@@ -633,7 +654,7 @@ class ChronosanityGameConfig(GameConfig):
     # end initKeyItems
 
     def initGame(self):
-        self.game = Game(self.settings, self.config)
+        self.game = self.newGame()
 
     # The ChronoSanityGameConfig wants to remove key item bias after 10 key
     # items are placed.  This just means remove duplicates from the list.
@@ -662,7 +683,7 @@ class ChronosanityLostWorldsGameConfig(GameConfig):
         GameConfig.__init__(self, settings, config)
 
     def initGame(self):
-        self.game = Game(self.settings, self.config)
+        self.game = self.newGame()
         # Test to make sure the settings have LW/CR set?
 
     def initKeyItems(self):
@@ -979,7 +1000,7 @@ class NormalGameConfig(GameConfig):
         apply_epoch_fail(self)
 
     def initGame(self):
-        self.game = Game(self.settings, self.config)
+        self.game = self.newGame()
 
     def initKeyItems(self):
         self.keyItemList = ItemID.get_key_items()
@@ -1113,7 +1134,7 @@ class LostWorldsGameConfig(GameConfig):
         GameConfig.__init__(self, settings, config)
 
     def initGame(self):
-        self.game = Game(self.settings, self.config)
+        self.game = self.newGame()
 
     def initKeyItems(self):
         self.keyItemList = [ItemID.C_TRIGGER, ItemID.CLONE, ItemID.PENDANT,
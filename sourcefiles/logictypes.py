@@ -133,6 +133,31 @@ class Game:
     def removeKeyItem(self, item):
         self.keyItems.discard(item)
 
+    #
+    # Replace the key items acquired with the given key items
+    #
+    # param: items - Iterable of Key Items
+    #
+    def setKeyItems(self, items: typing.Iterable[ItemID]):
+        self.keyItems = set(items)
+
+    #
+    # Add several key items to the set of key items acquired
+    #
+    # param: items - Iterable of Key Items
+    #
+    def addKeyItems(self, items: typing.Iterable[ItemID]):
+        self.keyItems.update(items)
+
+    #
+    # Evaluate an access rule (e.g. LocationGroup.accessRule) on this game.
+    #
+    # param: rule - A function taking a Game and returning a bool
+    # return: The result of the rule
+    #
+    def evaluateRule(self, rule: typing.Callable[[Game], bool]) -> bool:
+        return rule(self)
+
     #
     # Determine which characters are available based on what key items/time
     # periods are available to the player.
@@ -285,6 +310,177 @@ class Game:
         return self.hasCharacter(CharID.ROBO)
     # End Game class
 
+
+# Bit positions used by BitsetGame.  Items are numbered by their position in
+# ItemID rather than by value so that the masks stay small.
+_key_item_bits = {item: 1 << ind for ind, item in enumerate(ItemID)}
+_char_bits = {char: 1 << ind for ind, char in enumerate(CharID)}
+_key_items = list(ItemID)
+_chars = list(CharID)
+
+
+def _get_key_mask(*items: ItemID) -> int:
+    mask = 0
+    for item in items:
+        mask |= _key_item_bits[item]
+    return mask
+
+
+def _get_mask_members(mask: int, members: list) -> set:
+    ret = set()
+    while mask:
+        low_bit = mask & -mask
+        ret.add(members[low_bit.bit_length()-1])
+        mask ^= low_bit
+    return ret
+
+
+#
+# BitsetGame is a drop-in replacement for Game which stores the key items and
+# characters as integer bitmasks.
+#
+# Game state is only ever the key item and character masks (settings and
+# character locations never change), so the access rules are pure functions
+# of the masks.  BitsetGame memoizes evaluateRule and updateAvailableCharacters
+# on the masks.  Games made by the same logicfactory.GameConfig share their
+# memo tables, so the fillers only evaluate a rule once per state no matter
+# how many Game objects they create.
+#
+class BitsetGame(Game):
+
+    _PENDANT = _get_key_mask(ItemID.PENDANT)
+    _GATE_KEY = _get_key_mask(ItemID.GATE_KEY)
+    _DREAMSTONE = _get_key_mask(ItemID.DREAMSTONE)
+    _MASAMUNE = _get_key_mask(ItemID.BENT_HILT, ItemID.BENT_SWORD)
+    _OMEN = _get_key_mask(ItemID.CLONE, ItemID.C_TRIGGER)
+
+    def __init__(self, settings: rset.Settings,
+                 config: cfg.RandoConfig,
+                 memo: typing.Optional[dict] = None):
+        self._keyMask = 0
+        self._charMask = 0
+
+        # (key mask, char mask) -> {rule: rule result}
+        # key mask -> char mask (for updateAvailableCharacters)
+        if memo is None:
+            memo = dict()
+        self._ruleMemo = memo.setdefault('rules', dict())
+        self._charMemo = memo.setdefault('chars', dict())
+
+        # The _ruleMemo entry for the current masks.  Anything that changes
+        # a mask sets this to None.
+        self._stateRules = None
+
+        Game.__init__(self, settings, config)
+
+    # The sets are built on demand so that code which reads keyItems or
+    # characters directly keeps working.  Changing the returned sets does
+    # not change the game.
+    @property
+    def keyItems(self) -> set[ItemID]:
+        return _get_mask_members(self._keyMask, _key_items)
+
+    @keyItems.setter
+    def keyItems(self, items: typing.Iterable[ItemID]):
+        self._keyMask = _get_key_mask(*items)
+        self._stateRules = None
+
+    @property
+    def characters(self) -> set[CharID]:
+        return _get_mask_members(self._charMask, _chars)
+
+    @characters.setter
+    def characters(self, chars: typing.Iterable[CharID]):
+        mask = 0
+        for char in chars:
+            mask |= _char_bits[char]
+        self._charMask = mask
+        self._stateRules = None
+
+    def getKeyItemCount(self):
+        return bin(self._keyMask).count('1')
+
+    def hasCharacter(self, character):
+        return bool(self._charMask & _char_bits[character])
+
+    def addCharacter(self, character):
+        self._charMask |= _char_bits[character]
+        self._stateRules = None
+
+    def removeCharacter(self, character):
+        self._charMask &= ~_char_bits[character]
+        self._stateRules = None
+
+    def hasKeyItem(self, item):
+        return bool(self._keyMask & _key_item_bits[item])
+
+    def addKeyItem(self, item):
+        self._keyMask |= _key_item_bits[item]
+        self._stateRules = None
+
+    def removeKeyItem(self, item):
+        self._keyMask &= ~_key_item_bits[item]
+        self._stateRules = None
+
+    def setKeyItems(self, items: typing.Iterable[ItemID]):
+        self._keyMask = _get_key_mask(*items)
+        self._stateRules = None
+
+    def addKeyItems(self, items: typing.Iterable[ItemID]):
+        self._keyMask |= _get_key_mask(*items)
+        self._stateRules = None
+
+    def evaluateRule(self, rule: typing.Callable[[Game], bool]) -> bool:
+        rules = self._stateRules
+        if rules is None:
+            rules = self._ruleMemo.setdefault(
+                (self._keyMask, self._charMask), dict()
+            )
+            self._stateRules = rules
+
+        try:
+            return rules[rule]
+        except KeyError:
+            ret = bool(rule(self))
+            rules[rule] = ret
+            return ret
+
+    def updateAvailableCharacters(self):
+        key_mask = self._keyMask
+
+        try:
+            self._charMask = self._charMemo[key_mask]
+        except KeyError:
+            # Game's version clears a copy of the set, so clear the mask here
+            self._charMask = 0
+            Game.updateAvailableCharacters(self)
+            self._charMemo[key_mask] = self._charMask
+
+        self._stateRules = None
+
+    #
+    # Mask versions of the logic convenience functions which are used inside
+    # other rules.  The rest are inherited from Game.
+    #
+    def canAccessFuture(self):
+        return not self.legacyofcyrus and \
+            (bool(self._keyMask & self._PENDANT) or self.lostWorlds)
+
+    def canAccessPrehistory(self):
+        return bool(self._keyMask & self._GATE_KEY) or self.lostWorlds
+
+    def canAccessTyranoLair(self):
+        return self.canAccessPrehistory() and \
+            bool(self._keyMask & self._DREAMSTONE)
+
+    def hasMasamune(self):
+        return self._keyMask & self._MASAMUNE == self._MASAMUNE
+
+    def canAccessBlackOmen(self):
+        return (self.canAccessFuture() and
+                self._keyMask & self._OMEN == self._OMEN)
+    # End BitsetGame class
+
 #
 # This class represents a location within the game.
 # It is the parent class for the different location types
@@ -524,7 +720,7 @@ class LocationGroup:
     # return: True if this location is accessible, false if not
     #
     def canAccess(self, game):
-        return self.accessRule(game)
+        return game.evaluateRule(self.accessRule)
 
     #
     # Get the name of this location.
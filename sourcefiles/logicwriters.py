@@ -1,4 +1,5 @@
 from __future__ import annotations
+from dataclasses import dataclass
 import random
 import typing
 
@@ -20,8 +21,24 @@ class ImpossibleConfigurationException(Exception):
     pass
 
 
+@dataclass
+class FillStats:
+    '''
+    Which filler placed the key items and how many attempts it took.  If the
+    first filler gave up, it is recorded in failed_filler.
+    '''
+    filler: str
+    attempts: int
+    failed_filler: typing.Optional[str] = None
+    failed_attempts: int = 0
+
+
 class KeyItemFiller(typing.Protocol):
 
+    # Attempts made by the last fill (each filler decides what an attempt
+    # is).
+    num_attempts: int
+
     def get_key_item_locations(
             self,
             game_config: logicfactory.GameConfig
@@ -32,6 +49,180 @@ class KeyItemFiller(typing.Protocol):
         pass
 
 
+class ReachabilityEngine:
+    '''
+    Keeps track of which key items can be collected in a GameConfig as key
+    items are placed and removed.
+
+    Reachability only grows as key items are placed, so placements just
+    continue the sweep from the current frontier of unreached groups.  The
+    sweep waits until the next query so that placing many items at once only
+    sweeps once.
+    Removing an item which is still held by another reachable location
+    changes nothing.  Otherwise the sweep is redone from scratch the next time
+    it's needed.  Clearing all placements restores a saved copy of the sweep
+    with no key items.
+    '''
+
+    def __init__(self, game_config: logicfactory.GameConfig):
+        self.game_config = game_config
+        self.key_items = set(game_config.getKeyItemList())
+        self.game = game_config.newGame()
+
+        # location -> groups containing the location
+        self._loc_groups: dict[_LocType, list[logictypes.LocationGroup]] = \
+            dict()
+        for group in game_config.locationGroups:
+            for loc in group.locations:
+                self._loc_groups.setdefault(loc, []).append(group)
+
+        # location -> key item, for locations holding key items
+        self._placements: dict[_LocType, ctenums.ItemID] = dict()
+        for loc in self._loc_groups:
+            item = loc.getKeyItem()
+            if item in self.key_items:
+                self._placements[loc] = item
+
+        # Save the sweep with nothing placed for clear_key_items
+        placements = self._placements
+        self._placements = dict()
+        self._reset_sweep()
+        self._sweep()
+        self._base_state = self._get_state()
+
+        self._dirty = False
+        self._pending = False
+        for loc, item in placements.items():
+            self.place_key_item(loc, item)
+
+    def _reset_sweep(self):
+        self._reached: set[logictypes.LocationGroup] = set()
+        self._frontier = list(self.game_config.locationGroups)
+
+        # key item -> number of reached (group, location) pairs holding it.
+        # Only collectable items are keys.
+        self._counts: dict[ctenums.ItemID, int] = dict()
+
+        self.game.setKeyItems([])
+        self.game.updateAvailableCharacters()
+
+    def _get_state(self):
+        return (set(self._reached), list(self._frontier), dict(self._counts))
+
+    def _set_state(self, state):
+        reached, frontier, counts = state
+        self._reached = set(reached)
+        self._frontier = list(frontier)
+        self._counts = dict(counts)
+
+        self.game.setKeyItems(self._counts)
+        self.game.updateAvailableCharacters()
+
+    def _collect(self, item: ctenums.ItemID) -> bool:
+        '''Count one more reached copy of item.  True if item is new.'''
+        count = self._counts.get(item, 0)
+        self._counts[item] = count + 1
+        return count == 0
+
+    def _sweep(self):
+        '''Open groups on the frontier until no new key items are found.'''
+        game = self.game
+
+        while True:
+            opened = []
+            frontier = []
+            for group in self._frontier:
+                if group.canAccess(game):
+                    opened.append(group)
+                else:
+                    frontier.append(group)
+
+            self._frontier = frontier
+
+            new_keys = []
+            for group in opened:
+                self._reached.add(group)
+                for loc in group.locations:
+                    item = self._placements.get(loc)
+                    if item is not None and self._collect(item):
+                        new_keys.append(item)
+
+            if new_keys:
+                game.addKeyItems(new_keys)
+                game.updateAvailableCharacters()
+            else:
+                break
+
+    def _update(self):
+        if self._dirty:
+            self._reset_sweep()
+            self._sweep()
+        elif self._pending:
+            self.game.updateAvailableCharacters()
+            self._sweep()
+
+        self._dirty = False
+        self._pending = False
+
+    def place_key_item(self, loc: _LocType, item: ctenums.ItemID):
+        '''Set loc's key item and update what is collectable.'''
+        if loc in self._placements:
+            self.remove_key_item(loc)
+
+        loc.setKeyItem(item)
+        if item not in self.key_items:
+            return
+
+        self._placements[loc] = item
+
+        if self._dirty:
+            return
+
+        is_new = False
+        for group in self._loc_groups.get(loc, []):
+            if group in self._reached:
+                is_new = self._collect(item) or is_new
+
+        if is_new:
+            self.game.addKeyItem(item)
+            self._pending = True
+
+    def remove_key_item(self, loc: _LocType):
+        '''Unset loc's key item and update what is collectable.'''
+        loc.unsetKeyItem()
+        item = self._placements.pop(loc, None)
+
+        if item is None or self._dirty:
+            return
+
+        for group in self._loc_groups.get(loc, []):
+            if group in self._reached:
+                self._counts[item] -= 1
+                if self._counts[item] == 0:
+                    # Losing an item can close off groups.  Start over.
+                    del self._counts[item]
+                    self._dirty = True
+
+    def clear_key_items(self):
+        '''Unset every placed key item.'''
+        for loc in self._placements:
+            loc.unsetKeyItem()
+
+        self._placements = dict()
+        self._set_state(self._base_state)
+        self._dirty = False
+        self._pending = False
+
+    def get_collectable_key_items(self) -> list[ctenums.ItemID]:
+        self._update()
+        return list(self._counts)
+
+    def is_complete(self) -> bool:
+        '''Whether every key item in the GameConfig can be collected.'''
+        self._update()
+        return len(self._counts) == len(self.key_items)
+
+
 class RandomRejectionFiller:
     '''
     Assign KIs randomly and reject configurations that are not 100%able.
@@ -39,6 +230,7 @@ class RandomRejectionFiller:
 
     def __init__(self, max_attempts: int = 5000):
         self.max_attempts = max_attempts
+        self.num_attempts = 0
 
     def fill_key_item_locations(
             self,
@@ -48,13 +240,14 @@ class RandomRejectionFiller:
         Randomly fill in the key items until a valid configuration is reached.
         '''
         key_items_list = list(set(game_config.keyItemList))
-        max_game = logictypes.Game(game_config.settings,
-                                   game_config.config)
-        max_game.keyItems = list(key_items_list)
+        max_game = game_config.newGame()
+        max_game.setKeyItems(key_items_list)
 
-        num_attempts = 0
+        engine = ReachabilityEngine(game_config)
+        self.num_attempts = 0
 
         while True:
+            self.num_attempts += 1
             available_locations = get_available_locations(game_config,
                                                           max_game, [])
 
@@ -65,17 +258,15 @@ class RandomRejectionFiller:
 
             random.shuffle(available_locations)
             for ind, item in enumerate(key_items_list):
-                available_locations[ind].setKeyItem(item)
+                engine.place_key_item(available_locations[ind], item)
 
-            if is_placement_valid(game_config):
+            if engine.is_complete():
                 return available_locations[0: len(key_items_list)]
 
             # Reset everything
-            for loc in available_locations[0: len(key_items_list)]:
-                loc.unsetKeyItem()
+            engine.clear_key_items()
 
-            num_attempts += 1
-            if num_attempts >= self.max_attempts:
+            if self.num_attempts >= self.max_attempts:
                 raise LogicIterationException('Maximum Attempts Reached.')
 
 
@@ -85,6 +276,7 @@ class ALTTPRWeightedFiller:
     '''
     def __init__(self, max_attempts: int = 1000):
         self.max_attempts = max_attempts
+        self.num_attempts = 0
 
     def fill_key_item_locations(
             self,
@@ -96,14 +288,13 @@ class ALTTPRWeightedFiller:
 
         reweigh_location_groups(game_config)
 
-        settings = game_config.settings
-        config = game_config.config
-
         key_items_list = set(list(game_config.keyItemList))
         unassigned_key_items = list(key_items_list)
         assigned_locations: list[_LocType] = []
 
+        engine = ReachabilityEngine(game_config)
         failure_count = 0
+        self.num_attempts = 1
 
         while True:
 
@@ -113,11 +304,11 @@ class ALTTPRWeightedFiller:
             random.shuffle(unassigned_key_items)
             next_item = unassigned_key_items.pop()
 
-            collectable_key_items = get_collectable_key_items(game_config)
+            collectable_key_items = engine.get_collectable_key_items()
             assumed_key_items = unassigned_key_items + collectable_key_items
 
-            max_game = logictypes.Game(settings, config)
-            max_game.keyItems = assumed_key_items
+            max_game = game_config.newGame()
+            max_game.setKeyItems(assumed_key_items)
             max_game.updateAvailableCharacters()
 
             avail_groups = get_available_location_groups(
@@ -130,8 +321,8 @@ class ALTTPRWeightedFiller:
                     raise LogicIterationException('Exceeded Maximum Failures')
 
                 # Reset everything
-                for loc in assigned_locations:
-                    loc.unsetKeyItem()
+                self.num_attempts += 1
+                engine.clear_key_items()
 
                 unassigned_key_items = list(key_items_list)
                 assigned_locations = []
@@ -145,7 +336,7 @@ class ALTTPRWeightedFiller:
                 group = random.choices(avail_groups, weights=weights, k=1)[0]
                 loc = random.choice([loc for loc in group.locations
                                      if loc not in assigned_locations])
-                loc.setKeyItem(next_item)
+                engine.place_key_item(loc, next_item)
                 assigned_locations.append(loc)
 
                 # Decay group's weight
@@ -246,6 +437,7 @@ class ALTTPRFiller:
     '''
     def __init__(self, max_attempts: int = 1000):
         self.max_attempts = max_attempts
+        self.num_attempts = 0
 
     def fill_key_item_locations(
             self,
@@ -254,14 +446,13 @@ class ALTTPRFiller:
         '''
         Get key item locations using ALTTPR's AssumedFiller's algorithm.
         '''
-        settings = game_config.settings
-        config = game_config.config
-
         key_items_list = set(list(game_config.keyItemList))
         unassigned_key_items = list(key_items_list)
         assigned_locations: list[_LocType] = []
 
+        engine = ReachabilityEngine(game_config)
         failure_count = 0
+        self.num_attempts = 1
 
         while True:
 
@@ -271,11 +462,11 @@ class ALTTPRFiller:
             random.shuffle(unassigned_key_items)
             next_item = unassigned_key_items.pop()
 
-            collectable_key_items = get_collectable_key_items(game_config)
+            collectable_key_items = engine.get_collectable_key_items()
             assumed_key_items = unassigned_key_items + collectable_key_items
 
-            max_game = logictypes.Game(settings, config)
-            max_game.keyItems = assumed_key_items
+            max_game = game_config.newGame()
+            max_game.setKeyItems(assumed_key_items)
             max_game.updateAvailableCharacters()
 
             avail_locs = get_available_locations(
@@ -288,16 +479,16 @@ class ALTTPRFiller:
                     raise LogicIterationException('Exceeded Maximum Failures')
 
                 # Reset everything
+                self.num_attempts += 1
                 # A smarter system would only reset the previous placement.
-                for loc in assigned_locations:
-                    loc.unsetKeyItem()
+                engine.clear_key_items()
 
                 unassigned_key_items = list(key_items_list)
                 assigned_locations = []
             else:
                 loc = random.choice(avail_locs)
                 assigned_locations.append(loc)
-                loc.setKeyItem(next_item)
+                engine.place_key_item(loc, next_item)
 
                 print(f'Assigned {next_item} to {loc.getName()} ')
 
@@ -311,6 +502,9 @@ class ChronosanityFiller:
     def __init__(self):
         self.locationGroups = []
 
+        # Number of key item placements tried
+        self.num_attempts = 0
+
     #
     # Get a list of LocationGroups that are available for key item placement.
     #
@@ -416,23 +610,31 @@ class ChronosanityFiller:
 
     #
     # NOTE: Do not call this function directly. This will be called
-    #       by determineKeyItemPlacement after setting up the parameters
+    #       by fill_key_item_locations after setting up the parameters
     #       needed by this function.
     #
-    # This function will recursively determine key item locations
-    # such that a seed can be 100% completed.  This uses a weighted random
-    # approach to placement and will only consider logically accessible
-    # locations.
+    # This function will determine key item locations such that a seed can
+    # be 100% completed.  This uses a weighted random approach to placement
+    # and will only consider logically accessible locations.
     #
-    # The algorithm for determining locations - For each recursion:
-    #   If there are no key items remaining, unwind the recursion, otherwise
+    # The algorithm for determining locations - For each level of the search:
+    #   If there are no key items remaining, we're done, otherwise
     #     Get a list of logically accessible locations
     #     Choose a location randomly (locations are weighted)
     #     Get a shuffled list of the remaining key items
     #     Loop through the key item list, trying each one in the chosen
     #     location
-    #       Recurse and try the next location/key item
-    #     
+    #       Go down a level and try the next location/key item
+    #
+    # The levels are kept on an explicit stack instead of recursing.
+    #
+    # Whether a level can be completed only depends on which key items have
+    # been placed and how many unchosen locations each group has left.  If a
+    # completion exists, then there's one which uses any accessible location
+    # next (put the completion's next item there instead), so the choice of
+    # location doesn't matter.  Failed states are remembered and not searched
+    # again, and states with more key items left than locations fail right
+    # away.
     #
     # param: chosenLocations - List of locations already chosen for key items
     # param: remainingKeyItems - List of key items remaining to be placed
@@ -441,8 +643,6 @@ class ChronosanityFiller:
     #                     determines the logic while the GameConfig itself
     #                     has rules for how the keyItem items may change over
     #                     time.
-    # TODO:  Should this passtwo parameters? Game and updateKeyItems function?
-    #        It's weird using the Game member of GameConfig.
     #
     # return: A tuple containing:
     #             A Boolean indicating whether or not key item placement was
@@ -455,56 +655,73 @@ class ChronosanityFiller:
             remainingKeyItems: list[ctenums.ItemID],
             gameConfig: logicfactory.GameConfig
     ) -> typing.Tuple[bool, list[_LocType]]:
-        if len(remainingKeyItems) == 0:
-            # We've placed all key items.  This is our breakout condition
-            return True, chosenLocations
-        else:
-            # We still have key items to place.
-            availableLocations = self.getAvailableLocations(
-                gameConfig.getGame()
-            )
-            if len(availableLocations) == 0:
-                # This item configuration is not completable.
-                return False, chosenLocations
+        game = gameConfig.getGame()
+        failedStates = set()
+        self.num_attempts = 0
+
+        # Each level is [locationGroup, location, remainingKeyItems,
+        #                localKeyItemList, next key index, state]
+        stack = []
+
+        while True:
+            # Start a new level with remainingKeyItems left to place.
+            if len(remainingKeyItems) == 0:
+                # We've placed all key items.  This is our breakout condition
+                return True, chosenLocations
+
+            state = self.__getSearchState(remainingKeyItems)
+            numLocations = sum(state[1])
+
+            if state in failedStates or \
+               numLocations < len(state[0]):
+                pass
             else:
-                # Continue placing key items.
-                keyItemConfirmed = False
-                returnedChosenLocations = None
-
-                # Choose a random location
-                locationGroup, location = \
-                    self.getRandomLocation(availableLocations)
-                locationGroup.removeLocation(location)
-                locationGroup.decayWeight()
-                chosenLocations.append(location)
-
-                # Sometimes key item bias is removed after N checks
-                gameConfig.updateKeyItems(remainingKeyItems)
-
-                # Use the weighted key item list to get a list of key items
-                # that we can loop through and attempt to place.
-                localKeyItemList = \
-                    self.getShuffledKeyItemList(remainingKeyItems)
-                for keyItem in localKeyItemList:
-                    # Try placing this key item and then recurse
+                availableLocations = self.getAvailableLocations(game)
+                if len(availableLocations) == 0:
+                    # This item configuration is not completable.
+                    failedStates.add(state)
+                else:
+                    # Choose a random location
+                    locationGroup, location = \
+                        self.getRandomLocation(availableLocations)
+                    locationGroup.removeLocation(location)
+                    locationGroup.decayWeight()
+                    chosenLocations.append(location)
+
+                    # Sometimes key item bias is removed after N checks
+                    gameConfig.updateKeyItems(remainingKeyItems)
+
+                    # Use the weighted key item list to get a list of key
+                    # items that we can loop through and attempt to place.
+                    localKeyItemList = \
+                        self.getShuffledKeyItemList(remainingKeyItems)
+
+                    stack.append([locationGroup, location, remainingKeyItems,
+                                  localKeyItemList, 0, state])
+
+            # Try the next key item on the deepest level.  Levels which have
+            # run out of key items are undone.
+            while stack:
+                level = stack[-1]
+                locationGroup, location, levelKeyItems, localKeyItemList, \
+                    keyIndex, levelState = level
+
+                if keyIndex > 0:
+                    # The previous key item failed
+                    game.removeKeyItem(localKeyItemList[keyIndex-1])
+
+                if keyIndex < len(localKeyItemList):
+                    # Try placing this key item and then go down a level
+                    keyItem = localKeyItemList[keyIndex]
+                    level[4] += 1
+
                     location.setKeyItem(keyItem)
-                    gameConfig.getGame().addKeyItem(keyItem)
-
-                    newKeyItemList = [x for x in remainingKeyItems
-                                      if x != keyItem]
-                    # recurse and try to place the next key item.
-                    keyItemConfirmed, returnedChosenLocations = \
-                        self.determineKeyItemPlacement_impl(chosenLocations,
-                                                            newKeyItemList,
-                                                            gameConfig)
-
-                    if keyItemConfirmed:
-                        # We're unwinding the recursion here,
-                        # all key items are placed.
-                        return keyItemConfirmed, returnedChosenLocations
-                    else:
-                        gameConfig.getGame().removeKeyItem(keyItem)
-                # end keyItem loop
+                    game.addKeyItem(keyItem)
+                    self.num_attempts += 1
+
+                    remainingKeyItems = [x for x in levelKeyItems
+                                         if x != keyItem]
+                    break
 
                 # If we get here, we failed to place an item.
                 # Undo location modifications
@@ -513,9 +730,21 @@ class ChronosanityFiller:
                 chosenLocations.remove(location)
                 location.unsetKeyItem()
 
+                failedStates.add(levelState)
+                stack.pop()
+            else:
                 return False, chosenLocations
+    # end determineKeyItemPlacement_impl function
 
-# end determineKeyItemPlacement_impl recursive function
+    #
+    # Get the part of the search state that determines whether placement
+    # can be completed: the remaining key items and the number of unchosen
+    # locations in each group.
+    #
+    def __getSearchState(self, remainingKeyItems):
+        return (frozenset(remainingKeyItems),
+                tuple(group.getAvailableLocationCount()
+                      for group in self.locationGroups))
 
 
 # These maybe should be methods of logicfactory.GameConfig?
@@ -525,13 +754,7 @@ def is_placement_valid(
     '''
     Determines whether all key items are reachable in a GameConfig.
     '''
-    key_items_list = list(set(game_config.getKeyItemList()))
-    accessible_keys = get_collectable_key_items(game_config)
-
-    inaccessible_keys = [x for x in key_items_list
-                         if x not in accessible_keys]
-
-    return not inaccessible_keys
+    return ReachabilityEngine(game_config).is_complete()
 
 
 def get_available_location_groups(
@@ -547,7 +770,7 @@ def get_available_location_groups(
     game.updateAvailableCharacters()
 
     for group in game_config.locationGroups:
-        if group.accessRule(game):
+        if group.canAccess(game):
             unassigned_locs = [loc for loc in group.locations
                                if loc not in assigned_locs]
             if unassigned_locs:
@@ -568,7 +791,7 @@ def get_available_locations(
     locations = []
     game.updateAvailableCharacters()
     for group in game_config.locationGroups:
-        if group.accessRule(game):
+        if group.canAccess(game):
             locations.extend(
                 [loc for loc in group.locations if loc not in assigned_locs]
             )
@@ -582,38 +805,7 @@ def get_collectable_key_items(
     '''
     Traverse the game config to determine what can be collected.
     '''
-
-    settings = game_config.settings
-    config = game_config.config
-
-    cur_game = logictypes.Game(settings, config)
-    cur_game.keyItems = []
-    cur_game.updateAvailableCharacters()
-
-    key_items = set(list(game_config.getKeyItemList()))
-
-    groups = list(game_config.locationGroups)
-    while True:
-        new_keys = []
-        exhausted_groups = []
-        for group in groups:
-            if group.accessRule(cur_game):
-                for location in group.locations:
-                    item = location.getKeyItem()
-                    if item in key_items:
-                        new_keys.append(item)
-                exhausted_groups.append(group)
-
-        for group in exhausted_groups:
-            groups.remove(group)
-
-        if new_keys:
-            cur_game.keyItems.extend(new_keys)
-            cur_game.updateAvailableCharacters()
-        else:
-            break
-
-    return cur_game.keyItems
+    return ReachabilityEngine(game_config).get_collectable_key_items()
 
 
 def getFiller(settings: rset.Settings) -> KeyItemFiller:
@@ -625,21 +817,41 @@ def getFiller(settings: rset.Settings) -> KeyItemFiller:
     return filler
 
 
-def commitKeyItems(settings: rset.Settings,
-                   config: cfg.RandoConfig):
-    '''Add Key Items to the config.'''
-    gameConfig = logicfactory.getGameConfig(settings, config)
-    filler = getFiller(settings)
+def fillKeyItems(
+        settings: rset.Settings,
+        gameConfig: logicfactory.GameConfig,
+        filler: typing.Optional[KeyItemFiller] = None
+) -> tuple[list[_LocType], FillStats]:
+    '''
+    Choose the key item locations without writing them to a config.  Uses
+    the settings' filler unless one is given.
+    '''
+    if filler is None:
+        filler = getFiller(settings)
 
     try:
         chosenLocations = filler.fill_key_item_locations(gameConfig)
+        fillStats = FillStats(filler.__class__.__name__, filler.num_attempts)
     except LogicIterationException:
         # Chronosanity is guaranteed to return a valid assignment in the
         # exceedingly rare case that another filler fails.
         print(f'{filler.__class__.__name__} failed. '
               'Falling back to ChronosanityFiller.')
+        failedFiller = filler
         filler = ChronosanityFiller()
         chosenLocations = filler.fill_key_item_locations(gameConfig)
+        fillStats = FillStats(filler.__class__.__name__, filler.num_attempts,
+                              failedFiller.__class__.__name__,
+                              failedFiller.num_attempts)
+
+    return chosenLocations, fillStats
+
+
+def commitKeyItems(settings: rset.Settings,
+                   config: cfg.RandoConfig) -> FillStats:
+    '''Add Key Items to the config.  Returns stats on the fill.'''
+    gameConfig = logicfactory.getGameConfig(settings, config)
+    chosenLocations, fillStats = fillKeyItems(settings, gameConfig)
 
     for location in chosenLocations:
         location.writeKeyItem(config)
@@ -663,6 +875,8 @@ def commitKeyItems(settings: rset.Settings,
 
     config.key_item_locations = chosenLocations + additional_locs
 
+    return fillStats
+
 
 def get_proof_string_from_settings_config(
         settings: rset.Settings,
@@ -720,8 +934,7 @@ def get_proof_string(
         v: k for k, v in char_dict.items()
     }
 
-    cur_game = logictypes.Game(settings, config)
-    cur_game.keyItems = []
+    cur_game = game_config.newGame()
 
     key_items = set(list(game_config.keyItemList))
     groups = list(game_config.locationGroups)
@@ -742,7 +955,7 @@ def get_proof_string(
         new_locs = []
         exhausted_groups = []
         for group in groups:
-            if group.accessRule(cur_game):
+            if group.canAccess(cur_game):
                 for location in group.locations:
                     item = location.getKeyItem()
                     if item in key_items:
@@ -759,7 +972,7 @@ def get_proof_string(
 
         if new_locs or new_chars:
             new_keys = [loc.getKeyItem() for loc in new_locs]
-            cur_game.keyItems.extend(new_keys)
+            cur_game.addKeyItems(new_keys)
 
             for char in new_chars:
                 spot = inv_char_dict[char]
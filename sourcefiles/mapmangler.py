@@ -143,25 +143,36 @@ class LocExits:
     LOC_SIZE = 7
 
     def __init__(self, ptrs: list[int] = [], data: bytearray = b''):
-        self.ptrs = ptrs
-        self.data = data
+        # Each location's exits are kept separately so that an edit only
+        # touches its own location.  The pointers are worked out when the
+        # table is written.
+        self.loc_data = [
+            bytearray(data[st:end]) for (st, end) in zip(ptrs, ptrs[1:])
+        ]
 
-        # should probably check for integer here...
-        self.num_records = len(data) // LocExits.LOC_SIZE
+    @property
+    def ptrs(self) -> list[int]:
+        ptrs = [0]
+        for loc_data in self.loc_data:
+            ptrs.append(ptrs[-1] + len(loc_data))
+
+        return ptrs
+
+    @property
+    def data(self) -> bytearray:
+        return bytearray(b''.join(self.loc_data))
+
+    @property
+    def num_records(self) -> int:
+        return sum(len(x) for x in self.loc_data) // LocExits.LOC_SIZE
 
     def __num_loc_exits(self, loc_id):
-        return (self.ptrs[loc_id+1] - self.ptrs[loc_id]) // 7
+        return len(self.loc_data[loc_id]) // 7
 
     def add_exits(self, loc_id: int, exits: list[LocationExit]):
 
         new_data = b''.join(x.get_bytearray() for x in exits)
-
-        for i in range(loc_id+1, len(self.ptrs)):
-            self.ptrs[i] += len(new_data)
-
-        ins_pt = self.ptrs[loc_id]
-        self.data[ins_pt:ins_pt] = new_data[:]
-        self.num_records += len(exits)
+        self.loc_data[loc_id][0:0] = new_data
 
     def add_exit(self, loc_id: int, exit_data: LocationExit):
         self.add_exits(loc_id, [exit_data])
@@ -174,29 +185,22 @@ class LocExits:
         if exit_id == num_loc_exits:
             self.add_exit(loc_id, exit_data)
         elif 0 <= exit_id < num_loc_exits:
-            ptr = self.ptrs[loc_id] + 7*exit_id
-            self.data[ptr:ptr+7] = exit_data[:]
+            ptr = 7*exit_id
+            self.loc_data[loc_id][ptr:ptr+7] = exit_data[:]
         else:
             print("Invalid exit id")
             exit()
 
     def delete_exits(self, loc_id: int):
-        st = self.ptrs[loc_id]
-        end = self.ptrs[loc_id+1]
-
-        del(self.data[st:end])
-
-        for i in range(loc_id+1, len(self.ptrs)):
-            self.ptrs[i] -= (end-st)
+        self.loc_data[loc_id].clear()
 
     def get_exits(self, loc_id: int) -> list[LocationExit]:
 
-        st = self.ptrs[loc_id]
-        end = self.ptrs[loc_id+1]
+        loc_data = self.loc_data[loc_id]
 
         ret = []
-        for x in range(st, end, 7):
-            ret.append(LocationExit.from_rom(self.data, x))
+        for x in range(0, len(loc_data), 7):
+            ret.append(LocationExit.from_rom(loc_data, x))
 
         return ret
 
@@ -238,6 +242,10 @@ class LocExits:
 
     def write_to_fsrom(self, fsrom: freespace.FSRom):
 
+        ptrs = self.ptrs
+        data = self.data
+        num_records = len(data) // LocExits.LOC_SIZE
+
         rom = fsrom.getbuffer()
         space_man = fsrom.space_manager
 
@@ -267,15 +275,15 @@ class LocExits:
         else:
             num_exits = int(num_exits)
 
-        if num_exits >= self.num_records:
+        if num_exits >= num_records:
             # Can overwrite without checking with fsrom
             out_ptr_st = exit_ptr_st
             out_data_st = first_ptr
 
             # Free the leftovers
-            if num_exits > self.num_records:
+            if num_exits > num_records:
                 space_man.mark_block(
-                    (out_data_st+len(self.data), last_ptr),
+                    (out_data_st+len(data), last_ptr),
                     freespace.FSWriteType.MARK_FREE
                 )
         else:
@@ -292,8 +300,8 @@ class LocExits:
             space_man.mark_block((first_ptr, first_ptr+7*num_exits),
                                  freespace.FSWriteType.MARK_FREE)
             # Get new starts
-            starts = space_man.get_same_bank_free_addrs([len(self.data),
-                                                         2*len(self.ptrs)])
+            starts = space_man.get_same_bank_free_addrs([len(data),
+                                                         2*len(ptrs)])
             out_data_st = starts[0]
             out_ptr_st = starts[1]
 
@@ -301,7 +309,7 @@ class LocExits:
 
         ptr_offset = out_data_st % 0x10000
         ptr_bytes = b''.join(byteops.to_little_endian(x+ptr_offset, 2)
-                             for x in self.ptrs)
+                             for x in ptrs)
 
         ptr_refs = [0x00A69E, 0x00A6A6]
         data_refs = [0x00A6B9, 0x00A6C2, 0x009CF6, 0x009D10, 0x009D1E,
@@ -350,7 +358,7 @@ class LocExits:
         fsrom.write(ptr_bytes, freespace.FSWriteType.MARK_USED)
 
         fsrom.seek(out_data_st)
-        fsrom.write(self.data, freespace.FSWriteType.MARK_USED)
+        fsrom.write(data, freespace.FSWriteType.MARK_USED)
 
         # update ptrs wants both ptrs to be file ptrs.  It converts to
         # rom ptrs when writing
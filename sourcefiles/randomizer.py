@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import argparse
+import contextlib
 import os
 import pickle
 import sys
 import json
+import traceback
 
 import itemrando
 import treasurewriter
@@ -26,11 +29,16 @@ import legacyofcyrus
 import mystery
 import vanillarando
 import epochfail
+import romsnapshot
+import configcache
+import stagegraph
+import stageprofiler
+import stagerng
 
 import byteops
 import ctenums
 import ctevent
-from ctrom import CTRom
+from ctrom import CTRom, InvalidRomException
 import ctstrings
 import enemyrewards
 
@@ -49,6 +57,201 @@ class NoConfigException(Exception):
     pass
 
 
+# Module-level functions rather than lambdas so that stages can be sent to
+# worker processes.
+def set_robo_ribbon(settings: rset.Settings, config: cfg.RandoConfig):
+    roboribbon.set_robo_ribbon_in_config(config)
+
+
+def randomize_items(settings: rset.Settings, config: cfg.RandoConfig):
+    itemrando.write_item_prices_to_config(settings, config)
+    itemrando.randomize_healing(settings, config)
+    itemrando.randomize_accessories(settings, config)
+    itemrando.randomize_weapon_armor_stats(settings, config)
+    config.itemdb.update_all_descriptions()
+
+
+def update_key_item_descs(settings: rset.Settings,
+                          config: cfg.RandoConfig):
+    IID = ctenums.ItemID
+
+    item_db = config.itemdb
+    item_db[IID.GATE_KEY].set_desc_from_str(
+        'Unlocks 65m BC (Medina imp closet)'
+    )
+
+    item_db[IID.PENDANT].set_desc_from_str(
+        'Unlocks future (Castle 1000 Lawyer)'
+    )
+
+    item_db[IID.DREAMSTONE].set_desc_from_str(
+        'Opens Tyrano Lair (Kino cell switch)'
+    )
+
+    item_db[IID.RUBY_KNIFE].set_desc_from_str(
+        'Opens Zeal Throneroom'
+    )
+
+    item_db[IID.BENT_SWORD].set_desc_from_str(
+        'Forge Masa w/ Hilt (Melchior\'s Hut)'
+    )
+
+    item_db[IID.BENT_HILT].set_desc_from_str(
+        'Forge Masa w/ Blade (Melchior\'s Hut)'
+    )
+
+    item_db[IID.PRISMSHARD].set_desc_from_str(
+        'Start Shell Trial (King 600 w/ Marle)'
+    )
+
+    item_db[IID.TOMAS_POP].set_desc_from_str(
+        'Open GiantsClaw (Choras 1000 grave)'
+    )
+
+    item_db[IID.CLONE].set_desc_from_str(
+        'Go DthPeak (KeeperDome w/ CT)'
+    )
+
+    item_db[IID.C_TRIGGER].set_desc_from_str(
+        'Go DthPeak (KeeperDome w/ Clone)'
+    )
+
+    item_db[IID.JERKY].set_desc_from_str(
+        'Unlock Porre Mayor (Porre Elder)'
+    )
+
+    medal_desc = item_db[IID.HERO_MEDAL].get_desc_as_str()
+    medal_desc += ' (Frog\'s Chest)'
+    item_db[IID.HERO_MEDAL].set_desc_from_str(medal_desc)
+
+    if settings.game_mode == rset.GameMode.VANILLA_RANDO:
+        item_db[IID.C_TRIGGER].set_desc_from_str(
+            'Go DthPeak (KeeperDome), Bekkler'
+        )
+        item_db[IID.TOOLS].set_desc_from_str(
+            'Repair Ruins (Choras Cafe)'
+        )
+        item_db[IID.JETSOFTIME].set_desc_from_str(
+            'Upgrade Epoch (Snail Stop)'
+        )
+    else:
+        grandleon_desc = item_db[IID.MASAMUNE_2].get_desc_as_str()
+        grandleon_desc += ' (Tools)'
+        item_db[IID.MASAMUNE_2].set_desc_from_str(grandleon_desc)
+
+
+def set_omen_elevators_config(settings: rset.Settings,
+                              config: cfg.RandoConfig):
+    '''Determine which omen elevator encounters a seed gets.'''
+    # Ruminators, goons, cybots
+    fight_thresh_up = [0xA0, 0x60, 0x80]
+    fight_thresh_down = [0x80, 0x60, 0xA0]
+    fights_up = [ind for ind, thresh in enumerate(fight_thresh_up)
+                 if rand.randrange(0, 0x100) < thresh]
+    fights_down = [ind for ind, thresh in enumerate(fight_thresh_down)
+                   if rand.randrange(0, 0x100) < thresh]
+
+    config.omen_elevator_fights_up = fights_up
+    config.omen_elevator_fights_down = fights_down
+
+
+# The stages of building a random config, in the order they run.  Each
+# stage names the config fields it reads and writes, and stagegraph.py
+# derives which stages have to run before which from that.  Keep the sets
+# up to date when a stage changes: set check_stages on a Randomizer to have
+# each stage fail on a field it didn't declare.
+_Stage = stagegraph.ConfigStage
+CONFIG_STAGES = [
+    # Character config.  Includes tech randomization and who can equip
+    # which items.
+    _Stage('charrando', charrando.write_config,
+           reads={'char_assign_dict', 'char_manager', 'techdb', 'itemdb'},
+           writes={'char_assign_dict', 'char_manager', 'techdb', 'itemdb'}),
+    _Stage('techrandomizer', techrandomizer.write_tech_order_to_config,
+           reads={'char_manager', 'techdb'},
+           writes={'char_manager', 'techdb'}),
+    # Fast Magic.  Should be fine before or after charrando.
+    # Safest after.
+    _Stage('fastmagic', fastmagic.write_config,
+           reads={'techdb'}, writes={'techdb'}),
+    # Treasure config.
+    _Stage('treasurewriter', treasurewriter.write_treasures_to_config,
+           reads={'treasure_assign_dict'}, writes={'treasure_assign_dict'}),
+    # Enemy rewards
+    _Stage('enemyrewards', enemyrewards.write_enemy_rewards_to_config,
+           reads={'enemy_dict'}, writes={'enemy_dict'}),
+    # Key item config.  Important that this goes after treasures because
+    # otherwise the treasurewriter can overwrite key items placed by
+    # Chronosanity
+    _Stage('logicwriter', logicwriter.commitKeyItems,
+           reads={'char_assign_dict', 'treasure_assign_dict'},
+           writes={'treasure_assign_dict', 'key_item_locations'}),
+    # Now go write LW extra items if need be
+    _Stage('lw_key_item_gear', treasurewriter.add_lw_key_item_gear,
+           reads={'treasure_assign_dict', 'key_item_locations'},
+           writes={'treasure_assign_dict', 'key_item_locations'}),
+    # Shops
+    _Stage('shopwriter', shopwriter.write_shops_to_config,
+           reads={'shop_manager'}, writes={'shop_manager'}),
+    # Robo's Ribbon in itemdb
+    _Stage('roboribbon', set_robo_ribbon,
+           reads={'itemdb'}, writes={'itemdb'}),
+    # Item Rando, including the shop prices (settings.shopprices), which
+    # live in the itemdb.  Important this is done after roboribbon or
+    # itemrando gets confused over which stat boost is +3 speed
+    _Stage('itemrando', randomize_items,
+           reads={'itemdb'}, writes={'itemdb'}),
+    # Boss Rando.  With preserve_parts this takes bosses and locations out
+    # of the boss rando settings as it places them.
+    _Stage('bossrando', bossrando.write_assignment_to_config,
+           reads={'boss_assign_dict', 'boss_data_dict', 'enemy_dict',
+                  'enemy_aidb', 'enemy_atkdb', 'settings.ro_settings'},
+           writes={'boss_assign_dict', 'boss_data_dict', 'twin_boss_type',
+                   'enemy_dict', 'enemy_aidb', 'enemy_atkdb',
+                   'settings.ro_settings'}),
+    # We need the boss rando assignment to determine which bosses need
+    # additional bossscaler scaling.
+    # Then, scale based on ranking.
+    # This has to come before boss rando scaling  because some boss scaling
+    # changes are defined absolutely instead of relatively, so they would
+    # just overwrite the boss rando scaling.
+    _Stage('bossscaler', bossscaler.determine_boss_rank,
+           reads={'boss_assign_dict', 'char_assign_dict',
+                  'treasure_assign_dict', 'key_item_locations'},
+           writes={'boss_rank'}),
+    # Finally, scale based on new location.
+    _Stage('bossrando_scaling', bossrando.scale_bosses_given_assignment,
+           reads={'boss_assign_dict', 'boss_data_dict', 'boss_rank',
+                  'enemy_dict', 'enemy_aidb', 'enemy_atkdb',
+                  'settings.ro_settings'},
+           writes={'boss_data_dict', 'enemy_dict', 'enemy_aidb',
+                   'enemy_atkdb'}),
+    # Black Tyrano/Magus boss randomization
+    _Stage('midbosses', bossrando.randomize_midbosses,
+           reads={'char_assign_dict', 'enemy_dict', 'enemy_aidb',
+                  'enemy_atkdb'},
+           writes={'enemy_dict', 'enemy_aidb', 'enemy_atkdb'}),
+    # Tabs
+    _Stage('tabwriter', tabwriter.write_tabs_to_config,
+           reads={'itemdb'},
+           writes={'power_tab_amt', 'magic_tab_amt', 'speed_tab_amt',
+                   'itemdb'}),
+    # Bucket
+    _Stage('bucketfragment', bucketfragment.write_fragments_to_config,
+           reads={'char_assign_dict', 'key_item_locations', 'itemdb',
+                  'treasure_assign_dict'},
+           writes={'itemdb', 'treasure_assign_dict'}),
+    _Stage('key_item_descs', update_key_item_descs,
+           reads={'itemdb'}, writes={'itemdb'}),
+    # Omen elevator
+    _Stage('omen_elevators', set_omen_elevators_config,
+           writes={'omen_elevator_fights_up', 'omen_elevator_fights_down'}),
+    # Ice age GG buffs if IA flag is present in settings.
+    _Stage('iceage', iceage.write_config,
+           reads={'boss_assign_dict', 'enemy_dict'}, writes={'enemy_dict'}),
+]
+
+
 class Randomizer:
 
     def __init__(self, rom: bytearray, is_vanilla: bool = True,
@@ -61,9 +264,43 @@ class Randomizer:
         self.out_rom = None
         self.has_generated = False
 
+        # Set to a stageprofiler.StageProfiler to time the generation stages.
+        self.profiler: stageprofiler.StageProfiler = None
+
+        # Key item filler stats from the last set_random_config
+        self.fill_stats: logicwriter.FillStats = None
+
+        # Processes to run independent config stages in (see stagegraph.py)
+        # and whether to check the stages' declared fields instead.
+        self.config_workers = 1
+        self.check_stages = False
+
         self.settings = settings
         self.config = config
 
+    @classmethod
+    def from_ctrom(cls, base_ctrom: CTRom,
+                   settings: rset.Settings = None,
+                   config: cfg.RandoConfig = None) -> Randomizer:
+        '''
+        Make a Randomizer which uses base_ctrom as its base rom without
+        copying it.  The base rom is never written to (each seed is written
+        to a fork of it), so many Randomizers can share one base.
+        '''
+        ret = cls.__new__(cls)
+        ret.base_ctrom = base_ctrom
+        ret.out_rom = None
+        ret.has_generated = False
+        ret.profiler = None
+        ret.fill_stats = None
+        ret.config_workers = 1
+        ret.check_stages = False
+
+        ret.settings = settings
+        ret.config = config
+
+        return ret
+
     # The randomizer will hold onto its last generated rom in self.out_rom
     # The settings and config are made properties so that I can update
     # whether out_rom correctly reflects the settings/config.
@@ -85,6 +322,16 @@ class Randomizer:
         self._config = new_config
         self.has_generated = False
 
+    def __stage(self, name: str):
+        return stageprofiler.stage(self.profiler, name)
+
+    @contextlib.contextmanager
+    def __config_stage(self, name: str):
+        '''A profiled stage which draws from its own random stream.'''
+        with self.__stage(name), \
+             stagerng.use_stage_rng(self.settings.seed, name):
+            yield
+
     # This would be used by a plando to set a non-random config.
     # Should this exist now that config is a property?
     def set_config(self, config: cfg.RandoConfig):
@@ -97,18 +344,26 @@ class Randomizer:
         if self.settings is None:
             raise NoSettingsException
 
-        rand.seed(self.settings.seed)
+        with self.__stage('config'):
+            self.__set_random_config()
 
+    def __set_random_config(self):
+        # Each stage draws from its own random stream (see stagerng.py), so
+        # there's no global seeding here.
         if rset.GameFlags.MYSTERY in self.settings.gameflags:
-            self.settings = mystery.generate_mystery_settings(self.settings)
+            with self.__config_stage('mystery'):
+                self.settings = \
+                    mystery.generate_mystery_settings(self.settings)
 
         # Some of the config defaults (prices, techdb, enemy stats) are
         # read from the rom.  This routine partially patches a copy of the
-        # base rom, gets the data, and builds the base config.
-        self.config = Randomizer.get_base_config_from_settings(
-            bytearray(self.base_ctrom.rom_data.getvalue()),
-            self.settings
-        )
+        # base rom, gets the data, and builds the base config.  The rom data
+        # is cached (see configcache.py) so this is only slow once.
+        with self.__config_stage('base_config'):
+            self.config = Randomizer.get_base_config_from_settings(
+                self.base_ctrom.rom_data.getbuffer(),
+                self.settings
+            )
 
         # An alternate approach is to build the base config with the pickles
         # provided.  You just have to make sure to redump any time time that
@@ -122,76 +377,19 @@ class Randomizer:
                 self.config.enemy_dict = pickle.load(infile)
         '''
 
-        # Character config.  Includes tech randomization and who can equip
-        # which items.
-        charrando.write_config(self.settings, self.config)
-        techrandomizer.write_tech_order_to_config(self.settings,
-                                                  self.config)
-
-        # Fast Magic.  Should be fine before or after charrando.
-        # Safest after.
-        fastmagic.write_config(self.settings, self.config)
-
-        # Treasure config.
-        treasurewriter.write_treasures_to_config(self.settings, self.config)
-
-        # Enemy rewards
-        enemyrewards.write_enemy_rewards_to_config(self.settings, self.config)
-
-        # Key item config.  Important that this goes after treasures because
-        # otherwise the treasurewriter can overwrite key items placed by
-        # Chronosanity
-        logicwriter.commitKeyItems(self.settings, self.config)
-
-        # Now go write LW extra items if need be
-        treasurewriter.add_lw_key_item_gear(self.settings, self.config)
-
-        # Shops
-        shopwriter.write_shops_to_config(self.settings, self.config)
-
-        # Robo's Ribbon in itemdb
-        roboribbon.set_robo_ribbon_in_config(self.config)
-
-        # Item Rando
-        # Important this is done after roboribbon or itemrando gets confused
-        # over which stat boost is +3 speed
-        itemrando.write_item_prices_to_config(self.settings, self.config)
-        itemrando.randomize_healing(self.settings, self.config)
-        itemrando.randomize_accessories(self.settings, self.config)
-        itemrando.randomize_weapon_armor_stats(self.settings, self.config)
-        self.config.itemdb.update_all_descriptions()
-
-        # Boss Rando
-        bossrando.write_assignment_to_config(self.settings, self.config)
-
-        # We need the boss rando assignment to determine which bosses need
-        # additional bossscaler scaling.  That is accomplished by the above
-        # bossrando.write_assignment_to_config.
-
-        # Then, scale based on ranking.
-        # This has to come before boss rando scaling  because some boss scaling
-        # changes are defined absolutely instead of relatively, so they would
-        # just overwrite the boss rando scaling.
-        bossscaler.determine_boss_rank(self.settings, self.config)
-
-        # Finally, scale based on new location.
-        bossrando.scale_bosses_given_assignment(self.settings, self.config)
-
-        # Black Tyrano/Magus boss randomization
-        bossrando.randomize_midbosses(self.settings, self.config)
-
-        # Tabs
-        tabwriter.write_tabs_to_config(self.settings, self.config)
-
-        # Bucket
-        bucketfragment.write_fragments_to_config(self.settings, self.config)
-
-        # Omen elevator
-        self.__update_key_item_descs()
-        self.__set_omen_elevators_config()
+        # The rest of the config is built by the stages in CONFIG_STAGES.
+        if self.config_workers > 1:
+            results = stagegraph.run_stages_parallel(
+                CONFIG_STAGES, self.settings, self.config,
+                self.config_workers, self.profiler
+            )
+        else:
+            results = stagegraph.run_stages(
+                CONFIG_STAGES, self.settings, self.config, self.profiler,
+                self.check_stages
+            )
 
-        # Ice age GG buffs if IA flag is present in settings.
-        iceage.write_config(self.settings, self.config)
+        self.fill_stats = results['logicwriter']
 
     def rescale_bosses(self):
         '''Reset enemy stats and redo boss scaling.'''
@@ -274,74 +472,6 @@ class Randomizer:
         pos += len(cmd_b)
         script.data[pos:pos+3] = payload[:]
 
-    def __update_key_item_descs(self):
-        config = self.config
-        IID = ctenums.ItemID
-
-        item_db = config.itemdb
-        item_db[IID.GATE_KEY].set_desc_from_str(
-            'Unlocks 65m BC (Medina imp closet)'
-        )
-
-        item_db[IID.PENDANT].set_desc_from_str(
-            'Unlocks future (Castle 1000 Lawyer)'
-        )
-
-        item_db[IID.DREAMSTONE].set_desc_from_str(
-            'Opens Tyrano Lair (Kino cell switch)'
-        )
-
-        item_db[IID.RUBY_KNIFE].set_desc_from_str(
-            'Opens Zeal Throneroom'
-        )
-
-        item_db[IID.BENT_SWORD].set_desc_from_str(
-            'Forge Masa w/ Hilt (Melchior\'s Hut)'
-        )
-
-        item_db[IID.BENT_HILT].set_desc_from_str(
-            'Forge Masa w/ Blade (Melchior\'s Hut)'
-        )
-
-        item_db[IID.PRISMSHARD].set_desc_from_str(
-            'Start Shell Trial (King 600 w/ Marle)'
-        )
-
-        item_db[IID.TOMAS_POP].set_desc_from_str(
-            'Open GiantsClaw (Choras 1000 grave)'
-        )
-
-        item_db[IID.CLONE].set_desc_from_str(
-            'Go DthPeak (KeeperDome w/ CT)'
-        )
-
-        item_db[IID.C_TRIGGER].set_desc_from_str(
-            'Go DthPeak (KeeperDome w/ Clone)'
-        )
-
-        item_db[IID.JERKY].set_desc_from_str(
-            'Unlock Porre Mayor (Porre Elder)'
-        )
-
-        medal_desc = item_db[IID.HERO_MEDAL].get_desc_as_str()
-        medal_desc += ' (Frog\'s Chest)'
-        item_db[IID.HERO_MEDAL].set_desc_from_str(medal_desc)
-
-        if self.settings.game_mode == rset.GameMode.VANILLA_RANDO:
-            item_db[IID.C_TRIGGER].set_desc_from_str(
-                'Go DthPeak (KeeperDome), Bekkler'
-            )
-            item_db[IID.TOOLS].set_desc_from_str(
-                'Repair Ruins (Choras Cafe)'
-            )
-            item_db[IID.JETSOFTIME].set_desc_from_str(
-                'Upgrade Epoch (Snail Stop)'
-            )
-        else:
-            grandleon_desc = item_db[IID.MASAMUNE_2].get_desc_as_str()
-            grandleon_desc += ' (Tools)'
-            item_db[IID.MASAMUNE_2].set_desc_from_str(grandleon_desc)
-
     def __fix_northern_ruins_sealed(self, ct_rom: CTRom):
         # In Vanilla 0x7F01A3 & 0x10 is set for 600AD ruins
         #            0x7F01A3 & 0x08 is set for 1000AD ruins
@@ -460,19 +590,6 @@ class Randomizer:
         rom.seek(start)
         rom.write(rt, mark_used)
 
-    def __set_omen_elevators_config(self):
-        '''Determine which omen elevator encounters a seed gets.'''
-        # Ruminators, goons, cybots
-        fight_thresh_up = [0xA0, 0x60, 0x80]
-        fight_thresh_down = [0x80, 0x60, 0xA0]
-        fights_up = [ind for ind, thresh in enumerate(fight_thresh_up)
-                     if rand.randrange(0, 0x100) < thresh]
-        fights_down = [ind for ind, thresh in enumerate(fight_thresh_down)
-                       if rand.randrange(0, 0x100) < thresh]
-
-        self.config.omen_elevator_fights_up = fights_up
-        self.config.omen_elevator_fights_down = fights_down
-
     def __set_omen_elevator_ctrom(self, ctrom: CTRom,
                                   fights: list[int],
                                   loc_id: ctenums.LocID):
@@ -598,7 +715,9 @@ class Randomizer:
             return
 
         # With valid config and settings, we can write generate the rom
-        self.__write_out_rom()
+        with self.__stage('rom'), \
+             stagerng.use_stage_rng(self.settings.seed, 'rom'):
+            self.__write_out_rom()
 
     # There are no good tools for working with animation scripts.  The
     # change is small, so we're doing it directly
@@ -633,51 +752,61 @@ class Randomizer:
         # antilife just uses life2's script, not black hole's....
         # ...unless we're in vanilla mode.
         if self.settings.game_mode != rset.GameMode.VANILLA_RANDO:
-            self.__modify_bh_script()
+            with self.__stage('bh_script'):
+                self.__modify_bh_script()
 
         # Subtle Bug Alert:
         # AtkDB needs to count the number of attacks when determining whether
         # it needs to reallocate.  To do this, it reads enemy data.  If the
         # new enemy data is written first, it will read the wrong number of
         # attacks and free too much.  So the ai/atks are written first.
-        config.enemy_aidb.write_to_ctrom(ctrom)
-        config.enemy_atkdb.write_to_ctrom(ctrom)
+        with self.__stage('enemy_ai'):
+            config.enemy_aidb.write_to_ctrom(ctrom)
+            config.enemy_atkdb.write_to_ctrom(ctrom)
 
         # Write enemies out
-        for enemy_id, stats in config.enemy_dict.items():
-            stats.write_to_ctrom(ctrom, enemy_id)
+        with self.__stage('enemies'):
+            for enemy_id, stats in config.enemy_dict.items():
+                stats.write_to_ctrom(ctrom, enemy_id)
 
         # Write treasures out -- this includes key items
         # for treasure in config.treasure_assign_dict.values():
-        for tid in config.treasure_assign_dict:
-            treasure = config.treasure_assign_dict[tid]
-            treasure.write_to_ctrom(ctrom)
+        with self.__stage('treasures'):
+            for tid in config.treasure_assign_dict:
+                treasure = config.treasure_assign_dict[tid]
+                treasure.write_to_ctrom(ctrom)
 
         # Write shops out
-        config.shop_manager.write_to_ctrom(ctrom)
+        with self.__stage('shops'):
+            config.shop_manager.write_to_ctrom(ctrom)
 
         # Write items out
-        config.itemdb.write_to_ctrom(ctrom)
+        with self.__stage('items'):
+            config.itemdb.write_to_ctrom(ctrom)
 
         # Write characters out
         # Recruitment spots
-        for character in config.char_assign_dict.values():
-            character.write_to_ctrom(ctrom)
+        with self.__stage('characters'):
+            for character in config.char_assign_dict.values():
+                character.write_to_ctrom(ctrom)
 
-        # Stats
-        config.char_manager.write_stats_to_ctrom(ctrom)
+            # Stats
+            config.char_manager.write_stats_to_ctrom(ctrom)
 
-        # Write out the rest of the character data (incl. techs)
-        charrando.reassign_characters_on_ctrom(ctrom, config)
+            # Write out the rest of the character data (incl. techs)
+            charrando.reassign_characters_on_ctrom(ctrom, config)
 
         # Write out the bosses
-        bossrando.write_bosses_to_ctrom(ctrom, config)
+        with self.__stage('bosses'):
+            bossrando.write_bosses_to_ctrom(ctrom, config)
 
         # tabs
-        tabwriter.rewrite_tabs_on_ctrom(ctrom, config)
+        with self.__stage('tabs'):
+            tabwriter.rewrite_tabs_on_ctrom(ctrom, config)
 
         # Omen elevator
-        self.__set_omen_elevators_ctrom(ctrom, config)
+        with self.__stage('omen_elevators'):
+            self.__set_omen_elevators_ctrom(ctrom, config)
 
         # Disabling xmenu character locks is only relevant in LoC and IA, but
         # there's no reason not to just do it always.
@@ -685,80 +814,90 @@ class Randomizer:
 
     def __write_out_rom(self):
         '''Given config and settings, write to self.out_rom'''
-        self.out_rom = CTRom(self.base_ctrom.rom_data.getvalue(), True)
+        # The fork shares the base rom's bytes until the first write.
+        with self.__stage('fork'):
+            self.out_rom = self.base_ctrom.fork()
 
         # TODO:  Consider working some of the always-applied script changes
         #        Into patch.ips to improve generation speed.
-        self.__apply_basic_patches(self.out_rom, self.settings)
-        self.__apply_settings_patches(self.out_rom, self.settings)
-        self.__apply_cosmetic_patches(self.out_rom, self.settings)
+        with self.__stage('basic_patches'):
+            self.__apply_basic_patches(self.out_rom, self.settings)
+        with self.__stage('settings_patches'):
+            self.__apply_settings_patches(self.out_rom, self.settings)
+        with self.__stage('cosmetic_patches'):
+            self.__apply_cosmetic_patches(self.out_rom, self.settings)
 
         # This makes copies of heckran cave passagesways, king's trial,
         # and now Zenan Bridge so that all bosses can go there.
         # There's no reason not do just do this regardless of whether
         # boss rando is on.
-        bossrando.duplicate_maps_on_ctrom(self.out_rom)
-        bossrando.duplicate_zenan_bridge(self.out_rom,
-                                         ctenums.LocID.ZENAN_BRIDGE_BOSS)
-
-        # Script changes which can always be made
-        Event = ctevent.Event
-        script_manager = self.out_rom.script_manager
-
-        # Three dc flag patches can be added regardless.  No reason not to.
-
-        # 1) Set magic learning at game start depending on character assignment
-        #    unless LW...because telepod exhibit now has the LW portal change.
-
-        if self.settings.game_mode != rset.GameMode.LOST_WORLDS:
-            telepod_event = Event.from_flux('./flux/cr_telepod_exhibit.flux')
-
-            # 3.1.1 Change:
-            # The only relevant script change with 3.1.1 is setting the
-            # 0x80 bit of 0x7f0057 for the skyway logic in the Telepod
-            # Exhibit script.
-            EC = ctevent.EC
-
-            # set flag cmd -- too lazy to make an EC function for this
-            cmd = EC.generic_two_arg(0x65, 0x07, 0x57)
-            start = telepod_event.get_function_start(0x0E, 0x04)
-            end = telepod_event.get_function_end(0x0E, 0x04)
-
-            # Set the flag right before the screen darkens
-            pos = telepod_event.find_exact_command(EC.fade_screen(),
-                                                   start, end)
-            telepod_event.insert_commands(cmd.to_bytearray(), pos)
-
-            script_manager.set_script(telepod_event,
-                                      ctenums.LocID.TELEPOD_EXHIBIT)
-        else:
-            # The LW mode sets the magic-learned bits on the load screen.
-            # We will just set them all.
-            load_screen_event = script_manager.get_script(
-                ctenums.LocID.LOAD_SCREEN
-                )
+        with self.__stage('duplicate_maps'):
+            bossrando.duplicate_maps_on_ctrom(self.out_rom)
+            bossrando.duplicate_zenan_bridge(self.out_rom,
+                                             ctenums.LocID.ZENAN_BRIDGE_BOSS)
+
+        with self.__stage('common_scripts'):
+            # Script changes which can always be made
+            Event = ctevent.Event
+            script_manager = self.out_rom.script_manager
+
+            # Three dc flag patches can be added regardless.  No reason not to.
+
+            # 1) Set magic learning at game start depending on character
+            #    assignment unless LW...because telepod exhibit now has the
+            #    LW portal change.
+
+            if self.settings.game_mode != rset.GameMode.LOST_WORLDS:
+                telepod_event = \
+                    Event.from_flux('./flux/cr_telepod_exhibit.flux')
+
+                # 3.1.1 Change:
+                # The only relevant script change with 3.1.1 is setting the
+                # 0x80 bit of 0x7f0057 for the skyway logic in the Telepod
+                # Exhibit script.
+                EC = ctevent.EC
+
+                # set flag cmd -- too lazy to make an EC function for this
+                cmd = EC.generic_two_arg(0x65, 0x07, 0x57)
+                start = telepod_event.get_function_start(0x0E, 0x04)
+                end = telepod_event.get_function_end(0x0E, 0x04)
+
+                # Set the flag right before the screen darkens
+                pos = telepod_event.find_exact_command(EC.fade_screen(),
+                                                       start, end)
+                telepod_event.insert_commands(cmd.to_bytearray(), pos)
+
+                script_manager.set_script(telepod_event,
+                                          ctenums.LocID.TELEPOD_EXHIBIT)
+            else:
+                # The LW mode sets the magic-learned bits on the load screen.
+                # We will just set them all.
+                load_screen_event = script_manager.get_script(
+                    ctenums.LocID.LOAD_SCREEN
+                    )
 
-            cmd = ctevent.EC.set_bit(0x7F01E0, 0x01)
-            pos = load_screen_event.find_exact_command(cmd)
+                cmd = ctevent.EC.set_bit(0x7F01E0, 0x01)
+                pos = load_screen_event.find_exact_command(cmd)
 
-            new_cmd = ctevent.EC.assign_val_to_mem(0x7F, 0x7F01E0, 1)
-            load_screen_event.insert_commands(new_cmd.to_bytearray(),
-                                              pos)
+                new_cmd = ctevent.EC.assign_val_to_mem(0x7F, 0x7F01E0, 1)
+                load_screen_event.insert_commands(new_cmd.to_bytearray(),
+                                                  pos)
 
-        # 2) Allows left chest when medal is on non-Frog Frogs
-        burrow_event = Event.from_flux('./flux/cr_burrow.Flux')
+            # 2) Allows left chest when medal is on non-Frog Frogs
+            burrow_event = Event.from_flux('./flux/cr_burrow.Flux')
 
-        # 3) Start Ruins quest when Grand Leon is on non-Frog Frogs
-        choras_cafe_event = Event.from_flux('./flux/cr_choras_cafe.Flux')
+            # 3) Start Ruins quest when Grand Leon is on non-Frog Frogs
+            choras_cafe_event = Event.from_flux('./flux/cr_choras_cafe.Flux')
 
-        script_manager.set_script(burrow_event,
-                                  ctenums.LocID.FROGS_BURROW)
-        script_manager.set_script(choras_cafe_event,
-                                  ctenums.LocID.CHORAS_CAFE)
+            script_manager.set_script(burrow_event,
+                                      ctenums.LocID.FROGS_BURROW)
+            script_manager.set_script(choras_cafe_event,
+                                      ctenums.LocID.CHORAS_CAFE)
 
-        # 4) Fixed trading post script
-        tp_event = Event.from_flux('./flux/jot_trading_post.Flux')
-        script_manager.set_script(tp_event, ctenums.LocID.IOKA_TRADING_POST)
+            # 4) Fixed trading post script
+            tp_event = Event.from_flux('./flux/jot_trading_post.Flux')
+            script_manager.set_script(tp_event,
+                                      ctenums.LocID.IOKA_TRADING_POST)
 
         # Flag specific script changes:
         #   - Locked characters changes to proto dome and dactyl nest
@@ -771,90 +910,103 @@ class Randomizer:
         vanilla = rset.GameMode.VANILLA_RANDO == mode
         epoch_fail = rset.GameFlags.EPOCH_FAIL in flags
 
-        if dup_chars and not lost_worlds:
-            # Lets Spekkio give magic properly to duplicates
-            dc_spekkio_event = Event.from_flux('./flux/charrando-eot.flux')
-            script_manager.set_script(dc_spekkio_event,
-                                      ctenums.LocID.SPEKKIO)
-
-        if locked_chars:
-            lc_dactyl_upper_event = \
-                Event.from_flux('./flux/lc_dactyl_upper.Flux')
-            script_manager.set_script(lc_dactyl_upper_event,
-                                      ctenums.LocID.DACTYL_NEST_UPPER)
-
-            # Note: This changes the Proto Dome script, but it does not change
-            #       which objects/functions have the char recruit data, so the
-            #       randomization doesn't break.  If a script does change that
-            #       data then self.config.char_assign_dict would change.
-            # TODO: Just do surgery on the script instead of loading flux.
-            lc_proto_dome_event = Event.from_flux('./flux/lc_proto_dome.Flux')
-            script_manager.set_script(lc_proto_dome_event,
-                                      ctenums.LocID.PROTO_DOME)
+        with self.__stage('flag_scripts'):
+            if dup_chars and not lost_worlds:
+                # Lets Spekkio give magic properly to duplicates
+                dc_spekkio_event = Event.from_flux('./flux/charrando-eot.flux')
+                script_manager.set_script(dc_spekkio_event,
+                                          ctenums.LocID.SPEKKIO)
+
+            if locked_chars:
+                lc_dactyl_upper_event = \
+                    Event.from_flux('./flux/lc_dactyl_upper.Flux')
+                script_manager.set_script(lc_dactyl_upper_event,
+                                          ctenums.LocID.DACTYL_NEST_UPPER)
+
+                # Note: This changes the Proto Dome script, but it does not
+                #       change which objects/functions have the char recruit
+                #       data, so the randomization doesn't break.  If a script
+                #       does change that data then self.config.char_assign_dict
+                #       would change.
+                # TODO: Just do surgery on the script instead of loading flux.
+                lc_proto_dome_event = \
+                    Event.from_flux('./flux/lc_proto_dome.Flux')
+                script_manager.set_script(lc_proto_dome_event,
+                                          ctenums.LocID.PROTO_DOME)
 
         # Proto fix, Mystic Mtn fix, and Lavos NG+ are candidates for being
         # rolled into patch.ips.
 
         if epoch_fail:
-            epochfail.ground_epoch(self.out_rom)
-            epochfail.update_keepers_dome(self.out_rom)
-            epochfail.undo_epoch_relocation(self.out_rom)
-            epochfail.restore_dactyls(self.out_rom)
-            epochfail.add_dalton_to_snail_stop(self.out_rom)
+            with self.__stage('epochfail'):
+                epochfail.ground_epoch(self.out_rom)
+                epochfail.update_keepers_dome(self.out_rom)
+                epochfail.undo_epoch_relocation(self.out_rom)
+                epochfail.restore_dactyls(self.out_rom)
+                epochfail.add_dalton_to_snail_stop(self.out_rom)
 
-            self.out_rom.rom_data.seek(0x1FFFF)  # debug stuff
-            self.out_rom.rom_data.write(b'\x01')
+                self.out_rom.rom_data.seek(0x1FFFF)  # debug stuff
+                self.out_rom.rom_data.write(b'\x01')
 
         if vanilla:
-            vanillarando.restore_scripts(self.out_rom)
+            with self.__stage('vanillarando'):
+                vanillarando.restore_scripts(self.out_rom)
 
-        # Don't require visiting Flea/Slash rooms for Magus's Castle
-        if self.settings.game_mode != rset.GameMode.LOST_WORLDS:
-            # The Telepod script is different in LW.  Just ignore.
-            self.__set_fast_magus_castle(self.out_rom)
+        with self.__stage('script_fixes'):
+            # Don't require visiting Flea/Slash rooms for Magus's Castle
+            if self.settings.game_mode != rset.GameMode.LOST_WORLDS:
+                # The Telepod script is different in LW.  Just ignore.
+                self.__set_fast_magus_castle(self.out_rom)
 
-        # Use 0x7F01A6 for the cat counter.
-        self.__add_cat_pet_flag(self.out_rom, 0x7F01A6, 0x08)
+            # Use 0x7F01A6 for the cat counter.
+            self.__add_cat_pet_flag(self.out_rom, 0x7F01A6, 0x08)
 
-        # Split the NR "sealed" chests
-        self.__fix_northern_ruins_sealed(self.out_rom)
+            # Split the NR "sealed" chests
+            self.__fix_northern_ruins_sealed(self.out_rom)
 
-        # Update the trading post descriptions
-        self.__update_trading_post_string(self.out_rom, self.config)
+            # Update the trading post descriptions
+            self.__update_trading_post_string(self.out_rom, self.config)
 
-        # Two potential softlocks caused by (presumably) touch == activate.
-        self.__try_proto_dome_fix()
-        self.__try_mystic_mtn_portal_fix()
+            # Two potential softlocks caused by (presumably) touch == activate.
+            self.__try_proto_dome_fix()
+            self.__try_mystic_mtn_portal_fix()
 
-        # Potential recruit loss when characters rescue in prison
-        self.__try_supervisors_office_recruit_fix()
+            # Potential recruit loss when characters rescue in prison
+            self.__try_supervisors_office_recruit_fix()
 
-        # Enable NG+ by defeating Lavos without doing Omen.
-        self.__lavos_ngplus()
+            # Enable NG+ by defeating Lavos without doing Omen.
+            self.__lavos_ngplus()
 
         # Everything prior was purely based on settings, not the randomization.
         # Now, write the information from the config to the rom.
-        self.__write_config_to_out_rom()
+        with self.__stage('write_config'):
+            self.__write_config_to_out_rom()
 
         # Ice Age/LoC script changes need to go after the config is written
         # because the recruit spot works by changing all character recruit
         # commands into the recruit's version.  The code inserted by theen
         # recruit locks would get incorrectly changed by this.
-        mode = self.settings.game_mode
-        if mode == rset.GameMode.ICE_AGE:
-            iceage.set_ice_age_recruit_locks(self.out_rom,
-                                             self.config)
-            iceage.set_ice_age_dungeon_locks(self.out_rom, self.config)
-            iceage.set_ending_after_woe(self.out_rom)
-        elif mode == rset.GameMode.LEGACY_OF_CYRUS:
-            legacyofcyrus.write_loc_recruit_locks(self.out_rom,
-                                                  self.config)
-            legacyofcyrus.write_loc_dungeon_locks(self.out_rom)
-            legacyofcyrus.set_ending_after_ozzies_fort(self.out_rom)
-        elif mode == rset.GameMode.VANILLA_RANDO:
-            vanillarando.restore_sos(self.out_rom, self.config)
-
-        self.out_rom.write_all_scripts_to_rom()
+        with self.__stage('mode_scripts'):
+            mode = self.settings.game_mode
+            if mode == rset.GameMode.ICE_AGE:
+                iceage.set_ice_age_recruit_locks(self.out_rom,
+                                                 self.config)
+                iceage.set_ice_age_dungeon_locks(self.out_rom, self.config)
+                iceage.set_ending_after_woe(self.out_rom)
+            elif mode == rset.GameMode.LEGACY_OF_CYRUS:
+                legacyofcyrus.write_loc_recruit_locks(self.out_rom,
+                                                      self.config)
+                legacyofcyrus.write_loc_dungeon_locks(self.out_rom)
+                legacyofcyrus.set_ending_after_ozzies_fort(self.out_rom)
+            elif mode == rset.GameMode.VANILLA_RANDO:
+                vanillarando.restore_sos(self.out_rom, self.config)
+
+        # Map duplication edits the exit table in memory.  Write it once.
+        with self.__stage('write_exits'):
+            self.out_rom.write_loc_exits()
+
+        with self.__stage('write_scripts'):
+            self.out_rom.write_all_scripts_to_rom()
         self.has_generated = True
 
     def get_generated_rom(self) -> bytearray:
@@ -1229,15 +1381,31 @@ class Randomizer:
 
         file_object.write('\n')
 
+    # Patches that are always applied to a jets rom, in order.
+    _basic_patch_files = [
+        './patch.ips',
+        # 99.9% sure this patch is redundant now
+        './patches/patch_codebase.txt',
+        # I verified that the following convenience patches which are now
+        # always applied are disjoint from the glitch fix patches, so it's
+        # safe to move them here.
+        './patches/fast_overworld_walk_patch.txt',
+        './patches/faster_epoch_patch.txt',
+        './patches/faster_menu_dpad.txt'
+    ]
+
+    _hard_patch_files = ['./patches/hard.ips']
+
     # Because switching logic is a feature now, we need a settings object.
     # Ugly.  BETA_LOGIC flag is gone now, but keeping it as-is in case of
     # logic changes to test.
     @classmethod
     def __apply_basic_patches(cls, ctrom: CTRom,
                               settings: rset.Settings = None):
-        '''Apply patches that are always applied to a jets rom.'''
-        rom_data = ctrom.rom_data
-
+        '''
+        Apply patches that are always applied to a jets rom.  Returns the
+        romsnapshot key of the patched rom.
+        '''
         if settings is None:
             # Will give non-beta patch.  Outside of normal randomization,
             # where a settings object is provided, this function is only
@@ -1251,23 +1419,20 @@ class Randomizer:
         #   - Tech data for TechDB
         #   - Item data (including prices) for shops
         # patch_codebase.txt may not be needed
-        rom_data.patch_ips_file('./patch.ips')
-
-        # 99.9% sure this patch is redundant now
-        rom_data.patch_txt_file('./patches/patch_codebase.txt')
-
-        # I verified that the following convenience patches which are now
-        # always applied are disjoint from the glitch fix patches, so it's
-        # safe to move them here.
-        rom_data.patch_txt_file('./patches/fast_overworld_walk_patch.txt')
-        rom_data.patch_txt_file('./patches/faster_epoch_patch.txt')
-        rom_data.patch_txt_file('./patches/faster_menu_dpad.txt')
+        #
+        # The result of patching is cached (see romsnapshot.py), so after
+        # the first seed this is just a copy of the patched rom.
+        patch_key = romsnapshot.apply_patches_cached(
+            ctrom, cls._basic_patch_files
+        )
 
         # It should be safe to move the robo's ribbon code here since it
         # also doesn't depend on flags and should be applied prior to anything
         # else that messes with the items because it shuffles effects
         # roboribbon.robo_ribbon_speed(rom_data.getbuffer())
 
+        return patch_key
+
     @classmethod
     def __apply_settings_patches(cls, ctrom: CTRom,
                                  settings: rset.Settings):
@@ -1365,6 +1530,89 @@ class Randomizer:
         with open('./pickles/default_randoconfig.pickle', 'wb') as outfile:
             pickle.dump(config, outfile)
 
+    @classmethod
+    def get_rom_config(cls, ct_vanilla: bytearray,
+                       settings: rset.Settings) -> cfg.RandoConfig:
+        '''
+        The parts of the base config which are read from the (patched) rom.
+        get_base_config_from_settings makes its changes on top of this.
+        '''
+        # The rom-derived parts of the config don't depend on the seed, so
+        # they are built once per (rom, patch set) and cloned from
+        # configcache after that.  The keys are content hashes of the rom and
+        # patches (see romsnapshot.py) so there's no need to redump anything
+        # when patch.ips or hard.ips change.
+        #
+        # The roms are only patched if something actually needs to be read.
+        cache = configcache.get_default_cache()
+        vanilla_key = romsnapshot.get_bytes_key(ct_vanilla)
+        basic_key = romsnapshot.get_patch_key(vanilla_key,
+                                              cls._basic_patch_files)
+        hard_key = romsnapshot.get_patch_key(basic_key,
+                                             cls._hard_patch_files)
+
+        # The parsers get their own bytearray copy of the rom.  They keep
+        # slices of it in the config (e.g. PCStats.stat_block), and slices of
+        # a memoryview can't be pickled into the cache or edited on their
+        # own.  Only a cache miss pays for the copy.
+        def get_vanilla_rom() -> bytearray:
+            return bytearray(ct_vanilla)
+
+        def get_basic_rom() -> bytearray:
+            ctrom = CTRom(ct_vanilla, True)
+            Randomizer.__apply_basic_patches(ctrom)
+            return bytearray(ctrom.rom_data.getbuffer())
+
+        hard_rom = None
+
+        def get_hard_rom() -> bytearray:
+            nonlocal hard_rom
+            if hard_rom is None:
+                ctrom = CTRom(ct_vanilla, True)
+                Randomizer.__apply_basic_patches(ctrom)
+                romsnapshot.apply_patches_cached(ctrom, cls._hard_patch_files,
+                                                 base_key=basic_key)
+                hard_rom = bytearray(ctrom.rom_data.getbuffer())
+            return hard_rom
+
+        if settings.game_mode == rset.GameMode.VANILLA_RANDO:
+            # The only part of the config that depends on settings is the
+            # boss data, and that only depends on the game mode being VR.
+            return cache.get_or_build(
+                f'{vanilla_key}:vanilla_rando_config',
+                lambda: cfg.RandoConfig.get_config_from_rom(
+                    get_vanilla_rom(), settings
+                )
+            )
+
+        config = cache.get_or_build(
+            f'{basic_key}:config',
+            lambda: cfg.RandoConfig.get_config_from_rom(get_basic_rom())
+        )
+
+        # Get hard versions of config items if needed.
+        if settings.enemy_difficulty == rset.Difficulty.HARD:
+            config.enemy_dict = cache.get_or_build(
+                f'{hard_key}:enemy_dict',
+                lambda: cfg.enemystats.get_stat_dict(get_hard_rom())
+            )
+
+        if settings.item_difficulty == rset.Difficulty.HARD:
+            config.itemdb = cache.get_or_build(
+                f'{hard_key}:itemdb',
+                lambda: cfg.itemdata.ItemDB.from_rom(get_hard_rom())
+            )
+
+        return config
+
+    @classmethod
+    def get_vanilla_techdb(cls, ct_vanilla: bytearray) -> charrando.TechDB:
+        '''The unpatched rom's TechDB (cloned from configcache).'''
+        return configcache.get_default_cache().get_or_build(
+            f'{romsnapshot.get_bytes_key(ct_vanilla)}:techdb',
+            lambda: charrando.TechDB.get_default_db(bytearray(ct_vanilla))
+        )
+
     @classmethod
     def get_base_config_from_settings(cls,
                                       ct_vanilla: bytearray,
@@ -1385,39 +1633,12 @@ class Randomizer:
           - enemy_aidb: Various enemy attack scripts are changed by patch.ips.
         '''
 
-        # It's a little wasteful copying the rom data to partially patch it
-        # to extract the base values for the above.
-
-        # I do have a pickle with a default config and normal/hard enemy dicts
-        # which can be used instead if this is an issue.  The problem with
-        # using those is the need to update them with every patch.
-        ctrom = CTRom(ct_vanilla, True)
-        Randomizer.__apply_basic_patches(ctrom)
+        config = cls.get_rom_config(ct_vanilla, settings)
 
         if settings.game_mode == rset.GameMode.VANILLA_RANDO:
-            config = cfg.RandoConfig.get_config_from_rom(
-                ct_vanilla, settings)
             vanillarando.fix_config(config)
 
         else:
-            config = cfg.RandoConfig.get_config_from_rom(
-                bytearray(ctrom.rom_data.getvalue())
-            )
-
-            # Get hard versions of config items if needed.
-            # We're done with the rom at this point, so it's OK to patch
-            # regardless.
-            ctrom.rom_data.patch_ips_file('./patches/hard.ips')
-            if settings.enemy_difficulty == rset.Difficulty.HARD:
-                config.enemy_dict = cfg.enemystats.get_stat_dict(
-                    ctrom.rom_data.getvalue()
-                )
-
-            if settings.item_difficulty == rset.Difficulty.HARD:
-                config.itemdb = cfg.itemdata.ItemDB.from_rom(
-                    ctrom.rom_data.getvalue()
-                )
-
             # Why is Dalton worth so few TP?
             config.enemy_dict[ctenums.EnemyID.DALTON_PLUS].tp = 50
 
@@ -1472,8 +1693,7 @@ class Randomizer:
 
             # Revert antilife to black hole
             if rset.GameFlags.BLACKHOLE_REWORK in settings.gameflags:
-                TechDB = charrando.TechDB
-                vanilla_db = TechDB.get_default_db(ct_vanilla)
+                vanilla_db = cls.get_vanilla_techdb(ct_vanilla)
                 black_hole = vanilla_db.get_tech(ctenums.TechID.ANTI_LIFE)
 
                 anti_life = techdb.get_tech(ctenums.TechID.ANTI_LIFE)
@@ -1612,6 +1832,15 @@ def read_names():
 #
 # Handle the command line interface for the randomizer.
 #
+
+# Exit codes for the command line.  argparse itself exits with 2 on bad
+# arguments.
+EXIT_OK = 0
+EXIT_GENERATION_FAILED = 1
+EXIT_BAD_INPUT = 2
+EXIT_BAD_ROM = 3
+
+
 def generate_from_command_line():
 
     sourcefile, outputfolder = get_input_file_from_command_line()
@@ -1664,7 +1893,7 @@ def get_input_file_from_command_line() -> (str, str):
 
     if not os.path.isfile(sourcefile):
         input("Error: File does not exist.")
-        exit()
+        raise SystemExit(EXIT_BAD_INPUT)
 
     print(extension)
     if extension not in ('.sfc', '.smc'):
@@ -1673,7 +1902,7 @@ def get_input_file_from_command_line() -> (str, str):
             "Try placing the ROM in the same folder as the randomizer. "
             "Also, try writing the extension(.sfc/smc)."
         )
-        exit()
+        raise SystemExit(EXIT_BAD_INPUT)
 
     # In theory ask for alternate output folder, but for now just place in
     # the same one.
@@ -1838,13 +2067,185 @@ def get_settings_from_command_line() -> rset.Settings:
     return settings
 
 
+#
+# Headless (non-interactive) command line.
+#
+def read_settings_file(filename: str) -> rset.Settings:
+    '''
+    Read pickled Settings.  Also accepts the gui's saved settings file, which
+    pickles [settings, input_file, output_dir].
+    '''
+    with open(filename, 'rb') as infile:
+        data = pickle.load(infile)
+
+    if isinstance(data, (list, tuple)) and data:
+        data = data[0]
+
+    if not isinstance(data, rset.Settings):
+        raise TypeError(f'{filename} does not hold randomizer settings.')
+
+    return data
+
+
+def get_headless_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='Generate a seed without any prompts.'
+    )
+    parser.add_argument('rom', help='vanilla Chrono Trigger rom')
+    parser.add_argument(
+        '-o', '--output',
+        help='output rom path, or a folder for the default name '
+        '(default: the rom\'s folder)'
+    )
+    parser.add_argument('-s', '--seed', default='',
+                        help='seed (default: random)')
+
+    settings_group = parser.add_mutually_exclusive_group(required=True)
+    settings_group.add_argument(
+        '-f', '--flags', help='flag string, e.g. st.ngzpmte or mystery'
+    )
+    settings_group.add_argument(
+        '--settings', help='pickled Settings or the gui\'s settings file'
+    )
+
+    parser.add_argument('--spoilers', action='store_true',
+                        help='also write .spoilers.txt/.spoilers.json')
+    parser.add_argument('--ignore-checksum', action='store_true',
+                        help='allow a rom which is not vanilla CT')
+    parser.add_argument(
+        '--config-cache', nargs='?', const='', default=None, metavar='DIR',
+        help='keep the parsed base config in DIR (default: the user cache '
+        'directory) so later runs can skip parsing the rom'
+    )
+    parser.add_argument(
+        '--rom-cache', nargs='?', const='', default=None, metavar='DIR',
+        help='keep the patched rom in DIR (default: the user cache '
+        'directory) so later runs can skip patching it'
+    )
+
+    profile_group = parser.add_argument_group('profiling')
+    profile_group.add_argument('--timings', action='store_true',
+                               help='print the time taken by each stage')
+    profile_group.add_argument('--track-allocations', action='store_true',
+                               help='also record allocations (slow)')
+    profile_group.add_argument(
+        '--profile-stage', action='append', default=[],
+        help='run a stage (e.g. config/logicwriter) under cProfile and '
+        'write a .prof file next to the output rom.  Can be repeated.'
+    )
+
+    stage_group = parser.add_argument_group('config stages')
+    stage_group.add_argument(
+        '--config-workers', type=int, default=1,
+        help='run independent config stages in this many processes'
+    )
+    stage_group.add_argument(
+        '--check-stages', action='store_true',
+        help='fail if a config stage uses a field it does not declare'
+    )
+
+    return parser
+
+
+def generate_headless(argv: list[str] = None) -> int:
+    '''
+    Generate one seed from command line arguments (sys.argv[1:] if argv is
+    None).  Returns an exit code instead of prompting or exiting.
+    '''
+    parser = get_headless_arg_parser()
+    args = parser.parse_args(argv)
+
+    if args.flags is not None:
+        try:
+            settings = rset.Settings.from_flag_string(args.flags)
+        except rset.InvalidFlagStringException as ex:
+            print(f'Error: {ex}', file=sys.stderr)
+            return EXIT_BAD_INPUT
+    else:
+        try:
+            settings = read_settings_file(args.settings)
+        except (OSError, pickle.UnpicklingError, EOFError, TypeError,
+                AttributeError) as ex:
+            print(f'Error: Unable to read settings: {ex}', file=sys.stderr)
+            return EXIT_BAD_INPUT
+
+    if args.config_cache is not None:
+        configcache.enable_disk_cache(args.config_cache or None)
+
+    if args.rom_cache is not None:
+        romsnapshot.enable_disk_cache(args.rom_cache or None)
+
+    settings.seed = args.seed
+    if settings.seed == '':
+        names = read_names()
+        settings.seed = "".join(rand.choice(names) for i in range(2))
+
+    try:
+        ct_rom = CTRom.from_file(args.rom, args.ignore_checksum)
+    except OSError as ex:
+        print(f'Error: Unable to read rom: {ex}', file=sys.stderr)
+        return EXIT_BAD_INPUT
+    except InvalidRomException as ex:
+        print(f'Error: {ex.message}  Use --ignore-checksum to proceed '
+              'anyway.', file=sys.stderr)
+        return EXIT_BAD_ROM
+
+    file_name = os.path.basename(args.rom)
+    _, ext = os.path.splitext(file_name)
+    flag_string = settings.get_flag_string()
+    default_name = f"{file_name.split('.')[0]}.{flag_string}.{settings.seed}"
+
+    if args.output is None:
+        out_path = os.path.join(os.path.dirname(args.rom),
+                                default_name + ext)
+    elif os.path.isdir(args.output):
+        out_path = os.path.join(args.output, default_name + ext)
+    else:
+        out_path = args.output
+
+    try:
+        rando = Randomizer.from_ctrom(ct_rom, settings)
+
+        if args.timings or args.track_allocations or args.profile_stage:
+            rando.profiler = stageprofiler.StageProfiler(
+                args.track_allocations, args.profile_stage,
+                os.path.dirname(os.path.abspath(out_path))
+            )
+
+        rando.config_workers = args.config_workers
+        rando.check_stages = args.check_stages
+        rando.set_random_config()
+        out_rom = rando.get_generated_rom()
+
+        with open(out_path, 'wb') as outfile:
+            outfile.write(out_rom)
+
+        if args.spoilers:
+            base_path, _ = os.path.splitext(out_path)
+            rando.write_spoiler_log(base_path + '.spoilers.txt')
+            rando.write_json_spoiler_log(base_path + '.spoilers.json')
+    except Exception:
+        traceback.print_exc()
+        return EXIT_GENERATION_FAILED
+
+    print(f"generated: {out_path}")
+
+    if rando.profiler is not None:
+        print(rando.profiler.format_report())
+
+    return EXIT_OK
+
+
 def main():
     if len(sys.argv) > 1 and sys.argv[1] == "-c":
         generate_from_command_line()
+    elif len(sys.argv) > 1:
+        sys.exit(generate_headless(sys.argv[1:]))
     else:
         print("Please run randomizergui.py for a graphical interface. \n"
               "Either randomizer.py or randomizergui.py can be run with the "
-              "-c option to use\nthe command line.")
+              "-c option to use\nthe command line.  For generation without "
+              "prompts, run randomizer.py -h to see the options.")
 
 
 if __name__ == "__main__":
@@ -251,6 +251,52 @@ class MysterySettings:
         return ret_str
 
 
+class InvalidFlagStringException(Exception):
+    pass
+
+
+# Pieces of the flag string (see Settings.get_flag_string)
+_diff_str_dict = {
+    Difficulty.EASY: 'e',
+    Difficulty.NORMAL: 'n',
+    Difficulty.HARD: 'h',
+}
+
+_tech_str_dict = {
+    TechOrder.FULL_RANDOM: 'te',
+    TechOrder.BALANCED_RANDOM: 'tex',
+    TechOrder.NORMAL: ''
+}
+
+_game_mode_str_dict = {
+    GameMode.STANDARD: 'st',
+    GameMode.LOST_WORLDS: 'lw',
+    GameMode.ICE_AGE: 'ia',
+    GameMode.LEGACY_OF_CYRUS: 'loc',
+    GameMode.VANILLA_RANDO: 'van'
+}
+
+_flag_str_dict = {
+    GameFlags.FIX_GLITCH: 'g',
+    GameFlags.BOSS_SCALE: 'b',
+    GameFlags.BOSS_RANDO: 'ro',
+    GameFlags.ZEAL_END: 'z',
+    GameFlags.FAST_PENDANT: 'p',
+    GameFlags.LOCKED_CHARS: 'c',
+    GameFlags.UNLOCKED_MAGIC: 'm',
+    GameFlags.CHRONOSANITY: 'cr',
+    GameFlags.TAB_TREASURES: 'tb',
+    GameFlags.DUPLICATE_CHARS: 'dc',
+}
+
+_shop_str_dict = {
+    ShopPrices.FREE: 'spf',
+    ShopPrices.MOSTLY_RANDOM: 'spm',
+    ShopPrices.FULLY_RANDOM: 'spr',
+    ShopPrices.NORMAL: ''
+}
+
+
 class Settings:
 
     def __init__(self):
@@ -371,47 +417,6 @@ class Settings:
 
     def get_flag_string(self):
         # Flag string is based only on main game flags and game mode
-
-        diff_str_dict = {
-            Difficulty.EASY: 'e',
-            Difficulty.NORMAL: 'n',
-            Difficulty.HARD: 'h',
-        }
-
-        tech_str_dict = {
-            TechOrder.FULL_RANDOM: 'te',
-            TechOrder.BALANCED_RANDOM: 'tex',
-            TechOrder.NORMAL: ''
-        }
-
-        game_mode_dict = {
-            GameMode.STANDARD: 'st',
-            GameMode.LOST_WORLDS: 'lw',
-            GameMode.ICE_AGE: 'ia',
-            GameMode.LEGACY_OF_CYRUS: 'loc',
-            GameMode.VANILLA_RANDO: 'van'
-        }
-
-        flag_str_dict = {
-            GameFlags.FIX_GLITCH: 'g',
-            GameFlags.BOSS_SCALE: 'b',
-            GameFlags.BOSS_RANDO: 'ro',
-            GameFlags.ZEAL_END: 'z',
-            GameFlags.FAST_PENDANT: 'p',
-            GameFlags.LOCKED_CHARS: 'c',
-            GameFlags.UNLOCKED_MAGIC: 'm',
-            GameFlags.CHRONOSANITY: 'cr',
-            GameFlags.TAB_TREASURES: 'tb',
-            GameFlags.DUPLICATE_CHARS: 'dc',
-        }
-
-        shop_str_dict = {
-            ShopPrices.FREE: 'spf',
-            ShopPrices.MOSTLY_RANDOM: 'spm',
-            ShopPrices.FULLY_RANDOM: 'spr',
-            ShopPrices.NORMAL: ''
-        }
-
         if GameFlags.MYSTERY in self.gameflags:
             flag_string = 'mystery'
         else:
@@ -420,19 +425,108 @@ class Settings:
             # This won't match for easy, since there's no easy enemy
             # difficulty.
             flag_string = ''
-            flag_string += (game_mode_dict[self.game_mode] + '.')
-            flag_string += diff_str_dict[self.enemy_difficulty]
+            flag_string += (_game_mode_str_dict[self.game_mode] + '.')
+            flag_string += _diff_str_dict[self.enemy_difficulty]
 
             # Add the item difficulty if it differs
             # (old 'e' will end up as 'ne')
             if self.item_difficulty != self.enemy_difficulty:
-                flag_string += diff_str_dict[self.item_difficulty]
+                flag_string += _diff_str_dict[self.item_difficulty]
 
-            for flag in flag_str_dict:
+            for flag in _flag_str_dict:
                 if flag in self.gameflags:
-                    flag_string += flag_str_dict[flag]
+                    flag_string += _flag_str_dict[flag]
 
-            flag_string += tech_str_dict[self.techorder]
-            flag_string += shop_str_dict[self.shopprices]
+            flag_string += _tech_str_dict[self.techorder]
+            flag_string += _shop_str_dict[self.shopprices]
 
         return flag_string
+
+    def from_flag_string(flag_string: str) -> Settings:
+        '''
+        Build Settings from a string given by get_flag_string.  Anything not
+        in the flag string (cosmetics, tabs, boss rando details, ...) keeps
+        its default value and the seed is left blank.
+        '''
+        ret = Settings()
+        ret.seed = ''
+
+        if flag_string == 'mystery':
+            ret.gameflags = GameFlags.MYSTERY
+            return ret
+
+        mode_str, sep, flags_str = flag_string.partition('.')
+        game_modes = {
+            mode_str: mode for mode, mode_str in _game_mode_str_dict.items()
+        }
+        if not sep or mode_str not in game_modes:
+            raise InvalidFlagStringException(
+                f'Unknown game mode in flag string \'{flag_string}\'.'
+            )
+
+        ret.game_mode = game_modes[mode_str]
+
+        difficulties = {
+            diff_str: diff for diff, diff_str in _diff_str_dict.items()
+        }
+        if flags_str[:1] not in difficulties:
+            raise InvalidFlagStringException(
+                f'Missing difficulty in flag string \'{flag_string}\'.'
+            )
+
+        ret.enemy_difficulty = difficulties[flags_str[0]]
+        ret.item_difficulty = ret.enemy_difficulty
+        pos = 1
+
+        if flags_str[pos:pos+1] in difficulties:
+            ret.item_difficulty = difficulties[flags_str[pos]]
+            pos += 1
+
+        # Some flags are prefixes of others (c/cr, te/tex), so always take
+        # the longest match.  Checking the result against get_flag_string
+        # below catches anything that was out of order.
+        tokens = dict()
+        tokens.update(
+            {token: ('flag', flag) for flag, token in _flag_str_dict.items()}
+        )
+        tokens.update(
+            {token: ('tech', tech) for tech, token in _tech_str_dict.items()
+             if token}
+        )
+        tokens.update(
+            {token: ('shop', shop) for shop, token in _shop_str_dict.items()
+             if token}
+        )
+        ordered_tokens = sorted(tokens, key=len, reverse=True)
+
+        ret.gameflags = GameFlags(0)
+        ret.techorder = TechOrder.NORMAL
+        ret.shopprices = ShopPrices.NORMAL
+
+        while pos < len(flags_str):
+            for token in ordered_tokens:
+                if flags_str.startswith(token, pos):
+                    break
+            else:
+                raise InvalidFlagStringException(
+                    f'Unknown flag \'{flags_str[pos:]}\' in flag string '
+                    f'\'{flag_string}\'.'
+                )
+
+            token_type, value = tokens[token]
+            if token_type == 'flag':
+                ret.gameflags |= value
+            elif token_type == 'tech':
+                ret.techorder = value
+            else:
+                ret.shopprices = value
+
+            pos += len(token)
+
+        if ret.get_flag_string() != flag_string:
+            raise InvalidFlagStringException(
+                f'Malformed flag string \'{flag_string}\'.  Expected '
+                f'\'{ret.get_flag_string()}\'.'
+            )
+
+        return ret
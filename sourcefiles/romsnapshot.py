@@ -0,0 +1,287 @@
+'''
+Cache of pre-patched rom snapshots.
+
+Every seed starts by applying the same patches (patch.ips, the codebase and
+convenience .txt patches, and sometimes hard.ips) to a copy of the base rom
+and rebuilding the free space markers.  This module remembers the result of
+applying an ordered list of patches to a given rom so that later seeds only
+need to copy the patched bytes and markers back in.
+
+Snapshots are keyed by a hash of the rom contents (including the free space
+markers) and the exact, ordered list of patch files with their contents.
+The key also includes SNAPSHOT_FORMAT_VERSION and a hash of the source of
+the modules which apply patches and build markers (freespace.py and this
+module).  Changing any patch file, the order of patches or that code gives
+a new key, so the cache never goes stale.
+
+The cache lives in memory unless a directory is given.  enable_disk_cache
+turns on the on-disk store for the default cache (by default in the user's
+cache directory).
+'''
+from __future__ import annotations
+from dataclasses import dataclass
+import functools
+import hashlib
+from io import BytesIO
+import os
+import pickle
+import typing
+
+import freespace
+from freespace import FreeSpace, FSRom, get_parsed_patch
+
+if typing.TYPE_CHECKING:
+    from ctrom import CTRom
+
+
+# Bump when the layout of a RomSnapshot changes.
+SNAPSHOT_FORMAT_VERSION = 1
+
+# The modules whose code decides a snapshot's bytes and markers
+_SOURCE_FILES = (freespace.__file__, __file__)
+
+
+def get_user_cache_dir() -> str:
+    '''The per-user directory for the on-disk store.'''
+    cache_home = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(cache_home, 'jetsoftime', 'rom_snapshots')
+
+
+@functools.lru_cache(maxsize=None)
+def _get_code_fingerprint() -> typing.Optional[str]:
+    '''
+    Hash the source of the patching modules.  Returns None if any source is
+    unavailable (e.g. a frozen executable).
+    '''
+    hasher = hashlib.sha256()
+    hasher.update(f'{SNAPSHOT_FORMAT_VERSION}'.encode('ascii'))
+
+    for filename in _SOURCE_FILES:
+        try:
+            with open(filename, 'rb') as infile:
+                hasher.update(hashlib.sha256(infile.read()).digest())
+        except (OSError, TypeError):
+            return None
+
+    return hasher.hexdigest()
+
+
+@dataclass(frozen=True)
+class RomSnapshot:
+    '''Immutable copy of an FSRom's data and free space markers.'''
+    rom: bytes
+    num_bytes: int
+    first_free: bool
+    markers: tuple[int, ...]
+
+    @classmethod
+    def from_fsrom(cls, fsrom: FSRom) -> RomSnapshot:
+        space_man = fsrom.space_manager
+        return cls(fsrom.getvalue(), space_man.num_bytes,
+                   space_man.first_free, tuple(space_man.markers))
+
+    def get_free_space(self) -> FreeSpace:
+        space_man = FreeSpace(self.num_bytes, self.first_free)
+        space_man.markers = list(self.markers)
+        return space_man
+
+    def restore_to_fsrom(self, fsrom: FSRom):
+        '''Overwrite fsrom's data and markers with this snapshot's.'''
+        # Reinitializing the BytesIO shares the snapshot's bytes instead of
+        # copying them now.  The copy happens at fsrom's first write or
+        # getbuffer().  Nothing gets marked.
+        BytesIO.__init__(fsrom, self.rom)
+        fsrom.space_manager = self.get_free_space()
+
+
+def _hash_rom(data, first_free: bool, markers: list[int]) -> str:
+    hasher = hashlib.sha256()
+    hasher.update(data)
+    hasher.update(f'{first_free}:{markers}'.encode('ascii'))
+    return hasher.hexdigest()
+
+
+def get_rom_key(fsrom: FSRom) -> str:
+    '''Hash an FSRom's data and free space markers.'''
+    space_man = fsrom.space_manager
+    with fsrom.getbuffer() as buf:
+        return _hash_rom(buf, space_man.first_free, space_man.markers)
+
+
+def get_bytes_key(rom: bytes) -> str:
+    '''
+    Get the key that get_rom_key would give for FSRom(rom) without copying
+    rom into an FSRom.
+    '''
+    return _hash_rom(rom, False, [0, len(rom)])
+
+
+def get_patch_key(base_key: str, patch_files: typing.Sequence[str]) -> str:
+    '''
+    Get the key for the result of applying patch_files (in order) to the rom
+    with key base_key.
+    '''
+    hasher = hashlib.sha256()
+    hasher.update(base_key.encode('ascii'))
+    hasher.update(f'{_get_code_fingerprint()}'.encode('ascii'))
+
+    for filename in patch_files:
+        hasher.update(filename.encode('utf-8'))
+        hasher.update(get_parsed_patch(filename).digest.encode('ascii'))
+
+    return hasher.hexdigest()
+
+
+def apply_patch_file(fsrom: FSRom, filename: str):
+    '''Apply an .ips or .txt patch according to its extension.'''
+    fsrom.apply_patch(get_parsed_patch(filename))
+
+
+class SnapshotCache:
+    '''
+    Holds RomSnapshots in memory and (optionally) in a directory on disk.
+
+    The on-disk store lets separate processes (e.g. a pool of seed generators)
+    share the work of patching.  Failures to read or write the directory are
+    ignored and the cache silently falls back to memory only.  So is the
+    directory when the patching code's source is unavailable, because then
+    the keys can't tell the code apart.
+    '''
+
+    def __init__(self, cache_dir: typing.Optional[str] = None,
+                 max_disk_entries: int = 8):
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.snapshots: dict[str, RomSnapshot] = dict()
+
+    def __get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.snapshot')
+
+    def __uses_disk(self) -> bool:
+        return self.cache_dir is not None and \
+            _get_code_fingerprint() is not None
+
+    def get(self, key: str) -> typing.Optional[RomSnapshot]:
+        if key in self.snapshots:
+            return self.snapshots[key]
+
+        if not self.__uses_disk():
+            return None
+
+        try:
+            with open(self.__get_path(key), 'rb') as infile:
+                snapshot = pickle.load(infile)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+        if not isinstance(snapshot, RomSnapshot):
+            return None
+
+        self.snapshots[key] = snapshot
+        return snapshot
+
+    def put(self, key: str, snapshot: RomSnapshot):
+        self.snapshots[key] = snapshot
+
+        if not self.__uses_disk():
+            return
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            # Write to a temporary file first so that a concurrent reader
+            # never sees a partial snapshot.
+            path = self.__get_path(key)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as outfile:
+                pickle.dump(snapshot, outfile)
+            os.replace(tmp_path, path)
+
+            self.__prune_disk()
+        except OSError:
+            pass
+
+    def __prune_disk(self):
+        '''Keep only the most recent max_disk_entries snapshots on disk.'''
+        paths = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.endswith('.snapshot')
+        ]
+
+        if len(paths) <= self.max_disk_entries:
+            return
+
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[self.max_disk_entries:]:
+            os.remove(path)
+
+    def clear(self):
+        self.snapshots.clear()
+
+
+_default_cache = SnapshotCache()
+
+
+def get_default_cache() -> SnapshotCache:
+    return _default_cache
+
+
+def enable_disk_cache(cache_dir: typing.Optional[str] = None):
+    '''
+    Keep the default cache's snapshots in cache_dir (default: the user's
+    cache directory) so that later runs can reuse them.
+    '''
+    if cache_dir is None:
+        cache_dir = get_user_cache_dir()
+
+    _default_cache.cache_dir = cache_dir
+
+
+def set_default_cache(cache: SnapshotCache):
+    global _default_cache
+    _default_cache = cache
+
+
+def apply_patches_cached(ctrom: CTRom,
+                         patch_files: typing.Sequence[str],
+                         base_key: typing.Optional[str] = None,
+                         cache: typing.Optional[SnapshotCache] = None) -> str:
+    '''
+    Apply patch_files (in order) to ctrom, reusing a cached result if one
+    exists.  Returns the key of the patched rom so that callers can chain
+    further cached patches without rehashing the rom.
+
+    This should only be used on a ctrom whose ScriptManager has not loaded
+    any scripts because restoring a snapshot replaces the rom data.
+    '''
+    if cache is None:
+        cache = _default_cache
+
+    fsrom = ctrom.rom_data
+
+    if base_key is None:
+        base_key = get_rom_key(fsrom)
+
+    key = get_patch_key(base_key, patch_files)
+    snapshot = cache.get(key)
+
+    if snapshot is None:
+        for filename in patch_files:
+            apply_patch_file(fsrom, filename)
+
+        cache.put(key, RomSnapshot.from_fsrom(fsrom))
+    else:
+        snapshot.restore_to_fsrom(fsrom)
+
+    return key
+
+
+def main():
+    pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+'''
+Generate many seeds from one base rom.
+
+The base rom is read and validated once, and the rom-derived part of the base
+config (see configcache.py) is built once in the parent for every game mode
+and difficulty that the batch can need.  The worker pool is forked after
+that, so the workers share the base rom and the warm config cache with the
+parent copy-on-write instead of each re-reading and re-patching the rom.
+
+Each worker writes its finished rom and spoiler logs straight to the output
+directory, and a SeedResult with the seed's timing is streamed back as soon
+as the seed is done.
+
+Example:
+    python3 seedbatch.py ct.sfc out --flags st.ngzpmte --count 1000
+'''
+from __future__ import annotations
+import argparse
+import copy
+from dataclasses import dataclass, asdict
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+import traceback
+import typing
+
+import bossdata
+from ctrom import CTRom, InvalidRomException
+import randomizer
+import randosettings as rset
+
+
+@dataclass
+class SeedResult:
+    seed: str
+    rom_path: typing.Optional[str] = None
+    spoiler_path: typing.Optional[str] = None
+    json_spoiler_path: typing.Optional[str] = None
+
+    # Seconds spent making the config, writing the rom, and writing files
+    config_time: float = 0.0
+    generate_time: float = 0.0
+    write_time: float = 0.0
+
+    # Formatted traceback if the seed failed
+    error: typing.Optional[str] = None
+
+    @property
+    def total_time(self) -> float:
+        return self.config_time + self.generate_time + self.write_time
+
+
+@dataclass
+class _BatchJob:
+    settings: rset.Settings
+    output_dir: str
+    base_name: str
+    ext: str
+    write_spoilers: bool = True
+
+
+# Worker state.  These are set in the parent before the pool is made, so
+# forked workers inherit them.  Workers made some other way (spawn on
+# Windows/macOS) load the rom themselves in _init_worker.
+_base_ctrom: typing.Optional[CTRom] = None
+_job: typing.Optional[_BatchJob] = None
+
+
+def load_base_rom(rom_path: str, ignore_checksum: bool = False) -> CTRom:
+    '''
+    Read the base rom.  Raises InvalidRomException if the rom is not a
+    vanilla CT rom unless ignore_checksum is set.
+    '''
+    return CTRom.from_file(rom_path, ignore_checksum, use_mmap=True)
+
+
+def get_random_seeds(count: int,
+                     rng: typing.Optional[random.Random] = None) -> list[str]:
+    '''Get count distinct seeds made of two names like the gui makes.'''
+    if rng is None:
+        rng = random.Random()
+
+    names = randomizer.read_names()
+    seeds = []
+    seen = set()
+
+    # There are far more name pairs than any batch will use, but don't
+    # spin forever if someone asks for more than exist.
+    max_seeds = len(set(names))**2
+    while len(seeds) < min(count, max_seeds):
+        seed = ''.join(rng.choice(names) for i in range(2))
+        if seed not in seen:
+            seen.add(seed)
+            seeds.append(seed)
+
+    return seeds
+
+
+def warm_config_cache(base_ctrom: CTRom, settings: rset.Settings):
+    '''
+    Build the cached base configs (and hard mode parts) and the scaled boss
+    stats that seeds with the given settings can ask for.  Mystery settings
+    can roll any game mode or difficulty with nonzero weight.
+    '''
+    if rset.GameFlags.MYSTERY in settings.gameflags:
+        mystery = settings.mystery_settings
+        game_modes = [mode for mode, freq in mystery.game_mode_freqs.items()
+                      if freq > 0]
+        hard_enemies = mystery.enemy_difficulty_freqs.get(
+            rset.Difficulty.HARD, 0
+        ) > 0
+        hard_items = mystery.item_difficulty_freqs.get(
+            rset.Difficulty.HARD, 0
+        ) > 0
+    else:
+        game_modes = [settings.game_mode]
+        hard_enemies = settings.enemy_difficulty == rset.Difficulty.HARD
+        hard_items = settings.item_difficulty == rset.Difficulty.HARD
+
+    # Everything but vanilla rando shares one base config, so only one
+    # non-VR mode needs building.
+    VR = rset.GameMode.VANILLA_RANDO
+    modes_to_build = [mode for mode in game_modes if mode != VR][:1]
+    if VR in game_modes:
+        modes_to_build.append(VR)
+
+    with base_ctrom.rom_data.getbuffer() as rom_buf:
+        for mode in modes_to_build:
+            warm_settings = rset.Settings()
+            warm_settings.game_mode = mode
+            if hard_enemies:
+                warm_settings.enemy_difficulty = rset.Difficulty.HARD
+            if hard_items:
+                warm_settings.item_difficulty = rset.Difficulty.HARD
+
+            config = randomizer.Randomizer.get_base_config_from_settings(
+                rom_buf, warm_settings
+            )
+
+            # The workers also inherit the scaled boss stats for every spot.
+            bossdata.precompute_scaled_stats(config.boss_data_dict,
+                                             config.enemy_dict)
+
+
+def _init_worker(rom_path: str, ignore_checksum: bool, job: _BatchJob):
+    global _base_ctrom, _job
+
+    if _base_ctrom is None:
+        _base_ctrom = load_base_rom(rom_path, ignore_checksum)
+
+    _job = job
+
+
+def _generate_seed(seed: str) -> SeedResult:
+    job = _job
+    result = SeedResult(seed)
+
+    try:
+        settings = copy.deepcopy(job.settings)
+        settings.seed = seed
+
+        rando = randomizer.Randomizer.from_ctrom(_base_ctrom, settings)
+
+        start = time.perf_counter()
+        rando.set_random_config()
+        result.config_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        out_rom = rando.get_generated_rom()
+        result.generate_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+
+        # Same naming as the gui.  Use the batch's flag string since mystery
+        # seeds replace their settings.
+        flag_str = job.settings.get_flag_string()
+        base_path = os.path.join(job.output_dir,
+                                 f'{job.base_name}.{flag_str}.{seed}')
+
+        rom_path = base_path + job.ext
+        with open(rom_path, 'wb') as outfile:
+            outfile.write(out_rom)
+        result.rom_path = rom_path
+
+        if job.write_spoilers:
+            result.spoiler_path = base_path + '.spoilers.txt'
+            result.json_spoiler_path = base_path + '.spoilers.json'
+            rando.write_spoiler_log(result.spoiler_path)
+            rando.write_json_spoiler_log(result.json_spoiler_path)
+
+        result.write_time = time.perf_counter() - start
+    except Exception:
+        result.error = traceback.format_exc()
+
+    return result
+
+
+def _get_mp_context():
+    # Fork shares the parent's rom and config cache.  Fall back to the
+    # platform default where fork doesn't exist.
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+
+    return multiprocessing.get_context()
+
+
+def generate_seeds(
+        rom_path: str,
+        output_dir: str,
+        settings: typing.Union[rset.Settings, str],
+        seeds: typing.Optional[typing.Iterable[str]] = None,
+        count: typing.Optional[int] = None,
+        num_workers: typing.Optional[int] = None,
+        ignore_checksum: bool = False,
+        write_spoilers: bool = True
+) -> typing.Iterator[SeedResult]:
+    '''
+    Generate seeds in a pool of num_workers processes (default: one per
+    core) and yield a SeedResult for each as it finishes.  Seeds come in
+    completion order, not the order given.
+
+    settings is a Settings object or a flag string (see
+    Settings.from_flag_string).  Give either an explicit list of seeds or a
+    count of random seeds to make.  Failed seeds are reported through
+    SeedResult.error rather than stopping the batch.
+    '''
+    global _base_ctrom, _job
+
+    if isinstance(settings, str):
+        settings = rset.Settings.from_flag_string(settings)
+
+    if seeds is None:
+        if count is None:
+            raise ValueError('Either seeds or count must be given.')
+        seeds = get_random_seeds(count)
+    else:
+        seeds = list(seeds)
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    file_name = os.path.basename(rom_path)
+    base_name = file_name.split('.')[0]
+    _, ext = os.path.splitext(file_name)
+    if ext == '':
+        ext = '.sfc'
+
+    job = _BatchJob(settings, output_dir, base_name, ext, write_spoilers)
+
+    _base_ctrom = load_base_rom(rom_path, ignore_checksum)
+    _job = job
+    warm_config_cache(_base_ctrom, settings)
+
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+
+    num_workers = max(1, min(num_workers, len(seeds)))
+
+    try:
+        if num_workers == 1:
+            for seed in seeds:
+                yield _generate_seed(seed)
+        else:
+            context = _get_mp_context()
+            with context.Pool(num_workers, _init_worker,
+                              (rom_path, ignore_checksum, job)) as pool:
+                yield from pool.imap_unordered(_generate_seed, seeds)
+    finally:
+        _base_ctrom = None
+        _job = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate a batch of seeds from one base rom.'
+    )
+    parser.add_argument('rom', help='vanilla Chrono Trigger rom')
+    parser.add_argument('output_dir', help='folder for roms and spoilers')
+
+    settings_group = parser.add_mutually_exclusive_group(required=True)
+    settings_group.add_argument(
+        '--flags', help='flag string, e.g. st.ngzpmte or mystery'
+    )
+    settings_group.add_argument(
+        '--settings', help='pickled Settings or the gui\'s settings file'
+    )
+
+    seed_group = parser.add_mutually_exclusive_group(required=True)
+    seed_group.add_argument('--count', type=int,
+                            help='number of random seeds to make')
+    seed_group.add_argument('--seeds', nargs='+', help='seeds to make')
+
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--no-spoilers', action='store_true',
+                        help='do not write spoiler logs')
+    parser.add_argument('--ignore-checksum', action='store_true',
+                        help='allow a rom which is not vanilla CT')
+
+    args = parser.parse_args()
+
+    if args.flags is not None:
+        try:
+            settings = rset.Settings.from_flag_string(args.flags)
+        except rset.InvalidFlagStringException as ex:
+            parser.error(str(ex))
+    else:
+        settings = randomizer.read_settings_file(args.settings)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    timing_path = os.path.join(args.output_dir, 'seedbatch_timing.jsonl')
+    num_failed = 0
+    batch_start = time.perf_counter()
+
+    try:
+        results = generate_seeds(
+            args.rom, args.output_dir, settings,
+            seeds=args.seeds, count=args.count, num_workers=args.workers,
+            ignore_checksum=args.ignore_checksum,
+            write_spoilers=not args.no_spoilers
+        )
+
+        timing_file = open(timing_path, 'a')
+        for result in results:
+            record = asdict(result)
+            record['total_time'] = result.total_time
+            timing_file.write(json.dumps(record) + '\n')
+            timing_file.flush()
+
+            if result.error is None:
+                print(f'{result.seed}: {result.total_time:.2f}s')
+            else:
+                num_failed += 1
+                print(f'{result.seed}: FAILED\n{result.error}')
+
+        timing_file.close()
+    except InvalidRomException as ex:
+        print(f'Error: {ex.message}  Use --ignore-checksum to proceed '
+              'anyway.')
+        sys.exit(1)
+
+    elapsed = time.perf_counter() - batch_start
+    print(f'Done in {elapsed:.2f}s.  {num_failed} failed.')
+
+    if num_failed > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+'''
+Declared dependencies between the stages which build a RandoConfig.
+
+Each ConfigStage names the RandoConfig fields it reads and writes.  Fields of
+the settings which a stage changes are named 'settings.<field>' (e.g. boss
+rando removes entries from settings.ro_settings).  Two stages conflict when
+one writes a field the other reads or writes, and conflicting stages must
+run in the order they are listed.  Everything else is free to run in any
+order, or at the same time.
+
+Because every stage draws from its own random stream (see stagerng.py), a
+stage gives the same result no matter when it runs, so all of the executors
+here give the same config for the same seed:
+
+  - run_stages runs the stages in order on the config itself.  With
+    check=True each stage instead gets a config holding only its declared
+    fields, so an undeclared read fails and an undeclared write is caught.
+    This is how an ordering bug like roboribbon/itemrando (both rewrite the
+    itemdb) shows up as a declared hazard instead of a wrong seed.
+  - run_stages_parallel runs stages whose dependencies are done in a process
+    pool, and merges each stage's written fields back into the config.
+
+get_hazards lists every conflict between stages, which is the reason each
+ordering constraint exists.
+'''
+from __future__ import annotations
+import concurrent.futures
+from dataclasses import dataclass
+import multiprocessing
+import os
+import pickle
+import time
+import typing
+
+import randoconfig as cfg
+import randosettings as rset
+import stageprofiler
+import stagerng
+
+
+class UndeclaredAccessException(Exception):
+    pass
+
+
+_SETTINGS_PREFIX = 'settings.'
+
+
+@dataclass(frozen=True)
+class ConfigStage:
+    name: str
+    func: typing.Callable[[rset.Settings, cfg.RandoConfig], typing.Any]
+    reads: frozenset[str] = frozenset()
+    writes: frozenset[str] = frozenset()
+
+    def __post_init__(self):
+        # Allow any iterable of field names.
+        object.__setattr__(self, 'reads', frozenset(self.reads))
+        object.__setattr__(self, 'writes', frozenset(self.writes))
+
+    @property
+    def fields(self) -> frozenset[str]:
+        return self.reads | self.writes
+
+
+@dataclass(frozen=True)
+class Hazard:
+    earlier: str
+    later: str
+
+    # 'RAW' (later reads what earlier writes), 'WAR' (later writes what
+    # earlier reads) or 'WAW' (both write)
+    kind: str
+    fields: frozenset[str]
+
+    def __str__(self):
+        fields = ', '.join(sorted(self.fields))
+        return f'{self.later} after {self.earlier} ({self.kind}: {fields})'
+
+
+def get_hazards(stages: typing.Sequence[ConfigStage]) -> list[Hazard]:
+    '''Every conflict between a stage and a later one.'''
+    hazards = []
+
+    for ind, earlier in enumerate(stages):
+        for later in stages[ind+1:]:
+            kinds = (
+                ('RAW', earlier.writes & later.reads),
+                ('WAR', earlier.reads & later.writes),
+                ('WAW', earlier.writes & later.writes)
+            )
+
+            for kind, fields in kinds:
+                if fields:
+                    hazards.append(
+                        Hazard(earlier.name, later.name, kind, fields)
+                    )
+
+    return hazards
+
+
+def get_stage_dependencies(
+        stages: typing.Sequence[ConfigStage]
+) -> dict[str, list[str]]:
+    '''The stages which must finish before each stage can start.'''
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError('Stage names must be unique.')
+
+    deps = {name: [] for name in names}
+    for hazard in get_hazards(stages):
+        if hazard.earlier not in deps[hazard.later]:
+            deps[hazard.later].append(hazard.earlier)
+
+    return deps
+
+
+def get_stage_waves(stages: typing.Sequence[ConfigStage]) -> list[list[str]]:
+    '''
+    Group the stages into waves.  Each wave depends only on earlier waves,
+    so the stages in a wave can run at the same time.
+    '''
+    deps = get_stage_dependencies(stages)
+    wave_num = dict()
+
+    for stage in stages:
+        wave_num[stage.name] = 1 + max(
+            (wave_num[dep] for dep in deps[stage.name]), default=-1
+        )
+
+    waves = [[] for i in range(max(wave_num.values(), default=-1) + 1)]
+    for stage in stages:
+        waves[wave_num[stage.name]].append(stage.name)
+
+    return waves
+
+
+def _get_fields(stage: ConfigStage, config: cfg.RandoConfig) -> dict:
+    # Fields which are only set by some stages (e.g. twin_boss_type) may not
+    # exist yet.
+    return {
+        name: getattr(config, name) for name in stage.fields
+        if not name.startswith(_SETTINGS_PREFIX) and hasattr(config, name)
+    }
+
+
+def _merge_fields(written: dict, settings: rset.Settings,
+                  config: cfg.RandoConfig):
+    for name, value in written.items():
+        if name.startswith(_SETTINGS_PREFIX):
+            setattr(settings, name[len(_SETTINGS_PREFIX):], value)
+        else:
+            setattr(config, name, value)
+
+
+def _run_stage_on_fields(stage: ConfigStage, settings: rset.Settings,
+                         fields: dict, check: bool = False):
+    '''
+    Run a stage on a config which has only the given fields.  Returns the
+    stage's return value, the fields it wrote, and the time it took.
+    '''
+    config = cfg.RandoConfig.__new__(cfg.RandoConfig)
+    config.__dict__.update(fields)
+
+    # Fingerprint what the stage may only read, to catch in-place changes.
+    if check:
+        read_only = [name for name in fields if name not in stage.writes]
+        before = {name: pickle.dumps(fields[name]) for name in read_only}
+
+    start = time.perf_counter()
+    try:
+        with stagerng.use_stage_rng(settings.seed, stage.name):
+            result = stage.func(settings, config)
+    except AttributeError as ex:
+        # Python 3.10+ says which object was missing the attribute.
+        if getattr(ex, 'obj', config) is not config:
+            raise
+        raise UndeclaredAccessException(
+            f'{stage.name}: {ex}.  Is the field in the stage\'s reads?'
+        ) from ex
+    elapsed = time.perf_counter() - start
+
+    written = dict()
+    for name in stage.writes:
+        if name.startswith(_SETTINGS_PREFIX):
+            written[name] = getattr(settings, name[len(_SETTINGS_PREFIX):])
+        elif name in config.__dict__:
+            written[name] = config.__dict__[name]
+
+    if check:
+        undeclared = [
+            name for name, value in config.__dict__.items()
+            if name not in stage.writes and (
+                name not in fields or value is not fields[name] or
+                pickle.dumps(value) != before[name]
+            )
+        ]
+
+        if undeclared:
+            raise UndeclaredAccessException(
+                f'{stage.name}: wrote {", ".join(sorted(undeclared))} '
+                'which are not in the stage\'s writes.'
+            )
+
+    return result, written, elapsed
+
+
+def run_stages(stages: typing.Sequence[ConfigStage],
+               settings: rset.Settings,
+               config: cfg.RandoConfig,
+               profiler: typing.Optional[stageprofiler.StageProfiler] = None,
+               check: bool = False) -> dict[str, typing.Any]:
+    '''
+    Run the stages in order, each with its own random stream.  Returns each
+    stage's return value by name.  With check, raise
+    UndeclaredAccessException when a stage uses a field it didn't declare.
+    '''
+    results = dict()
+
+    for stage in stages:
+        with stageprofiler.stage(profiler, stage.name):
+            if check:
+                result, written, _ = _run_stage_on_fields(
+                    stage, settings, _get_fields(stage, config), True
+                )
+                _merge_fields(written, settings, config)
+            else:
+                with stagerng.use_stage_rng(settings.seed, stage.name):
+                    result = stage.func(settings, config)
+
+        results[stage.name] = result
+
+    return results
+
+
+def _get_mp_context():
+    # Forked workers already have every module imported.
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+
+    return multiprocessing.get_context()
+
+
+def run_stages_parallel(
+        stages: typing.Sequence[ConfigStage],
+        settings: rset.Settings,
+        config: cfg.RandoConfig,
+        num_workers: typing.Optional[int] = None,
+        profiler: typing.Optional[stageprofiler.StageProfiler] = None
+) -> dict[str, typing.Any]:
+    '''
+    Run the stages in a pool of num_workers processes (default: one per
+    core), starting each stage once the stages it depends on are done.
+    Gives the same config and return values as run_stages.
+
+    Each worker gets copies of a stage's declared fields and sends back the
+    fields it wrote, so this only pays off when stages are slow compared to
+    pickling their fields.  Processes in a multiprocessing.Pool (e.g. the
+    seedbatch workers) can't start a pool of their own.
+    '''
+    deps = get_stage_dependencies(stages)
+    waiting = {stage.name: set(deps[stage.name]) for stage in stages}
+    stage_dict = {stage.name: stage for stage in stages}
+
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+
+    results = dict()
+    running = dict()
+
+    with concurrent.futures.ProcessPoolExecutor(
+            num_workers, mp_context=_get_mp_context()
+    ) as pool:
+        while waiting or running:
+            ready = [name for name, names in waiting.items() if not names]
+            for name in ready:
+                del waiting[name]
+                stage = stage_dict[name]
+                future = pool.submit(_run_stage_on_fields, stage, settings,
+                                     _get_fields(stage, config))
+                running[future] = stage
+
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+
+            for future in done:
+                stage = running.pop(future)
+                result, written, elapsed = future.result()
+
+                # Nothing running can use these fields.  Any stage which
+                # does depends on this one.
+                _merge_fields(written, settings, config)
+                results[stage.name] = result
+
+                if profiler is not None:
+                    profiler.record(stage.name, elapsed)
+
+                for names in waiting.values():
+                    names.discard(stage.name)
+
+    # Report in declared order rather than completion order.
+    return {stage.name: results[stage.name] for stage in stages}
+
+
+def main():
+    pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+'''
+Opt-in instrumentation for the stages of seed generation.
+
+A StageProfiler records wall time, call counts and (optionally) tracemalloc
+allocation figures for each named stage.  Stages nest, and a nested stage is
+reported under its full path (e.g. 'rom/write_config/enemies').  Chosen
+stages can also be run under cProfile with the result dumped to a .prof file
+for snakeviz/pstats.
+
+Usage:
+    rando.profiler = StageProfiler(track_allocations=True,
+                                   profile_stages=['config/logicwriter'])
+    rando.set_random_config()
+    rando.generate_rom()
+    print(rando.profiler.format_report())
+
+Code being instrumented uses stage(profiler, name), which does nothing when
+profiler is None.
+'''
+from __future__ import annotations
+import contextlib
+import cProfile
+from dataclasses import dataclass, field, asdict
+import os
+import time
+import tracemalloc
+import typing
+
+
+@dataclass
+class StageStats:
+    name: str
+    calls: int = 0
+
+    # Seconds, summed over all calls and for the slowest call
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    # Only filled in when allocations are tracked.  alloc_net is the change
+    # in traced memory summed over calls.  alloc_peak is the most traced
+    # memory in use above the stage's starting point in any call.  Both in
+    # bytes.
+    alloc_net: int = 0
+    alloc_peak: int = 0
+
+    profile_paths: list[str] = field(default_factory=list)
+
+
+@dataclass
+class _StageFrame:
+    stats: StageStats
+    start_time: float
+    start_mem: int = 0
+
+    # Largest traced peak seen so far in this call.  Nested stages reset
+    # tracemalloc's peak, so it's carried here.
+    peak_mem: int = 0
+    profiler: typing.Optional[cProfile.Profile] = None
+
+
+class StageProfiler:
+
+    def __init__(self, track_allocations: bool = False,
+                 profile_stages: typing.Optional[typing.Iterable[str]] = None,
+                 profile_dir: str = '.'):
+        '''
+        profile_stages are full stage paths or bare stage names.  Matching
+        stages are run under cProfile (unless a profile is already running
+        for an enclosing stage) and dumped to profile_dir.
+        '''
+        self.track_allocations = track_allocations
+        self.profile_stages = set(profile_stages or [])
+        self.profile_dir = profile_dir
+
+        # Stages in the order they first ran
+        self.stats: dict[str, StageStats] = dict()
+
+        self._frames: list[_StageFrame] = []
+        self._started_tracing = False
+        self._profiling = False
+
+    def reset(self):
+        self.stats = dict()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        self.__enter_stage(name)
+        try:
+            yield
+        finally:
+            self.__exit_stage()
+
+    def __enter_stage(self, name: str):
+        if self._frames:
+            path = self._frames[-1].stats.name + '/' + name
+        else:
+            path = name
+
+        stats = self.stats.setdefault(path, StageStats(path))
+        frame = _StageFrame(stats, 0.0)
+
+        if self.track_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+
+            current, peak = tracemalloc.get_traced_memory()
+            if self._frames:
+                outer = self._frames[-1]
+                outer.peak_mem = max(outer.peak_mem, peak)
+
+            # reset_peak is 3.9+.  Without it peaks are since tracing began.
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            frame.start_mem = current
+            frame.peak_mem = current
+
+        if not self._profiling and \
+           (path in self.profile_stages or name in self.profile_stages):
+            frame.profiler = cProfile.Profile()
+            self._profiling = True
+
+        self._frames.append(frame)
+
+        # Start the clock (and profiler) last so that setup isn't counted.
+        if frame.profiler is not None:
+            frame.profiler.enable()
+        frame.start_time = time.perf_counter()
+
+    def __exit_stage(self):
+        end_time = time.perf_counter()
+        frame = self._frames.pop()
+        stats = frame.stats
+
+        if frame.profiler is not None:
+            frame.profiler.disable()
+            self._profiling = False
+
+            file_name = f'{stats.name.replace("/", ".")}.{stats.calls}.prof'
+            path = os.path.join(self.profile_dir, file_name)
+            frame.profiler.dump_stats(path)
+            stats.profile_paths.append(path)
+
+        elapsed = end_time - frame.start_time
+        stats.calls += 1
+        stats.total_time += elapsed
+        stats.max_time = max(stats.max_time, elapsed)
+
+        if self.track_allocations and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame.peak_mem)
+
+            stats.alloc_net += current - frame.start_mem
+            stats.alloc_peak = max(stats.alloc_peak, peak - frame.start_mem)
+
+            # The enclosing stage's peak includes this one's.
+            if self._frames:
+                outer = self._frames[-1]
+                outer.peak_mem = max(outer.peak_mem, peak)
+
+        if not self._frames and self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def record(self, name: str, elapsed: float):
+        '''
+        Add a call of a stage which was timed elsewhere (e.g. in a worker
+        process) under the current stage.
+        '''
+        if self._frames:
+            name = self._frames[-1].stats.name + '/' + name
+
+        stats = self.stats.setdefault(name, StageStats(name))
+        stats.calls += 1
+        stats.total_time += elapsed
+        stats.max_time = max(stats.max_time, elapsed)
+
+    def get_report(self) -> list[dict]:
+        '''The stats for each stage as plain dicts (e.g. for json).'''
+        return [asdict(stats) for stats in self.stats.values()]
+
+    def format_report(self) -> str:
+        lines = [
+            f'{"Stage":40} {"Calls":>6} {"Total(s)":>9} {"Max(s)":>9}'
+            f' {"Net(KiB)":>10} {"Peak(KiB)":>10}'
+        ]
+
+        for stats in self.stats.values():
+            depth = stats.name.count('/')
+            name = '  '*depth + stats.name.split('/')[-1]
+            lines.append(
+                f'{name:40} {stats.calls:6} {stats.total_time:9.3f}'
+                f' {stats.max_time:9.3f} {stats.alloc_net/1024:10.1f}'
+                f' {stats.alloc_peak/1024:10.1f}'
+            )
+
+        return '\n'.join(lines)
+
+
+_null_stage = contextlib.nullcontext()
+
+
+def stage(profiler: typing.Optional[StageProfiler], name: str):
+    '''Stage context for profiler, or a no-op if profiler is None.'''
+    if profiler is None:
+        return _null_stage
+
+    return profiler.stage(name)
+
+
+def main():
+    pass
+
+
+if __name__ == '__main__':
+    main()
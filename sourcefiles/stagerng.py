@@ -0,0 +1,49 @@
+'''
+Independent random streams for the stages of seed generation.
+
+Each stage (treasures, shops, key items, ...) draws from its own stream which
+is derived from the seed and the stage's name.  Extra draws in one stage do
+not change what any other stage draws, so a stage can be changed, cached or
+re-run on its own without changing the rest of the seed.
+
+The randomizer modules draw from the global random module.  A stage's stream
+is used by making it the global random state for the duration of the stage.
+'''
+from __future__ import annotations
+import contextlib
+import hashlib
+import random
+
+
+def get_stage_seed(seed: str, stage: str) -> int:
+    '''Derive the seed of a stage's stream from sha256(seed:stage).'''
+    digest = hashlib.sha256(f'{seed}:{stage}'.encode('utf-8')).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def get_stage_rng(seed: str, stage: str) -> random.Random:
+    '''Get a stage's stream as its own random.Random.'''
+    return random.Random(get_stage_seed(seed, stage))
+
+
+@contextlib.contextmanager
+def use_stage_rng(seed: str, stage: str):
+    '''
+    Make the global random module draw from the stage's stream.  The
+    previous global state is restored afterwards.
+    '''
+    old_state = random.getstate()
+    random.seed(get_stage_seed(seed, stage))
+
+    try:
+        yield
+    finally:
+        random.setstate(old_state)
+
+
+def main():
+    pass
+
+
+if __name__ == '__main__':
+    main()
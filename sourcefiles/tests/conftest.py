@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The randomizer's modules are flat files in sourcefiles/, and some of them
+# open files relative to it.
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SOURCE_DIR)
+os.chdir(SOURCE_DIR)
@@ -0,0 +1,30 @@
+import pickle
+
+import configcache
+import randomizer
+import randosettings as rset
+import romsnapshot
+
+
+def test_cold_cache_config_from_rom_view_pickles(monkeypatch):
+    # Memory-only caches, so nothing is read from (or left on) disk.
+    cache = configcache.BaseConfigCache()
+    monkeypatch.setattr(configcache, '_default_cache', cache)
+    monkeypatch.setattr(romsnapshot, '_default_cache',
+                        romsnapshot.SnapshotCache())
+
+    # No real rom here.  A blank one still patches and parses, and the
+    # randomizer hands the parsers a view of its rom buffer like this.
+    rom_view = memoryview(bytearray(0x400000))
+    settings = rset.Settings.get_race_presets()
+    settings.enemy_difficulty = rset.Difficulty.HARD
+
+    config = randomizer.Randomizer.get_rom_config(rom_view, settings)
+
+    assert cache.misses == 2
+    assert pickle.loads(pickle.dumps(config)).char_manager is not None
+
+    # A warm cache gives a clone.
+    again = randomizer.Randomizer.get_rom_config(rom_view, settings)
+    assert cache.hits == 2
+    assert again is not config
@@ -0,0 +1,139 @@
+import random
+
+import pytest
+
+import bossdata
+import enemystattable
+from ctenums import EnemyID
+from enemystats import EnemyStats
+
+
+def _get_stats(hp: int) -> EnemyStats:
+    stats = EnemyStats()
+    stats.hp = hp
+    stats.level = 10
+    stats.offense = 20
+    return stats
+
+
+def test_scaled_row_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(bossdata, '_scaled_row_cache',
+                        type(bossdata._scaled_row_cache)())
+    monkeypatch.setattr(bossdata, '_SCALED_ROW_CACHE_SIZE', 3)
+
+    boss = bossdata.ProgressiveScaleBoss
+    parts = [EnemyID.NU, EnemyID.GUARDIAN, EnemyID.MASA, EnemyID.MUNE]
+    stat_dict = {part: _get_stats(1000*(ind+1))
+                 for ind, part in enumerate(parts)}
+
+    def get_key(part):
+        return bossdata._get_row_key(boss, 5, 20, stat_dict[part])
+
+    first_rows = bossdata._get_scaled_rows(
+        [(boss, 5, 20, part) for part in parts[:3]], stat_dict
+    )
+    bossdata._get_scaled_rows([(boss, 5, 20, parts[0])], stat_dict)
+    bossdata._get_scaled_rows([(boss, 5, 20, parts[3])], stat_dict)
+
+    cache = bossdata._scaled_row_cache
+    assert list(cache) == [get_key(part) for part in
+                           (parts[2], parts[0], parts[3])]
+    assert cache[get_key(parts[0])] == first_rows[0]
+
+
+def test_scaled_rows_survive_a_batch_larger_than_the_cache(monkeypatch):
+    monkeypatch.setattr(bossdata, '_scaled_row_cache',
+                        type(bossdata._scaled_row_cache)())
+    monkeypatch.setattr(bossdata, '_SCALED_ROW_CACHE_SIZE', 2)
+
+    boss = bossdata.ProgressiveScaleBoss
+    parts = [EnemyID.NU, EnemyID.GUARDIAN, EnemyID.MASA, EnemyID.MUNE]
+    stat_dict = {part: _get_stats(1000*(ind+1))
+                 for ind, part in enumerate(parts)}
+    row_jobs = [(boss, 5, 20, part) for part in parts]
+
+    rows = bossdata._get_scaled_rows(row_jobs, stat_dict)
+
+    assert rows == bossdata._compute_scaled_rows(row_jobs, stat_dict)
+    assert len(bossdata._scaled_row_cache) == 2
+
+
+def _get_random_stats(rand: random.Random) -> EnemyStats:
+    stats = EnemyStats()
+    stats.hp = rand.randrange(1, 0x8000)
+    stats.level = rand.randrange(1, 0x100)
+    # Scaling from 50 down to 1 takes 6 speed.  Below that both ways of
+    # scaling fail on a negative speed.
+    stats.speed = rand.randrange(7, 0x11)
+    stats.magic = rand.randrange(1, 0x100)
+    stats.mdef = rand.randrange(0, 0x100)
+    stats.offense = rand.randrange(1, 0x100)
+    stats.defense = rand.randrange(0, 0x100)
+    stats.xp = rand.randrange(0, 0x8000)
+    stats.gp = rand.randrange(0, 0x8000)
+    stats.tp = rand.randrange(0, 0x100)
+    return stats
+
+
+def _scale_one(boss, part, stats, from_power, to_power) -> EnemyStats:
+    if boss.SCALE_KIND == 'linear':
+        return bossdata.linear_scale_stats(part, stats, None, None,
+                                           from_power, to_power,
+                                           **boss.SCALE_OPTIONS)
+
+    options = {**boss.SCALE_OPTIONS, 'scale_techs': False,
+               'scale_atk': False}
+    return bossdata.progressive_scale_stats(part, stats, None, None,
+                                            from_power, to_power,
+                                            boss.MAX_LEVEL, **options)
+
+
+@pytest.mark.parametrize(
+    'boss',
+    [bossdata.ProgressiveScaleBoss, bossdata.VRScaleBoss,
+     bossdata.SonOfSunScaleBoss, bossdata.LinearScaleBoss]
+)
+def test_scaled_rows_match_per_enemy_scaling(boss):
+    if not enemystattable.numpy_available:
+        pytest.skip('numpy is not installed')
+
+    rand = random.Random(boss.__name__)
+    parts = list(EnemyID)
+
+    # Strong enemies scaled far up push offense past 0xFF.
+    powers = [(5, 40), (1, 50), (30, 2), (45, 10), (15, 15)]
+    powers += [(rand.randrange(1, 51), rand.randrange(1, 51))
+               for _ in range(20)]
+
+    row_jobs = []
+    stat_dict = dict()
+    for ind, (from_power, to_power) in enumerate(powers*20):
+        part = parts[ind % len(parts)]
+        if part not in stat_dict:
+            stat_dict[part] = _get_random_stats(rand)
+        row_jobs.append((boss, from_power, to_power, part))
+
+    rows = bossdata._compute_scaled_rows(row_jobs, stat_dict)
+
+    overflowed = False
+    for (_, from_power, to_power, part), (changes, new_offense) in \
+            zip(row_jobs, rows):
+        stats = stat_dict[part]
+        expected = _scale_one(boss, part, stats, from_power, to_power)
+        new_stats = enemystattable.apply_changes(stats, changes)
+
+        assert enemystattable.get_stat_values(new_stats) == \
+            enemystattable.get_stat_values(expected)
+
+        if boss.SCALE_KIND == 'progressive':
+            off_scale_factor = bossdata.get_progressive_scale_factors(
+                from_power, to_power, boss.MAX_LEVEL
+            )[0]
+            assert new_offense == pytest.approx(
+                stats.offense*off_scale_factor
+            )
+            overflowed |= new_offense/0xFF > 1.05
+
+    if boss.SCALE_OPTIONS.get('scale_offense', True) and \
+       boss.SCALE_KIND == 'progressive':
+        assert overflowed
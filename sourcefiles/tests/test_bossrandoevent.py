@@ -0,0 +1,110 @@
+import collections
+import copy
+
+import pytest
+
+import bossdata
+import bossrandoevent
+import randosettings as rset
+from ctenums import BossID, LocID
+from ctevent import Event
+from ctrom import CTRom
+
+
+_TWIN_SPOT = LocID.OCEAN_PALACE_TWIN_GOLEM
+
+
+def _get_twin_spot_rom() -> CTRom:
+    ctrom = CTRom(bytes(0x400000), ignore_checksum=True)
+    ctrom.script_manager.set_script(
+        Event.from_flux('flux/orig_twin_golem_spot.Flux'), _TWIN_SPOT
+    )
+    return ctrom
+
+
+def _get_scheme(boss_id: BossID) -> bossdata.BossScheme:
+    settings = rset.Settings.get_race_presets()
+    return bossdata.get_boss_data_dict(settings)[boss_id].scheme
+
+
+def _set_test_spot_boss(ctrom: CTRom, boss: bossdata.BossScheme):
+    # The flux copy of the twin golem script lacks some of the commands
+    # set_twin_golem_spot looks for, so use the generic one spot setup.
+    bossrandoevent.set_generic_one_spot_boss(
+        ctrom, boss, _TWIN_SPOT, 0xA,
+        lambda scr: scr.get_function_end(0xA, 1)-1, 0x80, 0xE0
+    )
+
+
+def _set_reordered_test_spot_boss(ctrom: CTRom,
+                                  boss: bossdata.BossScheme):
+    # Like the spots which move the leftmost part to the front
+    boss.reorder_horiz(left=True)
+    _set_test_spot_boss(ctrom, boss)
+
+
+@pytest.mark.parametrize('reorder', [False, True])
+@pytest.mark.parametrize(
+    'boss_id', [BossID.TWIN_BOSS, BossID.GUARDIAN, BossID.MOTHER_BRAIN]
+)
+def test_cached_placement_matches_spot_function(monkeypatch, reorder,
+                                                boss_id):
+    monkeypatch.setattr(bossrandoevent, '_placement_cache',
+                        collections.OrderedDict())
+
+    spot_fn = _set_reordered_test_spot_boss if reorder else \
+        _set_test_spot_boss
+    num_calls = 0
+
+    def counted_spot_fn(ctrom, boss):
+        nonlocal num_calls
+        num_calls += 1
+        spot_fn(ctrom, boss)
+
+    monkeypatch.setitem(bossrandoevent.BOSS_SPOT_FNS, _TWIN_SPOT,
+                        counted_spot_fn)
+
+    scheme = _get_scheme(boss_id)
+
+    ctrom = _get_twin_spot_rom()
+    expected = copy.deepcopy(scheme)
+    spot_fn(ctrom, expected)
+    expected_data = ctrom.script_manager.get_script(_TWIN_SPOT).data
+
+    if reorder and boss_id != BossID.TWIN_BOSS:
+        assert expected.ids != scheme.ids
+
+    # The first placement runs the spot's function and the second uses
+    # the cache.
+    for _ in range(2):
+        ctrom = _get_twin_spot_rom()
+        boss = copy.deepcopy(scheme)
+        bossrandoevent.place_boss(ctrom, _TWIN_SPOT, boss)
+
+        assert ctrom.script_manager.get_script(_TWIN_SPOT).data == \
+            expected_data
+        assert boss.ids == expected.ids
+        assert boss.disps == expected.disps
+        assert boss.slots == expected.slots
+
+    assert num_calls == 1
+
+
+def test_placement_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(bossrandoevent, '_placement_cache',
+                        collections.OrderedDict())
+    monkeypatch.setitem(bossrandoevent.BOSS_SPOT_FNS, _TWIN_SPOT,
+                        _set_test_spot_boss)
+    monkeypatch.setattr(bossrandoevent, '_PLACEMENT_CACHE_SIZE', 2)
+
+    boss_ids = [BossID.TWIN_BOSS, BossID.GUARDIAN, BossID.MOTHER_BRAIN]
+    keys = []
+    for boss_id in boss_ids[:2] + boss_ids[:1] + boss_ids[2:]:
+        ctrom = _get_twin_spot_rom()
+        script = ctrom.script_manager.get_script(_TWIN_SPOT)
+        boss = copy.deepcopy(_get_scheme(boss_id))
+        keys.append((_TWIN_SPOT, script.get_content_hash(),
+                     bossrandoevent._get_scheme_key(boss)))
+        bossrandoevent.place_boss(ctrom, _TWIN_SPOT, boss)
+
+    assert list(bossrandoevent._placement_cache) == [keys[0], keys[3]]
@@ -0,0 +1,59 @@
+import os
+
+import configcache
+from ctenums import EnemyID
+
+
+def _fail():
+    raise AssertionError('builder should not be called')
+
+
+def test_disk_entry_is_reused(tmp_path):
+    obj = {'boss': EnemyID.NIZBEL}
+
+    cache = configcache.BaseConfigCache(cache_dir=str(tmp_path))
+    assert cache.get_or_build('key', lambda: obj) == obj
+    assert cache.misses == 1
+
+    cache = configcache.BaseConfigCache(cache_dir=str(tmp_path))
+    assert cache.get_or_build('key', _fail) == obj
+    assert cache.hits == 1
+
+
+def test_entry_records_modules_of_pickled_classes():
+    _, module_names = configcache._dump({'boss': EnemyID.NIZBEL})
+    header = configcache._get_entry_header(module_names)
+
+    assert 'ctenums' in header['modules']
+    assert 'randoconfig' in header['modules']
+    assert header['version'] == configcache.CACHE_FORMAT_VERSION
+
+
+def test_changed_class_module_invalidates_entry(tmp_path, monkeypatch):
+    obj = {'boss': EnemyID.NIZBEL}
+
+    cache = configcache.BaseConfigCache(cache_dir=str(tmp_path))
+    cache.get_or_build('key', lambda: obj)
+
+    get_module_hash = configcache._get_module_hash
+
+    def edited_hash(module_name):
+        if module_name == 'ctenums':
+            return 'edited'
+        return get_module_hash(module_name)
+
+    monkeypatch.setattr(configcache, '_get_module_hash', edited_hash)
+
+    cache = configcache.BaseConfigCache(cache_dir=str(tmp_path))
+    assert cache.get_or_build('key', lambda: obj) == obj
+    assert cache.misses == 1
+
+
+def test_disk_cache_is_opt_in(monkeypatch):
+    default_cache = configcache.BaseConfigCache()
+    monkeypatch.setattr(configcache, '_default_cache', default_cache)
+    assert configcache.get_default_cache().cache_dir is None
+
+    configcache.enable_disk_cache()
+    assert os.path.isabs(default_cache.cache_dir)
+    assert default_cache.cache_dir == configcache.get_user_cache_dir()
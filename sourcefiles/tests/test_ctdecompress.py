@@ -0,0 +1,95 @@
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+import ctdecompress
+from ctevent import Event
+
+
+def _get_compressed_rom() -> tuple[bytes, bytearray]:
+    script = Event.from_flux('flux/orig_twin_golem_spot.Flux')
+    data = bytes(script.get_bytearray())
+
+    # Pad either side so that reading past the packet would show up.
+    rom = bytearray(b'\xAA'*7) + bytearray(ctdecompress.compress(data)) + \
+        bytearray(b'\x55'*0x40)
+
+    return data, rom
+
+
+def test_native_functions_are_loaded():
+    ctcompress = pytest.importorskip('ctcompress')
+    if not hasattr(ctcompress, 'decompress'):
+        pytest.skip('ctcompress is an old build.  See csrc/setup.py.')
+
+    assert ctdecompress.decompress_is_native
+    assert ctdecompress.decompress is ctcompress.decompress
+    assert ctdecompress.get_compressed_length is \
+        ctcompress.get_compressed_length
+
+
+def test_decompress_matches_python():
+    data, rom = _get_compressed_rom()
+
+    assert bytes(ctdecompress.decompress(rom, 7)) == data
+    assert bytes(ctdecompress.decompress_py(rom, 7)) == data
+    assert ctdecompress.get_compressed_length(rom, 7) == \
+        ctdecompress.get_compressed_length_py(rom, 7)
+
+
+# An addendum which points back before itself, then a literal byte past
+# the end of the rom.
+_BACKWARD_ADDENDUM = bytes([0x00, 0x00, 0x01, 0x00, 0x00, 0x00])
+
+
+@pytest.mark.parametrize(
+    'decompress', [ctdecompress.decompress, ctdecompress.decompress_py]
+)
+def test_backward_addendum_raises(decompress):
+    with pytest.raises(IndexError):
+        decompress(_BACKWARD_ADDENDUM, 0)
+
+
+def test_truncated_packet_raises():
+    data, rom = _get_compressed_rom()
+    compr_len = ctdecompress.get_compressed_length_py(rom, 7)
+    rom = bytes(rom[:7+compr_len-2])
+
+    with pytest.raises(IndexError):
+        ctdecompress.decompress(rom, 7)
+    with pytest.raises(IndexError):
+        ctdecompress.decompress_py(rom, 7)
+
+
+@pytest.mark.skipif('CT_ROM' not in os.environ,
+                    reason='set CT_ROM to a vanilla Chrono Trigger rom')
+def test_location_scripts_round_trip():
+    with open(os.environ['CT_ROM'], 'rb') as infile:
+        rom = infile.read()
+
+    assert ctdecompress.check_roundtrip(rom) == []
+
+
+def test_threads_need_a_build_that_releases_the_gil():
+    ctcompress = pytest.importorskip('ctcompress')
+    assert ctdecompress.compress_releases_gil == \
+        bool(getattr(ctcompress, 'COMPRESS_RELEASES_GIL', False))
+
+
+def test_old_build_does_not_use_threads(monkeypatch):
+    # A build from before COMPRESS_RELEASES_GIL only has compress.
+    old_build = types.ModuleType('ctcompress')
+    old_build.compress = ctdecompress.compress_py
+    monkeypatch.setitem(sys.modules, 'ctcompress', old_build)
+
+    try:
+        old = importlib.reload(ctdecompress)
+        assert old.compress_is_native
+        assert not old.compress_releases_gil
+        assert not old.decompress_is_native
+    finally:
+        monkeypatch.undo()
+        importlib.reload(ctdecompress)
@@ -0,0 +1,49 @@
+import copy
+
+from ctevent import Event
+
+
+def _remove_one_at_a_time(script: Event, obj_ids, remove_calls=True):
+    for obj_id in sorted(obj_ids, reverse=True):
+        script.remove_object(obj_id, remove_calls)
+
+
+def test_remove_objects_matches_remove_object_with_dangling_pointers():
+    # Function 4 of objects 2 to 7 points into object 1's data.
+    script = Event.from_flux('flux/VR_002_Crono_Room.Flux')
+    obj_ids = (1, 11)
+
+    expected = copy.deepcopy(script)
+    _remove_one_at_a_time(expected, obj_ids)
+    script.remove_objects(obj_ids)
+
+    assert expected.get_function_start(1, 4) == 0x315
+    assert script.get_function_start(1, 4) == 0x315
+    assert script.num_objects == expected.num_objects
+    assert script.data == expected.data
+
+
+def test_remove_objects_matches_remove_object_with_jump_across_object():
+    # Object 1 has a jump past the end of the object and across object 11.
+    script = Event.from_flux('flux/orig_twin_golem_spot.Flux')
+    obj_ids = (0, 11)
+
+    expected = copy.deepcopy(script)
+    _remove_one_at_a_time(expected, obj_ids)
+    script.remove_objects(obj_ids)
+
+    assert script.data == expected.data
+
+
+def test_remove_objects_matches_remove_object():
+    script = Event.from_flux('flux/VR_1B2_Bekkler_Lab.Flux')
+
+    for obj_ids in [(1, 8), (1, 19), (18, 20), (3, 5, 9, 14),
+                    (0, 2, 4, 6, 8, 10)]:
+        for remove_calls in (True, False):
+            expected = copy.deepcopy(script)
+            _remove_one_at_a_time(expected, obj_ids, remove_calls)
+            new_script = copy.deepcopy(script)
+            new_script.remove_objects(obj_ids, remove_calls)
+
+            assert new_script.data == expected.data
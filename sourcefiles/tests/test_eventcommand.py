@@ -0,0 +1,21 @@
+import glob
+
+from ctevent import Event
+from eventcommand import decode_command, get_command
+
+
+def test_decode_command_matches_get_command():
+    for file_name in sorted(glob.glob('flux/*.Flux')):
+        script = Event.from_flux(file_name)
+        pos = script.get_object_start(0)
+
+        while pos < len(script.data):
+            cmd = get_command(script.data, pos)
+            cmd_id, cmd_len, args = decode_command(script.data, pos)
+
+            assert cmd_id == cmd.command
+            assert cmd_len == len(cmd)
+            assert bytes(args) == cmd.to_bytearray()[1:]
+            args.release()
+
+            pos += cmd_len
@@ -0,0 +1,42 @@
+import os
+
+import romsnapshot
+
+
+def test_disk_cache_is_opt_in(monkeypatch):
+    monkeypatch.setattr(romsnapshot, '_default_cache',
+                        romsnapshot.SnapshotCache())
+    assert romsnapshot.get_default_cache().cache_dir is None
+
+    romsnapshot.enable_disk_cache()
+    cache_dir = romsnapshot.get_default_cache().cache_dir
+    assert os.path.isabs(cache_dir)
+
+
+def test_patch_key_depends_on_patching_code(monkeypatch):
+    base_key = romsnapshot.get_bytes_key(bytes(0x100))
+    key = romsnapshot.get_patch_key(base_key, [])
+
+    monkeypatch.setattr(romsnapshot, '_get_code_fingerprint',
+                        lambda: 'edited')
+    assert romsnapshot.get_patch_key(base_key, []) != key
+
+
+def test_disk_snapshot_is_reused(tmp_path):
+    snapshot = romsnapshot.RomSnapshot(bytes(0x100), 0x100, False,
+                                       (0, 0x80, 0x100))
+
+    cache = romsnapshot.SnapshotCache(cache_dir=str(tmp_path))
+    cache.put('key', snapshot)
+
+    cache = romsnapshot.SnapshotCache(cache_dir=str(tmp_path))
+    assert cache.get('key') == snapshot
+
+
+def test_disk_is_skipped_without_source(tmp_path, monkeypatch):
+    monkeypatch.setattr(romsnapshot, '_get_code_fingerprint', lambda: None)
+    snapshot = romsnapshot.RomSnapshot(bytes(0x100), 0x100, False,
+                                       (0, 0x100))
+
+    romsnapshot.SnapshotCache(cache_dir=str(tmp_path)).put('key', snapshot)
+    assert not os.listdir(tmp_path)
@@ -0,0 +1,96 @@
+import dataclasses
+
+import pytest
+
+import configcache
+from ctenums import ItemID
+import randomizer
+import randosettings as rset
+import romsnapshot
+import stagegraph
+
+
+def test_boss_scaling_waits_for_boss_rando_settings():
+    hazards = stagegraph.get_hazards(randomizer.CONFIG_STAGES)
+
+    assert any(
+        hazard.earlier == 'bossrando' and
+        hazard.later == 'bossrando_scaling' and
+        hazard.kind == 'RAW' and
+        'settings.ro_settings' in hazard.fields
+        for hazard in hazards
+    )
+
+
+def _get_blank_rom_config(monkeypatch, settings):
+    monkeypatch.setattr(configcache, '_default_cache',
+                        configcache.BaseConfigCache())
+    monkeypatch.setattr(romsnapshot, '_default_cache',
+                        romsnapshot.SnapshotCache())
+
+    return randomizer.Randomizer.get_rom_config(
+        memoryview(bytearray(0x400000)), settings
+    )
+
+
+def _count_pcs(settings, config):
+    config.num_pcs = len(config.char_manager.pcs)
+    return config.num_pcs
+
+
+def _read_enemies(settings, config):
+    return len(config.enemy_dict)
+
+
+def test_parallel_stages_pickle_rom_config_fields(monkeypatch):
+    settings = rset.Settings.get_race_presets()
+    settings.seed = 'stages'
+    config = _get_blank_rom_config(monkeypatch, settings)
+
+    stages = [
+        stagegraph.ConfigStage('count_pcs', _count_pcs,
+                               reads={'char_manager'}, writes={'num_pcs'}),
+        stagegraph.ConfigStage('read_enemies', _read_enemies,
+                               reads={'enemy_dict'})
+    ]
+
+    results = stagegraph.run_stages_parallel(stages, settings, config, 2)
+
+    assert results['count_pcs'] == config.num_pcs == 7
+    assert results['read_enemies'] == len(config.enemy_dict)
+
+
+@pytest.mark.parametrize(
+    'shop_prices',
+    [rset.ShopPrices.FULLY_RANDOM, rset.ShopPrices.MOSTLY_RANDOM,
+     rset.ShopPrices.FREE]
+)
+def test_price_writing_stages_declare_their_fields(monkeypatch,
+                                                   shop_prices):
+    settings = rset.Settings.get_race_presets()
+    settings.seed = 'prices'
+    settings.shopprices = shop_prices
+    config = _get_blank_rom_config(monkeypatch, settings)
+
+    stage_dict = {stage.name: stage for stage in randomizer.CONFIG_STAGES}
+
+    # The shops and the prices (itemrando) are written by separate stages.
+    for name in ('shopwriter', 'itemrando'):
+        stage = stage_dict[name]
+        fields = stagegraph._get_fields(stage, config)
+        _, written, _ = stagegraph._run_stage_on_fields(
+            stage, settings, fields, check=True
+        )
+
+    if shop_prices == rset.ShopPrices.FREE:
+        assert written['itemdb'][ItemID.MID_TONIC].price == 0
+
+    # Without itemdb declared the price stage can't see the prices.
+    stage = dataclasses.replace(
+        stage_dict['itemrando'], reads=set(), writes=set()
+    )
+    with pytest.raises(stagegraph.UndeclaredAccessException):
+        stagegraph._run_stage_on_fields(
+            stage, settings, stagegraph._get_fields(stage, config),
+            check=True
+        )